@@ -1,5 +1,6 @@
 import os, sys
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Optional, Tuple, Any
+import numpy as np
 from qcodes import Instrument, Parameter
 from qcodes.utils.validators import Ints
 from qcodes.utils.helpers import create_on_off_val_mapping
@@ -58,6 +59,9 @@ class atmcd64d:
             raise OSError("\"atmcd64d\" is only compatible with Microsoft Windows")
         else:
             self.dll = ctypes.windll.LoadLibrary(dll_path or self._dll_path)
+        self.dll.GetAcquiredData.argtypes = [
+            np.ctypeslib.ndpointer(dtype=np.int32, ndim=1, flags='C_CONTIGUOUS, WRITEABLE'),
+            ctypes.c_ulong]
         self.verbose = verbose
 
     def error_check(self, code, function_name=''):
@@ -79,15 +83,27 @@ class atmcd64d:
         code = self.dll.CoolerON()
         self.error_check(code, 'CoolerON')
 
-    def get_acquired_data(self, size) -> List[int]:
-        c_data_array = ctypes.c_int * size
-        c_data = c_data_array()
-        code = self.dll.GetAcquiredData(ctypes.pointer(c_data), size)
+    def get_acquired_data(self, size: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Reads the acquired data straight into an int32 array.
+
+        Args:
+            size: Number of pixels to read.
+            out: Optional C contiguous, writeable int32 array of the given size to read into, so a buffer can be
+                reused between readouts. Multi-dimensional arrays, e.g. (frames, pixels), are filled in C order.
+
+        Returns:
+            The array holding the data.
+        """
+        if out is None:
+            out = np.empty(size, dtype=np.int32)
+        elif out.size != size:
+            raise ValueError(f"Buffer of size {out.size} does not match the requested size {size}")
+        elif out.dtype != np.int32 or not out.flags.c_contiguous or not out.flags.writeable:
+            raise ValueError("Buffer must be a C contiguous, writeable int32 array")
+        code = self.dll.GetAcquiredData(out.reshape(-1), size)
         self.error_check(code, 'GetAcquiredData')
-        acquired_data = []
-        for i in range(len(c_data)):
-            acquired_data.append(c_data[i])
-        return acquired_data
+        return out
 
     def get_acquisition_timings(self) -> Tuple[float, float, float]:
         c_exposure = ctypes.c_float()
@@ -186,6 +202,11 @@ class atmcd64d:
         code = self.dll.SetCurrentCamera(c_camera_handle)
         self.error_check(code, 'SetCurrentCamera')
 
+    def set_kinetic_cycle_time(self, cycle_time: float) -> None:
+        c_cycle_time = ctypes.c_float(cycle_time)
+        code = self.dll.SetKineticCycleTime(c_cycle_time)
+        self.error_check(code, 'SetKineticCycleTime')
+
     def set_exposure_time(self, exposure_time: float) -> None:
         c_time = ctypes.c_float(exposure_time)
         code = self.dll.SetExposureTime(c_time)
@@ -201,6 +222,11 @@ class atmcd64d:
         code = self.dll.SetNumberAccumulations(c_number)
         self.error_check(code, 'SetNumberAccumulations')
 
+    def set_number_kinetics(self, number: int) -> None:
+        c_number = ctypes.c_int(number)
+        code = self.dll.SetNumberKinetics(c_number)
+        self.error_check(code, 'SetNumberKinetics')
+
     def set_read_mode(self, mode: int) -> None:
         code = self.dll.SetReadMode(mode)
         self.error_check(code, 'SetReadMode')
@@ -239,7 +265,7 @@ class atmcd64d:
 class Spectrum(Parameter):
     """
     Parameter class for a spectrum taken with an Andor CCD.
-    The spectrum is saved in a list with the length being set by the number of pixels on the CCD.
+    The spectrum is returned as an int32 array with the length being set by the number of pixels on the CCD.
 
     Args:
         name: Parameter name.
@@ -249,9 +275,11 @@ class Spectrum(Parameter):
         super().__init__(name, instrument=instrument, **kwargs)
         self.ccd = instrument
 
-    def get_raw(self) -> List[int]:
+    def get_raw(self) -> np.ndarray:
         # get acquisition mode
         acquisition_mode = self.ccd.acquisition_mode.get()
+        if acquisition_mode == 'kinetics':
+            raise ValueError("Use kinetic_series to acquire in the 'kinetics' acquisition mode.")
 
         # start acquisition
         self.ccd.atmcd64d.start_acquisition()
@@ -272,6 +300,39 @@ class Spectrum(Parameter):
         raise NotImplementedError()
 
 
+class KineticSeries(Parameter):
+    """
+    Parameter class for a kinetic series taken with an Andor CCD.
+    All frames are read out in one call and returned as an int32 array of shape
+    (number_kinetics, x_pixels). Each frame is the sum of number_accumulations scans.
+
+    Args:
+        name: Parameter name.
+    """
+
+    def __init__(self, name: str, instrument: "Andor_DU401", **kwargs):
+        super().__init__(name, instrument=instrument, **kwargs)
+        self.ccd = instrument
+
+    def get_raw(self) -> np.ndarray:
+        if self.ccd.acquisition_mode.get() != 'kinetics':
+            raise ValueError("The acquisition mode must be 'kinetics' to acquire a kinetic series.")
+        number_kinetics = self.ccd.number_kinetics.get() or 1
+        number_accumulations = self.ccd.number_accumulations.get() or 1
+
+        # start acquisition and wait for every scan of the series
+        self.ccd.atmcd64d.start_acquisition()
+        for i in range(number_kinetics * number_accumulations):
+            self.ccd.atmcd64d.wait_for_acquisition()
+
+        # get and return all frames at once
+        frames = np.empty((number_kinetics, self.ccd.x_pixels), dtype=np.int32)
+        return self.ccd.atmcd64d.get_acquired_data(frames.size, out=frames)
+
+    def set_raw(self, value):
+        raise NotImplementedError()
+
+
 class Andor_DU401(Instrument):
     """
     Instrument driver for the Andor DU401 BU2 CCD.
@@ -327,7 +388,8 @@ class Andor_DU401(Instrument):
                            set_cmd=self.atmcd64d.set_acquisition_mode,
                            val_mapping={
                                'single scan': 1,
-                               'accumulate': 2
+                               'accumulate': 2,
+                               'kinetics': 3
                            },
                            label='acquisition mode')
 
@@ -354,6 +416,18 @@ class Andor_DU401(Instrument):
                            set_cmd=self.atmcd64d.set_number_accumulations,
                            label='number accumulations')
 
+        self.add_parameter('kinetic_cycle_time',
+                           get_cmd=self.atmcd64d.get_acquisition_timings,
+                           set_cmd=self.atmcd64d.set_kinetic_cycle_time,
+                           get_parser=lambda ans: float(ans[2]),
+                           unit='s',
+                           label='kinetic cycle time')
+
+        self.add_parameter('number_kinetics',
+                           set_cmd=self.atmcd64d.set_number_kinetics,
+                           vals=Ints(min_value=1),
+                           label='number kinetics')
+
         self.add_parameter('read_mode',
                            set_cmd=self.atmcd64d.set_read_mode,
                            val_mapping={'full vertical binning': 0})
@@ -379,6 +453,10 @@ class Andor_DU401(Instrument):
                            shape=(1, self.x_pixels),
                            label='spectrum')
 
+        self.add_parameter('kinetic_series',
+                           parameter_class=KineticSeries,
+                           label='kinetic series')
+
         self.add_parameter('temperature',
                            get_cmd=self.atmcd64d.get_temperature,
                            unit=u"\u00b0"+'C',
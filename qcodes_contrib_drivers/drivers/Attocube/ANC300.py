@@ -15,6 +15,9 @@ Author:
 
 import time
 import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Sequence, Tuple
 import pyvisa
 
 # real mode:
@@ -355,6 +358,17 @@ class ANC300(VisaInstrument):
     """
 
     def __init__(self, name, address, **kwargs):
+        # serializes the communication, the move watcher thread asks the device too
+        self._comm_lock = threading.RLock()
+        # axis number, future and deadline of each move being watched
+        self._watched: List[Tuple[int, Future, Optional[float]]] = []
+        self._watch_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+        self._watch_interval = 0.0
+        # shortest and longest time between the checks of moving axes
+        self.poll_interval_min = 0.01
+        self.poll_interval_max = 1.0
         super().__init__(name, address, 5, '\r\n', **kwargs)
 
         # configure the port
@@ -412,6 +426,11 @@ class ANC300(VisaInstrument):
         Raises:
             RuntimeError: if Error-Message from the device is read.
         """
+        with self._comm_lock:
+            self._write_raw(cmd)
+
+
+    def _write_raw(self, cmd: str) -> None:
         status = super().ask_raw(cmd) # send the command to the device and read the echo/status
         if status == cmd:
             # now the device sends an echo
@@ -440,6 +459,11 @@ class ANC300(VisaInstrument):
         Raises:
             RuntimeError: if Error-Message from the device is read.
         """
+        with self._comm_lock:
+            return self._ask_raw(cmd)
+
+
+    def _ask_raw(self, cmd: str) -> str:
         response = super().ask_raw(cmd) # send the command to the device and read the echo/status
         if response.startswith('> '): # sometimes the response starts with '> '. I don't know why.
             response = response[2:]
@@ -474,11 +498,114 @@ class ANC300(VisaInstrument):
             self.write('stop {}'.format(a+1))
 
 
+    def move_axes(self, steps: Dict[int, int], timeout: float = 0) -> Dict[int, Future]:
+        """
+        Start moves on several axes without waiting for them to finish.
+
+        Args:
+            steps: the amount of steps to move for each axis number, the sign denotes
+                the direction
+            timeout: number of seconds after which a future fails with a RuntimeError
+                if the axis is still moving, 0 to wait forever
+
+        Returns:
+            Dict with a concurrent.futures.Future for each axis number, which is done
+            when the axis has stopped. Use asyncio.wrap_future to await it.
+        """
+        for axis, value in steps.items():
+            self.submodules['axis{}'.format(axis)].move(value)
+        return self.watch_axes(list(steps), timeout)
+
+
+    def watch_axes(self, axes: Sequence[int], timeout: float = 0) -> Dict[int, Future]:
+        """
+        Watch already moving axes until they stop.
+
+        All watched axes are checked in one loop in a background thread, like
+        Anc300Axis.waitMove does for a single axis. The checks start every
+        poll_interval_min seconds and back off to every poll_interval_max seconds.
+
+        Args:
+            axes: the axis numbers to watch
+            timeout: number of seconds after which a future fails with a RuntimeError
+                if the axis is still moving, 0 to wait forever
+
+        Returns:
+            Dict with a concurrent.futures.Future for each axis number, which is done
+            when the axis has stopped. Cancelling a future stops watching its axis.
+        """
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        futures: Dict[int, Future] = {}
+        with self._watch_lock:
+            for axis in axes:
+                futures[axis] = Future()
+                self._watched.append((axis, futures[axis], deadline))
+            # a new move should be noticed quickly again
+            self._watch_interval = self.poll_interval_min
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_moves,
+                                                 name='{}_moves'.format(self.name),
+                                                 daemon=True)
+                self._watcher.start()
+        return futures
+
+
+    def _watch_moves(self):
+        """
+        Background loop that checks the output voltage of all watched axes and
+        completes their futures when they have stopped.
+        """
+        while True:
+            with self._watch_lock:
+                if not self._watched or self._watch_stop.is_set():
+                    self._watcher = None
+                    return
+                watched = list(self._watched)
+            finished = []
+            for axis, future, deadline in watched:
+                if future.done():
+                    # cancelled by the caller
+                    finished.append(future)
+                    continue
+                try:
+                    volt = self.ask('geto {}'.format(axis))
+                except Exception as e:
+                    # a cancelled future must not be completed anymore
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                    finished.append(future)
+                    continue
+                if float(volt) == 0.0:
+                    if future.set_running_or_notify_cancel():
+                        future.set_result(None)
+                    finished.append(future)
+                elif deadline is not None and time.monotonic() >= deadline:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(
+                            RuntimeError('move of axis {} timed out'.format(axis)))
+                    finished.append(future)
+            with self._watch_lock:
+                self._watched = [w for w in self._watched if w[1] not in finished]
+                interval = self._watch_interval
+                self._watch_interval = min(2 * interval, self.poll_interval_max)
+            self._watch_stop.wait(interval)
+
+
     def close(self):
         """
         Override of the base class' close function
         """
         self.log.debug("Close the device.")
+        # stop the watcher before the connection goes away under its feet
+        self._watch_stop.set()
+        with self._watch_lock:
+            watcher = self._watcher
+        if watcher is not None and watcher is not threading.current_thread():
+            watcher.join()
+        with self._watch_lock:
+            for _, future, _ in self._watched:
+                future.cancel()
+            self._watched = []
         super().close()
 
 
@@ -4,7 +4,7 @@
 import logging
 import numpy as np
 import cmath, math
-from typing import Tuple, Any
+from typing import List, Tuple, Any
 
 from qcodes import VisaInstrument
 from qcodes.utils.validators import Numbers, Enum, Ints, Bool
@@ -94,11 +94,9 @@ class FrequencySweepMagPhase(MultiParameter):
 
         # get data from instrument
         self.instrument.write('CALC1:TRAC1:FORM SMITH')  # ensure correct format
-        sxx_raw = self.instrument.ask("CALC1:TRAC1:DATA:FDAT?")
+        sxx, = self.instrument._ask_traces("CALC1:TRAC1:DATA:FDAT?")
         self.instrument.write('CALC1:TRAC1:FORM MLOG')
 
-        # Get data as numpy array
-        sxx = np.fromstring(sxx_raw, dtype=float, sep=',')
         sxx = sxx[0::2] + 1j*sxx[1::2]
 
         return self.instrument._db(sxx), np.unwrap(np.angle(sxx))
@@ -164,10 +162,7 @@ class PointMagPhase(MultiParameter):
 
         # get data from instrument
         self.instrument.write('CALC1:TRAC1:FORM SMITH')  # ensure correct format
-        sxx_raw = self.instrument.ask("CALC1:TRAC1:DATA:FDAT?")
-
-        # Get data as numpy array
-        sxx = np.fromstring(sxx_raw, dtype=float, sep=',')
+        sxx, = self.instrument._ask_traces("CALC1:TRAC1:DATA:FDAT?")
         sxx = sxx[0::2] + 1j*sxx[1::2]
 
         # Return the average of the trace, which will have "start" as
@@ -523,34 +518,28 @@ class M5180(VisaInstrument):
             s22 magnitude [dB], s22 phase [rad]
         """
 
-        self.write('CALC1:PAR:COUN 4') # 4 trace
-        self.write('CALC1:PAR1:DEF S11') # Choose S11 for trace 1
-        self.write('CALC1:PAR2:DEF S12') # Choose S12 for trace 2
-        self.write('CALC1:PAR3:DEF S21') # Choose S21 for trace 3
-        self.write('CALC1:PAR4:DEF S22') # Choose S22 for trace 4
-        self.write('CALC1:TRAC1:FORM SMITH')  # Trace format
-        self.write('CALC1:TRAC2:FORM SMITH')  # Trace format
-        self.write('CALC1:TRAC3:FORM SMITH')  # Trace format
-        self.write('CALC1:TRAC4:FORM SMITH')  # Trace format
-        self.write('TRIG:SEQ:SING') # Trigger a single sweep
+        # Set up the four traces in a single message
+        self.write('CALC1:PAR:COUN 4;'  # 4 trace
+                   ':CALC1:PAR1:DEF S11;'  # Choose S11 for trace 1
+                   ':CALC1:PAR2:DEF S12;'  # Choose S12 for trace 2
+                   ':CALC1:PAR3:DEF S21;'  # Choose S21 for trace 3
+                   ':CALC1:PAR4:DEF S22;'  # Choose S22 for trace 4
+                   ':CALC1:TRAC1:FORM SMITH;'  # Trace format
+                   ':CALC1:TRAC2:FORM SMITH;'
+                   ':CALC1:TRAC3:FORM SMITH;'
+                   ':CALC1:TRAC4:FORM SMITH;'
+                   ':TRIG:SEQ:SING')  # Trigger a single sweep
         self.ask('*OPC?') # Wait for measurement to complete
 
-        # Get data as string
-        freq_raw = self.ask("SENS1:FREQ:DATA?")
-        s11_raw = self.ask("CALC1:TRAC1:DATA:FDAT?")
-        s12_raw = self.ask("CALC1:TRAC2:DATA:FDAT?")
-        s21_raw = self.ask("CALC1:TRAC3:DATA:FDAT?")
-        s22_raw = self.ask("CALC1:TRAC4:DATA:FDAT?")
-
-        # Get data as numpy array
-        freq = np.fromstring(freq_raw, dtype=float, sep=',')
-        s11 = np.fromstring(s11_raw, dtype=float, sep=',')
+        # Get data as numpy arrays
+        freq, s11, s12, s21, s22 = self._ask_traces("SENS1:FREQ:DATA?",
+                                                    "CALC1:TRAC1:DATA:FDAT?",
+                                                    "CALC1:TRAC2:DATA:FDAT?",
+                                                    "CALC1:TRAC3:DATA:FDAT?",
+                                                    "CALC1:TRAC4:DATA:FDAT?")
         s11 = s11[0::2] + 1j*s11[1::2]
-        s12 = np.fromstring(s12_raw, dtype=float, sep=',')
         s12 = s12[0::2] + 1j*s12[1::2]
-        s21 = np.fromstring(s21_raw, dtype=float, sep=',')
         s21 = s21[0::2] + 1j*s21[1::2]
-        s22 = np.fromstring(s22_raw, dtype=float, sep=',')
         s22 = s22[0::2] + 1j*s22[1::2]
 
         return (np.array(freq), self._db(s11), np.array(np.angle(s11)),
@@ -558,6 +547,28 @@ class M5180(VisaInstrument):
                                 self._db(s21), np.array(np.angle(s21)),
                                 self._db(s22), np.array(np.angle(s22)))
 
+    def _ask_traces(self, *cmds: str) -> List[np.ndarray]:
+        """
+        Queries trace data as binary blocks of little-endian 64-bit floats,
+        which is much faster to transfer and decode than ASCII for long
+        sweeps. The transfer format is switched to ``real`` first.
+
+        Args:
+            *cmds (str): Queries returning trace data.
+
+        Returns:
+            List[np.ndarray]: One array per query.
+        """
+        self.write('FORM:BORD SWAP;:FORM:DATA REAL')
+        self.data_transfer_format.cache.set('real')
+        traces = []
+        for cmd in cmds:
+            self.log.debug(f"Querying binary values: {cmd}")
+            traces.append(self.visa_handle.query_binary_values(
+                cmd, datatype='d', is_big_endian=False,
+                container=np.ndarray))
+        return traces
+
     def update_lin_traces(self) -> None:
         """
         Updates start, stop and npts of all trace parameters so that the
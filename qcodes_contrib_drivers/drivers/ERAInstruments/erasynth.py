@@ -15,7 +15,9 @@ This module provides the following drivers:
 """
 from __future__ import annotations
 
-from typing import Dict, List, Union, Tuple, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Union, Tuple, Optional
 import time
 import json
 import logging
@@ -74,6 +76,42 @@ A mapping used to read back certain commands to ensure they have been set.
 This is necessary due to non-deterministic communication times.
 """
 
+_SET_AND_CONFIRM_TO_JSON_MAPPING: Dict[str, str] = {
+    "P0": "rfoutput",
+    "A": "amplitude",
+    "F": "frequency",
+}
+"""
+JSON keys of the commands that are normally confirmed by the reply of the instrument,
+used when several settings are confirmed with one JSON readback.
+"""
+
+
+@dataclass(frozen=True)
+class ConfirmPolicy:
+    """
+    Bounds how long the driver keeps trying to confirm that a setting has been applied.
+
+    After each failed confirmation the command is sent again, after a delay that
+    starts at ``initial_delay`` and doubles up to ``max_delay``.
+    """
+
+    timeout: float = 10.0
+    """Seconds after which confirmation is given up."""
+    max_attempts: int = 20
+    """Maximum number of times the command is sent."""
+    initial_delay: float = 0.01
+    """Seconds to wait after the first failed confirmation."""
+    max_delay: float = 0.5
+    """Longest wait between attempts in seconds."""
+
+    def __post_init__(self) -> None:
+        if self.max_attempts < 1:
+            raise ValueError(
+                f"max_attempts must be at least 1, got {self.max_attempts}."
+            )
+
+
 class ERASynthBase(VisaInstrument):
     r"""
     A Base class for the ERASynth/ERASynth+/ERASynth++ instruments.
@@ -124,7 +162,14 @@ class ERASynthBase(VisaInstrument):
         self.debug_messages_en(False)  # Print less messages to improve communication
         self.wifi_off()  # print less messages to improve communication
 
-    def __init__(self, name: str, address: str, **kwargs):
+    def __init__(
+        self,
+        name: str,
+        address: str,
+        json_cache_max_age: float = 1.0,
+        confirm_policy: Optional[ConfirmPolicy] = None,
+        **kwargs,
+    ):
         """
         Create an instance of the instrument.
 
@@ -132,7 +177,16 @@ class ERASynthBase(VisaInstrument):
             name: Instrument name.
             address: Used to connect to the instrument.
                 Run :meth:`.ERASynthBase.print_pyvisa_resources` to list available list.
+            json_cache_max_age: Seconds during which a configuration or diagnostic
+                JSON is reused for parameter reads instead of being requested again.
+                Any write invalidates the cached JSONs. Use ``0`` to always request.
+            confirm_policy: Timeout, retries and backoff used when confirming that
+                a setting has been applied. Defaults to :class:`ConfirmPolicy`.
         """
+        self.json_cache_max_age = json_cache_max_age
+        self._json_cache: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self.confirm_policy = ConfirmPolicy() if confirm_policy is None else confirm_policy
+        self._pending_confirmations: Optional[Dict[str, Tuple[str, str]]] = None
         super().__init__(name=name, address=address, terminator="\r\n", **kwargs)
 
         # ##############################################################################
@@ -580,13 +634,95 @@ class ERASynthBase(VisaInstrument):
         if is_readable_cmd:
             json_key = _CMD_TO_JSON_MAPPING[command]
             cmd_arg = cmd[1 + len(command) :]
-            while True:
+            if self._pending_confirmations is not None:
+                super().write_raw(cmd)
+                self.clear_json_cache()
+                self._pending_confirmations[json_key] = (cmd, cmd_arg)
+                return
+            for _ in self._confirm_attempts(repr(cmd)):
                 super().write_raw(cmd)
+                self.clear_json_cache()
                 self.clear_read_buffer()
                 if self.get_configuration(json_key) == cmd_arg:
-                    break
+                    return
         else:
             super().write_raw(cmd)
+            self.clear_json_cache()
+
+    @contextmanager
+    def confirm_together(self) -> Iterator[None]:
+        """
+        Context manager that confirms all settings made inside it with a single
+        configuration readback when it exits, instead of confirming each setting
+        on its own.
+
+        .. code-block::
+
+            with lo.confirm_together():
+                lo.frequency(4.7e9)
+                lo.power(10)
+
+        Settings that do not match are sent again according to
+        :attr:`confirm_policy`.
+        """
+        if self._pending_confirmations is not None:
+            # Already confirming together
+            yield
+            return
+        self._pending_confirmations = {}
+        try:
+            yield
+            pending = self._pending_confirmations
+        finally:
+            self._pending_confirmations = None
+        self._confirm_pending(pending)
+
+    def _confirm_pending(self, pending: Dict[str, Tuple[str, str]]) -> None:
+        """
+        Reads the configuration until all pending settings are applied, resending
+        the ones that are not.
+        """
+        if not pending:
+            return
+        for _ in self._confirm_attempts(", ".join(cmd for cmd, _ in pending.values())):
+            self.clear_json_cache()
+            self.clear_read_buffer()
+            config_json = self.get_configuration()
+            assert isinstance(config_json, Dict)
+            pending = {
+                json_key: (cmd, cmd_arg)
+                for json_key, (cmd, cmd_arg) in pending.items()
+                if not _json_value_matches(config_json[json_key], cmd_arg)
+            }
+            if not pending:
+                return
+            for cmd, _ in pending.values():
+                super().write_raw(cmd)
+
+    def _confirm_attempts(self, description: str) -> Iterator[int]:
+        """
+        Yields once per attempt to confirm a setting, sleeping with exponential
+        backoff in between.
+
+        Raises:
+            TimeoutError: When the attempts or the time allowed by
+                :attr:`confirm_policy` are used up.
+        """
+        policy = self.confirm_policy
+        t_start = time.monotonic()
+        delay = policy.initial_delay
+        for attempt in range(policy.max_attempts):
+            yield attempt
+            if attempt == policy.max_attempts - 1:
+                break
+            if time.monotonic() - t_start + delay > policy.timeout:
+                break
+            time.sleep(delay)
+            delay = min(2 * delay, policy.max_delay)
+        raise TimeoutError(
+            f"Failed to confirm {description} in {attempt + 1} attempts "
+            f"within {policy.timeout} s."
+        )
 
     def _get_json(self, cmd: str, first_key: str) -> str:
         """
@@ -608,22 +744,42 @@ class ERASynthBase(VisaInstrument):
 
         return "".join(["{", *read_line.split("{")[1:]])
 
+    def _get_cached_json(self, cmd: str, first_key: str) -> Dict[str, str]:
+        """
+        Returns the parsed JSON of a previous identical request if it is not older
+        than :attr:`json_cache_max_age`, otherwise requests it.
+        """
+        t_now = time.monotonic()
+        cached = self._json_cache.get(cmd)
+        if cached is not None and t_now - cached[0] < self.json_cache_max_age:
+            return cached[1]
+        parsed_json = json.loads(self._get_json(cmd, first_key))
+        self._json_cache[cmd] = (t_now, parsed_json)
+        return parsed_json
+
+    def clear_json_cache(self) -> None:
+        """
+        Forces the next configuration and diagnostic reads to request the JSON from
+        the instrument.
+        """
+        self._json_cache.clear()
+
     # ERASynth specific methods
 
     def get_configuration(self, par_name: str = None) -> Union[Dict[str, str], str]:
         """
         Returns the configuration JSON that contains all parameters.
         """
-        config_json = json.loads(self._get_json("RA", "rfoutput"))
+        config_json = self._get_cached_json("RA", "rfoutput")
 
-        return config_json if par_name is None else config_json[par_name]
+        return dict(config_json) if par_name is None else config_json[par_name]
 
     def get_diagnostic_status(self, par_name: str = None) -> Union[Dict[str, str], str]:
         """
         Returns the diagnostic JSON.
         """
-        config_json = json.loads(self._get_json("RD", "temperature"))
-        return config_json if par_name is None else config_json[par_name]
+        config_json = self._get_cached_json("RD", "temperature")
+        return dict(config_json) if par_name is None else config_json[par_name]
 
     def preset(self) -> None:
         """
@@ -689,10 +845,18 @@ class ERASynthBase(VisaInstrument):
         take effect.
         """
         str_back = cmd_arg if str_back is None else str_back
-        while True:
+        self.clear_json_cache()
+        if self._pending_confirmations is not None:
+            self.write(f"{cmd}{cmd_arg}")
+            self._pending_confirmations[_SET_AND_CONFIRM_TO_JSON_MAPPING[cmd]] = (
+                f">{cmd}{cmd_arg}",
+                cmd_arg,
+            )
+            return
+        for _ in self._confirm_attempts(repr(f"{cmd}{cmd_arg}")):
             read_line = self.ask(f"{cmd}{cmd_arg}")
             if str_back in read_line:
-                break
+                return
 
     def _set_frequency(self, value: str) -> None:
         self._set_and_confirm(cmd="F", cmd_arg=value)
@@ -705,6 +869,19 @@ class ERASynthBase(VisaInstrument):
         self._set_and_confirm(cmd="P0", cmd_arg=value, str_back=str_back)
 
 
+def _json_value_matches(json_value: str, cmd_arg: str) -> bool:
+    """
+    Compares a configuration JSON value to the argument of the command that set it,
+    numerically if possible since the instrument may format numbers differently.
+    """
+    if json_value == cmd_arg:
+        return True
+    try:
+        return float(json_value) == float(cmd_arg)
+    except ValueError:
+        return False
+
+
 def _mk_frequency(self, max_frequency: float) -> Parameter:
     frequency = Parameter(
         name="frequency",
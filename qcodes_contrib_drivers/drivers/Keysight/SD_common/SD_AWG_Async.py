@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 import threading
-import queue
 import sys
-from typing import Dict, List, Union, Optional, TypeVar, Callable, Any, cast
+import hashlib
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Set, Tuple, Union, Optional, TypeVar, Callable, Any, cast
 import time
 import logging
 from functools import wraps
@@ -11,7 +12,7 @@ import numpy as np
 
 from .SD_Module import keysightSD1, result_parser
 from .SD_AWG import SD_AWG
-from .memory_manager import MemoryManager
+from .memory_manager import MemoryManager, AllocationStrategy, best_fit
 
 
 F = TypeVar('F', bound=Callable[..., Any])
@@ -63,6 +64,11 @@ class Task:
         self._instance = instance
         self._args = args
         self._kwargs = kwargs
+        self.movable: bool = False
+        ''' If True the task may be executed before preceding movable tasks. '''
+        self.on_cancel: Optional[Callable[[str], None]] = None
+        ''' Called with the reason when the task is cancelled before execution. '''
+        self._cancel_reason: Optional[str] = None
 
     def run(self) -> None:
         """
@@ -81,13 +87,27 @@ class Task:
                           f'/ {total*1000:5.2f} ms)')
         self._event.set()
 
+    def cancel(self, reason: str) -> None:
+        """
+        Marks the task as not executed. Waiters for the result get an exception.
+        """
+        self._cancel_reason = reason
+        if self.on_cancel is not None:
+            self.on_cancel(reason)
+        self._event.set()
+
     @property
     def result(self) -> Any:
         """
         Returns the result of the executed function.
         Waits till function has been executed.
+
+        Raises:
+            Exception: if the task was cancelled.
         """
         self._event.wait()
+        if self._cancel_reason is not None:
+            raise Exception(f'Task {self._f.__name__} cancelled: {self._cancel_reason}')
         return self._result
 
 
@@ -105,7 +125,7 @@ def threaded(wait: bool = False) -> Callable[[F], F]:
         def func_wrapper(self, *args, **kwargs):
 
             task = Task(func, self, *args, **kwargs)
-            self._task_queue.put(task)
+            self._submit_task(task)
             if wait:
                 result = task.result
                 self._start_time = None
@@ -117,6 +137,147 @@ def threaded(wait: bool = False) -> Callable[[F], F]:
     return threaded_decorator
 
 
+class UploadScheduler:
+    """
+    Executes the upload tasks of SD_AWG_Async modules with a pool of worker threads.
+
+    A scheduler can be shared by all modules in a chassis to coordinate the uploads.
+    The tasks of a module are executed one at a time in the order of submission,
+    except for uploads of waveforms that are needed first, which are moved ahead of
+    the other waiting uploads. Modules with waiting tasks are served round robin.
+    Modules without a shared scheduler create a private scheduler with one worker.
+
+    Example:
+        scheduler = UploadScheduler(n_workers=4)
+        awg1 = M3202A('awg1', 0, 2, upload_scheduler=scheduler)
+        awg2 = M3202A('awg2', 0, 3, upload_scheduler=scheduler)
+        ...
+        awg1.close()
+        awg2.close()
+        scheduler.stop()
+
+    Args:
+        n_workers: number of worker threads
+        name: name prefix of the worker threads
+    """
+
+    def __init__(self, n_workers: int = 4, name: str = 'uploader') -> None:
+        self._condition = threading.Condition()
+        self._pending: Dict[str, Deque[Task]] = {}
+        self._busy: Set[str] = set()
+        self._modules: Deque[str] = deque()
+        self._stopped = False
+        self._workers = [threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+                         for i in range(n_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def register(self, module_id: str) -> None:
+        """
+        Registers a module for execution of its tasks.
+        """
+        with self._condition:
+            if module_id in self._pending:
+                raise Exception(f'Module {module_id} already registered')
+            self._pending[module_id] = deque()
+            self._modules.append(module_id)
+
+    def unregister(self, module_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        Waits till all tasks of the module have been executed and unregisters it.
+        Tasks still waiting after timeout are cancelled, so that waiters for their
+        results and uploads get an exception instead of hanging.
+
+        Returns:
+            False if the tasks were not executed within timeout.
+        """
+        with self._condition:
+            done = self._condition.wait_for(
+                lambda: not self._pending[module_id] and module_id not in self._busy,
+                timeout)
+            dropped = self._pending.pop(module_id)
+            self._modules.remove(module_id)
+        for task in dropped:
+            task.cancel(f'module {module_id} unregistered')
+        return done
+
+    def submit(self, module_id: str, task: Task) -> None:
+        """
+        Submits a task for execution.
+        """
+        with self._condition:
+            self._pending[module_id].append(task)
+            self._condition.notify()
+
+    def prioritize(self, module_id: str, task: Task) -> None:
+        """
+        Moves a waiting movable task ahead of the directly preceding movable tasks.
+        Does nothing when the task is already being executed.
+        """
+        with self._condition:
+            pending = self._pending.get(module_id)
+            if pending is None or task not in pending:
+                return
+            index = pending.index(task)
+            position = index
+            while position > 0 and pending[position - 1].movable:
+                position -= 1
+            del pending[index]
+            pending.insert(position, task)
+
+    def stop(self, timeout: float = 15.0) -> None:
+        """
+        Stops the worker threads after all submitted tasks have been executed.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                logging.error(f'Upload thread {worker.name} stop failed. Thread still running.')
+
+    def _next_task(self) -> Optional[Tuple[str, Task]]:
+        for _ in range(len(self._modules)):
+            module_id = self._modules[0]
+            self._modules.rotate(-1)
+            if module_id not in self._busy and self._pending[module_id]:
+                return module_id, self._pending[module_id].popleft()
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                next_task = self._next_task()
+                while next_task is None:
+                    if self._stopped:
+                        return
+                    self._condition.wait()
+                    next_task = self._next_task()
+                module_id, task = next_task
+                self._busy.add(module_id)
+            try:
+                task.run()
+            except:
+                logging.error('Task thread error', exc_info=True)
+            finally:
+                del task
+                with self._condition:
+                    self._busy.discard(module_id)
+                    self._condition.notify_all()
+
+
+def wait_uploaded(waveform_refs: Iterable['WaveformReference']) -> None:
+    """
+    Waits till all waveforms have been uploaded.
+
+    Args:
+        waveform_refs: references to the waveforms, possibly on multiple modules.
+    """
+    for ref in waveform_refs:
+        ref.wait_uploaded()
+
+
 class WaveformReference:
     """
     This is a reference to a waveform (being) uploaded to the AWG.
@@ -179,17 +340,24 @@ class _WaveformReferenceInternal(WaveformReference):
         self._upload_error: Optional[str] = None
         self._released: bool = False
         self._queued_count: int = 0
+        self._ref_count: int = 1
+        self._cache_key: Optional[Tuple[str, int, bytes]] = None
+        self._upload_duration: float = 0.0
+        self._upload_task: Optional[Task] = None
 
 
     def release(self) -> None:
         """
         Releases the memory for reuse.
+        A waveform shared via the waveform cache stays in memory till it is evicted.
         """
-        if self._released:
+        if self._released or self._ref_count <= 0:
             raise Exception('Reference already released')
 
-        self._released = True
-        self._try_release_slot()
+        self._ref_count -= 1
+        if self._ref_count == 0 and self._cache_key is None:
+            self._released = True
+            self._try_release_slot()
 
 
     def wait_uploaded(self) -> None:
@@ -219,6 +387,12 @@ class _WaveformReferenceInternal(WaveformReference):
         return self._uploaded.is_set()
 
 
+    def _upload_cancelled(self, reason: str) -> None:
+        self._upload_error = f'upload cancelled: {reason}'
+        self._upload_task = None
+        self._uploaded.set()
+
+
     def enqueued(self) -> None:
         self._queued_count += 1
 
@@ -235,10 +409,99 @@ class _WaveformReferenceInternal(WaveformReference):
 
     def __del__(self) -> None:
         if not self._released:
-            logging.warning(f'WaveformReference was not released '
-                            f'({self.awg_name}:{self.wave_number}). Automatic '
-                            f'release in destructor.')
-            self.release()
+            if self._ref_count > 0:
+                logging.warning(f'WaveformReference was not released '
+                                f'({self.awg_name}:{self.wave_number}). Automatic '
+                                f'release in destructor.')
+            self._released = True
+            self._try_release_slot()
+
+
+class _WaveformCache:
+    """
+    Cache of uploaded waveforms addressed by a hash of the waveform data.
+
+    A waveform that is uploaded again gets the reference to the waveform already
+    in AWG memory. The reference is shared and released when all users released it.
+    Unused waveforms stay in AWG memory till they are evicted, least recently
+    used first, when the memory manager has no free slot left.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple[str, int, bytes], _WaveformReferenceInternal] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.saved_upload_time: float = 0.0
+
+    @staticmethod
+    def key(wave: Union[List[float], List[int], np.ndarray]) -> Tuple[str, int, bytes]:
+        """
+        Returns the key of the waveform data.
+        """
+        if isinstance(wave, np.ndarray) and wave.dtype == np.int16:
+            data = np.ascontiguousarray(wave)
+        else:
+            data = np.ascontiguousarray(wave, dtype=float)
+        return (data.dtype.str, len(data), hashlib.blake2b(data.data, digest_size=16).digest())
+
+    def get(self, key: Tuple[str, int, bytes]) -> Optional[_WaveformReferenceInternal]:
+        """
+        Returns a new share of the cached reference, or None if the waveform is not cached.
+        """
+        ref = self._entries.get(key)
+        if ref is not None and ref._upload_error:
+            self._remove(ref)
+            ref = None
+        if ref is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        ref._ref_count += 1
+        self.hits += 1
+        self.saved_upload_time += ref._upload_duration
+        return ref
+
+    def add(self, key: Tuple[str, int, bytes], ref: _WaveformReferenceInternal) -> None:
+        ref._cache_key = key
+        self._entries[key] = ref
+
+    def evict(self, wave_size: int) -> bool:
+        """
+        Evicts the least recently used waveform that is not in use and
+        occupies a slot of at least `wave_size` samples.
+
+        Returns:
+            True if a waveform has been evicted.
+        """
+        for ref in self._entries.values():
+            if (ref._ref_count == 0 and ref._queued_count <= 0
+                    and ref._allocated_slot.size >= wave_size):
+                self._remove(ref)
+                self.evictions += 1
+                return True
+        return False
+
+    def clear(self) -> None:
+        for ref in list(self._entries.values()):
+            self._remove(ref)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'saved_upload_time': self.saved_upload_time,
+            }
+
+    def _remove(self, ref: _WaveformReferenceInternal) -> None:
+        del self._entries[cast(Tuple[str, int, bytes], ref._cache_key)]
+        ref._cache_key = None
+        if ref._ref_count == 0:
+            ref._released = True
+            ref._try_release_slot()
 
 
 class SD_AWG_Async(SD_AWG):
@@ -283,17 +546,36 @@ class SD_AWG_Async(SD_AWG):
             should be used. (Legacy numbering starts with channel 0)
         waveform_size_limit (int): maximum size of waveform that can be uploaded
         asynchronous (bool): if False the memory manager and asynchronous functionality are disabled.
+        memory_sizes (Optional[List[Tuple[int, int]]]): list with (slot size, number of slots) to
+            reserve in AWG memory. Defaults to `MemoryManager.memory_sizes`.
+        allocation_strategy (AllocationStrategy): function selecting the memory slot size
+            for a waveform. Defaults to `best_fit`.
+        waveform_cache (bool): if True identical waveforms are uploaded only once and
+            share the waveform reference.
+        upload_scheduler (Optional[UploadScheduler]): scheduler shared with other modules
+            to execute the uploads. If None the module uses a private upload thread.
     """
 
     _modules: Dict[str, 'SD_AWG_Async'] = {}
     """ All async modules by unique module id. """
 
     def __init__(self, name, chassis, slot, channels, triggers, waveform_size_limit=1e6,
-                 asynchronous=True, **kwargs) -> None:
+                 asynchronous=True,
+                 memory_sizes: Optional[List[Tuple[int, int]]] = None,
+                 allocation_strategy: AllocationStrategy = best_fit,
+                 waveform_cache: bool = False,
+                 upload_scheduler: Optional[UploadScheduler] = None,
+                 **kwargs) -> None:
         super().__init__(name, chassis, slot, channels, triggers, **kwargs)
 
         self._asynchronous = False
         self._waveform_size_limit = waveform_size_limit
+        self._memory_sizes = memory_sizes
+        self._allocation_strategy = allocation_strategy
+        self._use_waveform_cache = waveform_cache
+        self._shared_scheduler = upload_scheduler
+        self._upload_stats: Dict[str, float] = {
+            'uploads': 0, 'samples': 0, 'duration': 0.0, 'last MSa/s': 0.0}
         self._start_time = None
 
         module_id = self._get_module_id()
@@ -551,6 +833,9 @@ class SD_AWG_Async(SD_AWG):
 
             self.log.debug(f'Enqueue {waveform_ref.wave_number}')
             if not waveform_ref.is_uploaded():
+                upload_task = waveform_ref._upload_task
+                if upload_task is not None:
+                    self._scheduler.prioritize(self.module_id, upload_task)
                 start = time.perf_counter()
                 self.log.debug(f'Waiting till wave {waveform_ref.wave_number} is uploaded')
                 waveform_ref.wait_uploaded()
@@ -586,6 +871,8 @@ class SD_AWG_Async(SD_AWG):
                         ) -> _WaveformReferenceInternal:
         """
         Upload the wave using the uploader thread for this AWG.
+        Wave data in an int16 numpy array is loaded without conversion,
+        where -32768..32767 is the full scale of the AWG.
         Args:
             wave: wave data to upload.
         Returns:
@@ -594,13 +881,66 @@ class SD_AWG_Async(SD_AWG):
         if len(wave) < 2000:
             raise Exception(f'{len(wave)} is less than 2000 samples required for proper functioning of AWG')
 
-        allocated_slot = self._memory_manager.allocate(len(wave))
+        if self._waveform_cache is not None:
+            key = self._waveform_cache.key(wave)
+            cached_ref = self._waveform_cache.get(key)
+            if cached_ref is not None:
+                self.log.debug(f'upload: {cached_ref.wave_number} (cached)')
+                return cached_ref
+
+        allocated_slot = self._allocate(len(wave))
         ref = _WaveformReferenceInternal(allocated_slot, self.name)
+        if self._waveform_cache is not None:
+            self._waveform_cache.add(key, ref)
         self.log.debug(f'upload: {ref.wave_number}')
         self._upload(wave, ref)
         return ref
 
 
+    @switchable(asynchronous, enabled=True)
+    def upload_waveforms(self, waves: List[Union[List[float], List[int], np.ndarray]],
+                         priority: bool = False) -> List[_WaveformReferenceInternal]:
+        """
+        Upload a batch of waves, e.g. all waves of a sequence.
+        The uploads can be awaited together with `wait_uploaded`.
+
+        Args:
+            waves: list with wave data to upload.
+            priority: if True the waves are uploaded before previously submitted uploads.
+        Returns:
+            references to the waves
+        """
+        refs = [self.upload_waveform(wave) for wave in waves]
+        if priority:
+            for ref in reversed(refs):
+                upload_task = ref._upload_task
+                if upload_task is not None:
+                    self._scheduler.prioritize(self.module_id, upload_task)
+        return refs
+
+
+    @switchable(asynchronous, enabled=True)
+    def upload_stats(self) -> Dict[str, float]:
+        """
+        Returns the number of uploaded waveforms and samples, the total upload time
+        and the average and last upload speed in MSa/s.
+        """
+        stats = self._upload_stats.copy()
+        stats['average MSa/s'] = stats['samples'] / stats['duration'] / 1e6 if stats['duration'] else 0.0
+        return stats
+
+
+    @switchable(asynchronous, enabled=True)
+    def waveform_cache_stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of entries, hits, misses and evictions of the waveform cache
+        and the upload time saved by the hits.
+        """
+        if self._waveform_cache is None:
+            raise Exception('Waveform cache is not enabled')
+        return self._waveform_cache.stats()
+
+
     def close(self) -> None:
         """
         Closes the module and stops background thread.
@@ -614,6 +954,27 @@ class SD_AWG_Async(SD_AWG):
         super().close()
 
 
+    def _allocate(self, wave_size: int) -> MemoryManager.AllocatedSlot:
+        """
+        Allocates a memory slot. Evicts unused waveforms from the cache when no slot is free.
+        """
+        while True:
+            try:
+                return self._memory_manager.allocate(wave_size)
+            except Exception:
+                if (self._waveform_cache is None
+                        or wave_size > self._memory_manager.max_waveform_size
+                        or not self._waveform_cache.evict(wave_size)):
+                    raise
+
+
+    def _submit_task(self, task: Task) -> None:
+        """
+        Submits a task for execution in the uploader thread.
+        """
+        self._scheduler.submit(self.module_id, task)
+
+
     def _get_module_id(self) -> str:
         """
         Generates a unique name for this module.
@@ -626,33 +987,38 @@ class SD_AWG_Async(SD_AWG):
         Starts the asynchronous upload thread and memory manager.
         """
         super().flush_waveform()
-        self._memory_manager: MemoryManager = MemoryManager(self.log, self._waveform_size_limit)
+        self._memory_manager: MemoryManager = MemoryManager(self.log, self._waveform_size_limit,
+                                                            self._memory_sizes, self._allocation_strategy)
         self._enqueued_waverefs:Dict[int, List[_WaveformReferenceInternal]] = {}
         for i in range(self.channels):
             self._enqueued_waverefs[i+1] = []
 
-        self._task_queue: queue.Queue = queue.Queue()
+        self._waveform_cache: Optional[_WaveformCache] = _WaveformCache() if self._use_waveform_cache else None
+
+        self._scheduler: UploadScheduler = (
+            self._shared_scheduler if self._shared_scheduler is not None
+            else UploadScheduler(1, name=f'uploader-{self.module_id}'))
+        self._scheduler.register(self.module_id)
         self._init_awg_memory()
-        self._thread: threading.Thread = threading.Thread(target=self._run, name=f'uploader-{self.module_id}')
-        self._thread.start()
+        self.log.info('Uploader ready')
 
 
     def _stop_asynchronous(self) -> None:
         """
         Stops the asynchronous upload thread and memory manager.
         """
-        if self._task_queue:
-            self._task_queue.put('STOP')
-
         # wait at most 15 seconds. Should be more enough for normal scenarios
-        self._thread.join(15)
-        if self._thread.is_alive():
-            self.log.error(f'AWG upload thread {self.module_id} stop failed. Thread still running.')
+        if not self._scheduler.unregister(self.module_id, 15):
+            self.log.error(f'AWG upload tasks {self.module_id} not completed.')
+        if self._scheduler is not self._shared_scheduler:
+            self._scheduler.stop()
+        self.log.info('Uploader terminated')
 
         self._release_waverefs()
+        if self._waveform_cache is not None:
+            self._waveform_cache.clear()
         del self._memory_manager
-        del self._task_queue
-        del self._thread
+        del self._scheduler
 
 
     def _release_waverefs(self) -> None:
@@ -696,45 +1062,54 @@ class SD_AWG_Async(SD_AWG):
         self.log.info(f'Awg memory reserved: {len(new_slots)} slots, {total_size/1e6} MSa in '
                       f'{total_duration*1000:5.2f} ms ({total_size/total_duration/1e6:5.2f} MSa/s)')
 
-    @threaded()
     def _upload(self,
                 wave_data: Union[List[float], List[int], np.ndarray],
                 wave_ref: _WaveformReferenceInternal) -> None:
+        """
+        Submits the upload of the wave. Uploads can be moved ahead of other uploads.
+        """
+        task = Task(SD_AWG_Async._upload_wave, self, wave_data, wave_ref)
+        task.movable = True
+        task.on_cancel = wave_ref._upload_cancelled
+        wave_ref._upload_task = task
+        self._submit_task(task)
+
+
+    def _upload_wave(self,
+                     wave_data: Union[List[float], List[int], np.ndarray],
+                     wave_ref: _WaveformReferenceInternal) -> None:
         # self.log.debug(f'Uploading {wave_ref.wave_number}')
+        is_int16 = isinstance(wave_data, np.ndarray) and wave_data.dtype == np.int16
         try:
             start = time.perf_counter()
 
-            wave = keysightSD1.SD_Wave()
-            result_parser(wave.newFromArrayDouble(keysightSD1.SD_WaveformTypes.WAVE_ANALOG, wave_data))
-            super().reload_waveform(wave, wave_ref.wave_number)
+            if is_int16:
+                super().reload_waveform_int16(keysightSD1.SD_WaveformTypes.WAVE_ANALOG,
+                                              wave_data, wave_ref.wave_number)
+            else:
+                wave = keysightSD1.SD_Wave()
+                result_parser(wave.newFromArrayDouble(keysightSD1.SD_WaveformTypes.WAVE_ANALOG, wave_data))
+                super().reload_waveform(wave, wave_ref.wave_number)
 
             duration = time.perf_counter() - start
+            wave_ref._upload_duration = duration
             speed = len(wave_data)/duration
+            stats = self._upload_stats
+            stats['uploads'] += 1
+            stats['samples'] += len(wave_data)
+            stats['duration'] += duration
+            stats['last MSa/s'] = speed/1e6
             self.log.debug(f'Uploaded {wave_ref.wave_number} in {duration*1000:5.2f} ms ({speed/1e6:5.2f} MSa/s)')
         except Exception as ex:
             msg = f'{type(ex).__name__}:{ex}'
-            min_value = np.min(wave_data)
-            max_value = np.max(wave_data)
-            if min_value < -1.0 or max_value > 1.0:
-                msg += ': Voltage out of range'
+            if not is_int16:
+                min_value = np.min(wave_data)
+                max_value = np.max(wave_data)
+                if min_value < -1.0 or max_value > 1.0:
+                    msg += ': Voltage out of range'
             self.log.error(f'Failure load waveform {wave_ref.wave_number}: {msg}' )
             wave_ref._upload_error = msg
 
         # signal upload done, either successful or with error
+        wave_ref._upload_task = None
         wave_ref._uploaded.set()
-
-
-    def _run(self) -> None:
-        self.log.info('Uploader ready')
-
-        while True:
-            task: Task = self._task_queue.get()
-            if task == 'STOP':
-                break
-            try:
-                task.run()
-            except:
-                logging.error('Task thread error', exc_info=True)
-            del task
-
-        self.log.info('Uploader terminated')
@@ -1,9 +1,41 @@
 # -*- coding: utf-8 -*-
+from collections import deque
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import Callable, Deque, List, Dict, Optional, Tuple
 import logging
 from datetime import datetime
 
+
+AllocationStrategy = Callable[[int, Dict[int, int]], Optional[int]]
+"""
+Selects the slot size for a waveform.
+Called with the waveform size and the number of free slots per created slot size.
+Returns the selected slot size or None if no suitable slot is available.
+"""
+
+
+def best_fit(wave_size: int, free_slots: Dict[int, int]) -> Optional[int]:
+    """
+    Selects the smallest slot size with a free slot that fits the waveform.
+    Falls back to larger slots when all slots of the best size are in use.
+    """
+    for slot_size in sorted(free_slots):
+        if slot_size >= wave_size and free_slots[slot_size] > 0:
+            return slot_size
+    return None
+
+
+def exact_fit(wave_size: int, free_slots: Dict[int, int]) -> Optional[int]:
+    """
+    Selects the smallest slot size that fits the waveform, but never falls back
+    to larger slots. Keeps the large slots available for large waveforms.
+    """
+    for slot_size in sorted(free_slots):
+        if slot_size >= wave_size:
+            return slot_size if free_slots[slot_size] > 0 else None
+    return None
+
+
 class MemoryManager:
     """
     Memory manager for AWG memory.
@@ -18,8 +50,18 @@ class MemoryManager:
         8: 1e7 samples
         4: 1e8 samples
 
+    The number of slots per size can be changed with `memory_sizes` to match
+    the waveforms of an experiment, e.g. more slots of 1e5 samples when many
+    medium sized waveforms are used.
+    Free slots are kept in a FIFO per slot size. The slot size used for a
+    waveform is selected by the allocation `strategy`.
+
     Args:
         waveform_size_limit: maximum waveform size to support.
+        memory_sizes: list with (slot size, number of slots).
+            Defaults to `MemoryManager.memory_sizes`.
+        strategy: function selecting the slot size for a waveform.
+            Defaults to `best_fit`.
     """
     verbose = False
 
@@ -28,6 +70,7 @@ class MemoryManager:
         number: int
         allocation_ref: int
         memory_manager: 'MemoryManager'
+        size: int
 
         def release(self) -> None:
             self.memory_manager.release(self)
@@ -43,6 +86,8 @@ class MemoryManager:
         Used to check for incorrect or missing release calls.
         '''
         allocation_time: str = ''
+        wave_size: int = 0
+        '''Size of the waveform stored in the slot.'''
 
     # Note (M3202A): size must be multiples of 10 and >= 2000
     memory_sizes = [
@@ -53,19 +98,38 @@ class MemoryManager:
             (int(1e8), 4) # Uploading 4e8 samples takes 7.3s.
             ]
 
-    def __init__(self, log, waveform_size_limit: int = int(1e6)) -> None:
+    def __init__(self, log, waveform_size_limit: int = int(1e6),
+                 memory_sizes: Optional[List[Tuple[int, int]]] = None,
+                 strategy: AllocationStrategy = best_fit) -> None:
         self._log = log
         self._allocation_ref_count: int = 0
         self._created_size: int = 0
         self._max_waveform_size: int = 0
-
-        self._free_memory_slots: Dict[int, List[int]] = {}
+        self._strategy = strategy
+        self._n_oversized: int = 0
+        self._n_failed: int = 0
+
+        if memory_sizes is None:
+            memory_sizes = MemoryManager.memory_sizes
+        for size, _ in memory_sizes:
+            if size < 2000 or size % 10 != 0:
+                raise Exception(f'Invalid slot size {size}. Size must be a '
+                                f'multiple of 10 and >= 2000')
+        self._memory_sizes = sorted(memory_sizes)
+
+        self._free_memory_slots: Dict[int, Deque[int]] = {}
         self._slots: List[MemoryManager._MemorySlot] = []
-        self._slot_sizes = sorted([size for size, _ in
-                                   MemoryManager.memory_sizes])
+        self._slot_sizes = [size for size, _ in self._memory_sizes]
 
         self.set_waveform_limit(waveform_size_limit)
 
+    @property
+    def max_waveform_size(self) -> int:
+        """
+        Maximum size of waveform that can be allocated.
+        """
+        return self._max_waveform_size
+
     def set_waveform_limit(self, waveform_size_limit: int) -> None:
         """
         Increases the maximum size of waveforms that can be uploaded.
@@ -111,24 +175,25 @@ class MemoryManager:
                             f'Max size={self._max_waveform_size}. Increase '
                             f'waveform size limit with set_waveform_limit().')
 
-        for slot_size in self._slot_sizes:
-            if wave_size > slot_size:
-                continue
-            if slot_size > self._created_size:
-                # slots of this size are not initialized.
-                break
-            if len(self._free_memory_slots[slot_size]) > 0:
-                slot = self._free_memory_slots[slot_size].pop(0)
-                self._allocation_ref_count += 1
-                self._slots[slot].allocation_ref = self._allocation_ref_count
-                self._slots[slot].allocated = True
-                self._slots[slot].allocation_time = datetime.now().strftime('%H:%M:%S.%f')
-                if MemoryManager.verbose:
-                    self._log.debug(f'Allocated slot {slot}')
-                return MemoryManager.AllocatedSlot(slot, self._slots[slot].allocation_ref, self)
-
-        raise Exception(f'No free memory slots left for waveform with'
-                        f' {wave_size} samples.')
+        free_slots = {size: len(slots) for size, slots in self._free_memory_slots.items()}
+        slot_size = self._strategy(wave_size, free_slots)
+        if slot_size is None or not self._free_memory_slots.get(slot_size):
+            self._n_failed += 1
+            raise Exception(f'No free memory slots left for waveform with'
+                            f' {wave_size} samples.')
+
+        if slot_size > self._get_slot_size(wave_size):
+            self._n_oversized += 1
+
+        slot = self._free_memory_slots[slot_size].popleft()
+        self._allocation_ref_count += 1
+        self._slots[slot].allocation_ref = self._allocation_ref_count
+        self._slots[slot].allocated = True
+        self._slots[slot].allocation_time = datetime.now().strftime('%H:%M:%S.%f')
+        self._slots[slot].wave_size = wave_size
+        if MemoryManager.verbose:
+            self._log.debug(f'Allocated slot {slot}')
+        return MemoryManager.AllocatedSlot(slot, self._slots[slot].allocation_ref, self, slot_size)
 
     def release(self, allocated_slot: AllocatedSlot) -> None:
         """
@@ -147,6 +212,7 @@ class MemoryManager:
 
         slot.allocated = False
         slot.allocation_ref = 0
+        slot.wave_size = 0
         self._free_memory_slots[slot.size].append(slot_number)
 
         if MemoryManager.verbose:
@@ -163,13 +229,13 @@ class MemoryManager:
         free_slots = self._free_memory_slots
         slots = self._slots
 
-        for size, amount in sorted(MemoryManager.memory_sizes):
+        for size, amount in self._memory_sizes:
             if size > creation_limit:
                 break
             if size <= self._created_size:
                 continue
 
-            free_slots[size] = []
+            free_slots[size] = deque()
             for i in range(amount):
                 number = len(slots)
                 free_slots[size].append(number)
@@ -211,3 +277,30 @@ class MemoryManager:
         result[' Free'] = {size:len(slots) for size,slots in self._free_memory_slots.items()}
         result['Allocated'] = [slot for slot in self._slots if slot.allocated]
         return result
+
+    def fragmentation(self):
+        '''
+        Returns statistics on the use of the allocated memory.
+
+        'allocated' is the total size of the allocated slots, 'used' is the
+        total size of the waveforms in these slots and 'unused_fraction' is
+        the part of the allocated memory not used by the waveforms.
+        'oversized' counts the allocations that did not fit in a slot of the
+        smallest suitable size and 'failed' the allocations without free slot.
+
+        Example:
+            pprint(awg._memory_manager.fragmentation(), sort_dicts=False)
+        '''
+        allocated = 0
+        used = 0
+        for slot in self._slots:
+            if slot.allocated:
+                allocated += slot.size
+                used += slot.wave_size
+        return {
+            'allocated': allocated,
+            'used': used,
+            'unused_fraction': 1 - used/allocated if allocated else 0.0,
+            'oversized': self._n_oversized,
+            'failed': self._n_failed,
+            }
@@ -11,7 +11,7 @@ acquiring data on multiple analog inputs, see
 https://scanning-squid.readthedocs.io/en/latest/_modules/microscope/susceptometer.html#SusceptometerMicroscope.scan_surface
 """
 
-from typing import Dict, Optional, Sequence, Any, Union
+from typing import Dict, List, Optional, Sequence, Any, Tuple, Union
 import numpy as np
 
 import nidaqmx
@@ -21,6 +21,20 @@ from qcodes.instrument.parameter import Parameter, ArrayParameter, ParameterWith
 from qcodes.utils.helpers import create_on_off_val_mapping
 from nidaqmx.constants import LineGrouping
 
+def _average_samples(data_raw: Any, nchannels: int, target_points: int) -> np.ndarray:
+    """Averages consecutive samples of each channel down to `target_points` points.
+
+    Args:
+        data_raw: Samples as returned by nidaqmx.Task.read, (nchannels, samples).
+        nchannels: Number of channels read.
+        target_points: Number of points per channel after averaging.
+
+    Returns:
+        Array of shape (nchannels, target_points).
+    """
+    data_raw = np.asarray(data_raw, dtype=float)
+    return data_raw.reshape(nchannels, target_points, -1).mean(axis=2)
+
 class DAQAnalogInputVoltages(ArrayParameter):
     """Acquires data from one or several DAQ analog inputs.
 
@@ -44,8 +58,8 @@ class DAQAnalogInputVoltages(ArrayParameter):
         """Averages data to get `self.target_points` points per channel.
         If `self.target_points` == `self.samples_to_read`, no averaging is done.
         """
-        data_raw = np.array(self.task.read(number_of_samples_per_channel=self.samples_to_read, timeout=self.timeout))
-        return np.mean(np.reshape(data_raw, (self.nchannels, self.target_points, -1)), 2)
+        data_raw = self.task.read(number_of_samples_per_channel=self.samples_to_read, timeout=self.timeout)
+        return _average_samples(data_raw, self.nchannels, self.target_points)
     
 class DAQAnalogInputs(Instrument):
     """Instrument to acquire DAQ analog input data in a qcodes Loop or measurement.
@@ -79,7 +93,9 @@ class DAQAnalogInputs(Instrument):
                 target_points = samples_to_read
         self.rate = rate
         nchannels = len(channels)
+        self.nchannels = nchannels
         self.samples_to_read = samples_to_read
+        self.clock_src = clock_src
         self.task = task
         self.metadata.update({
             'dev_name': dev_name,
@@ -88,36 +104,42 @@ class DAQAnalogInputs(Instrument):
         for ch, idx in channels.items():
             channel = f'{dev_name}/ai{idx}'
             self.task.ai_channels.add_ai_voltage_chan(channel, ch, min_val=min_val, max_val=max_val)
+        self._configure_timing(rate, clock_src, samples_to_read)
+        # We need a parameter in order to acquire voltage in a qcodes Loop or Measurement
+        self.add_parameter(
+            name='voltage',
+            parameter_class=DAQAnalogInputVoltages,
+            task=self.task,
+            samples_to_read=samples_to_read,
+            shape=(nchannels, target_points),
+            timeout=timeout,
+            label='Voltage',
+            unit='V'
+        ) 
+
+    def _configure_timing(self, rate: Union[int, float], clock_src: Optional[str],
+                          samples: int) -> None:
         if clock_src is None:
             # Use default sample clock timing: ai/SampleClockTimebase
             self.task.timing.cfg_samp_clk_timing(
                 rate,
                 sample_mode=AcquisitionType.FINITE,
-                samps_per_chan=samples_to_read)
+                samps_per_chan=samples)
         else:
             # Clock the inputs on some other clock signal, e.g. ao/SampleClock for synchronous acquisition
             self.task.timing.cfg_samp_clk_timing(
                     rate,
                     source=clock_src,
                     sample_mode=AcquisitionType.FINITE,
-                    samps_per_chan=samples_to_read
+                    samps_per_chan=samples
             )
-        # We need a parameter in order to acquire voltage in a qcodes Loop or Measurement
-        self.add_parameter(
-            name='voltage',
-            parameter_class=DAQAnalogInputVoltages,
-            task=self.task,
-            samples_to_read=samples_to_read,
-            shape=(nchannels, target_points),
-            timeout=timeout,
-            label='Voltage',
-            unit='V'
-        ) 
 
 class DAQAnalogOutputVoltage(Parameter):
     """Writes data to one or several DAQ analog outputs. This only writes one channel at a time,
     since Qcodes ArrayParameters are not settable.
 
+    The nidaqmx task is kept by the DAQAnalogOutputs instrument, so it is only created once.
+
     Args:
         name: Name of parameter (usually 'voltage').
         dev_name: DAQ device name (e.g. 'Dev1').
@@ -131,11 +153,7 @@ class DAQAnalogOutputVoltage(Parameter):
         self._voltage = np.nan
      
     def set_raw(self, voltage: Union[int, float]) -> None:
-        with nidaqmx.Task('daq_ao_task') as ao_task:
-            channel = f'{self.dev_name}/ao{self.idx}'
-            ao_task.ao_channels.add_ao_voltage_chan(channel, self.name)
-            ao_task.write(voltage, auto_start=True)
-        self._voltage = voltage
+        self.instrument._write_voltages([self], [voltage])
 
     def get_raw(self):
         """Returns last voltage array written to outputs.
@@ -145,6 +163,10 @@ class DAQAnalogOutputVoltage(Parameter):
 class DAQAnalogOutputs(Instrument):
     """Instrument to write DAQ analog output data in a qcodes Loop or measurement.
 
+    A long-lived nidaqmx task is kept for each single channel and one for all channels
+    together (see the `voltages` parameter). Only the task in use reserves the outputs.
+    The tasks are released by `close()`.
+
     Args:
         name: Name of instrument (usually 'daq_ao').
         dev_name: NI DAQ device name (e.g. 'Dev1').
@@ -156,6 +178,11 @@ class DAQAnalogOutputs(Instrument):
         self.metadata.update({
             'dev_name': dev_name,
             'channels': channels})
+        self.dev_name = dev_name
+        self._tasks: Dict[Tuple[int, ...], Any] = {}
+        self._scan_task: Any = None
+        self._active_task: Optional[Tuple[int, ...]] = None
+        self._outputs: List[DAQAnalogOutputVoltage] = []
         # We need parameters in order to write voltages in a qcodes Loop or Measurement
         for ch, idx in channels.items():
             self.add_parameter(
@@ -166,6 +193,128 @@ class DAQAnalogOutputs(Instrument):
                 label='Voltage',
                 unit='V'
             )
+            self._outputs.append(self.parameters[f'voltage_{ch.lower()}'])
+        self.add_parameter(
+            name='voltages',
+            get_cmd=lambda: np.array([output._voltage for output in self._outputs]),
+            set_cmd=lambda voltages: self._write_voltages(self._outputs, voltages),
+            label='Voltages',
+            unit='V',
+            docstring='Voltages of all channels, in the order of `channels`, '
+                      'written with a single task.write call.'
+        )
+
+    def _write_voltages(self, outputs: Sequence[DAQAnalogOutputVoltage],
+                        voltages: Sequence[float]) -> None:
+        if len(voltages) != len(outputs):
+            raise ValueError(f'Expected {len(outputs)} voltages, got {len(voltages)}')
+        task = self._task(outputs)
+        if len(outputs) == 1:
+            task.write(voltages[0])
+        else:
+            task.write(np.asarray(voltages, dtype=float))
+        for output, voltage in zip(outputs, voltages):
+            output._voltage = voltage
+            if len(outputs) > 1:
+                output.cache.set(voltage)
+
+    def _task(self, outputs: Sequence[DAQAnalogOutputVoltage]) -> Any:
+        """Returns the started task for the given outputs, creating it if needed.
+
+        A physical channel can only be reserved by one task at a time, so the previously
+        used task is unreserved first.
+        """
+        key = tuple(output.idx for output in outputs)
+        if self._active_task == key:
+            return self._tasks[key]
+        self._unreserve_active_task()
+        task = self._tasks.get(key)
+        if task is None:
+            task = nidaqmx.Task(f'{self.name}_ao{"_".join(map(str, key))}')
+            for output in outputs:
+                task.ao_channels.add_ao_voltage_chan(f'{output.dev_name}/ao{output.idx}',
+                                                     output.name)
+            self._tasks[key] = task
+        task.start()
+        self._active_task = key
+        return task
+
+    def _unreserve_active_task(self) -> None:
+        if self._active_task is not None:
+            previous = self._tasks[self._active_task]
+            previous.stop()
+            previous.control(TaskMode.TASK_UNRESERVE)
+            self._active_task = None
+
+    def buffered_scan(self, waveforms: Any, daq_ai: DAQAnalogInputs,
+                      rate: Union[int, float], samples_per_point: int = 1,
+                      timeout: Union[float, int] = 60) -> np.ndarray:
+        """Writes a waveform to every analog output and acquires the analog inputs
+        on ao/SampleClock, in one hardware-timed operation.
+
+        This is typically one row of a raster scan. The inputs acquire
+        `samples_per_point` samples for each point of the waveforms, which are
+        averaged. The sample clock timing of `daq_ai` is restored afterwards.
+
+        Args:
+            waveforms: Array of shape (number of analog outputs, points), with the
+                channels in the order of `channels`. A 1D array is accepted when
+                there is only one analog output.
+            daq_ai: Analog inputs to acquire.
+            rate: Sample rate in Hz, i.e. `rate / samples_per_point` points per second.
+            samples_per_point: Number of input samples averaged per point.
+            timeout: Timeout of the operation in seconds.
+
+        Returns:
+            Averaged input voltages of shape (number of analog inputs, points).
+        """
+        waveforms = np.atleast_2d(np.asarray(waveforms, dtype=float))
+        if waveforms.shape[0] != len(self._outputs):
+            raise ValueError(f'Expected {len(self._outputs)} waveforms, '
+                             f'got {waveforms.shape[0]}')
+        points = waveforms.shape[1]
+        samples = points * samples_per_point
+        waveforms = np.repeat(waveforms, samples_per_point, axis=1)
+        self._unreserve_active_task()
+        if self._scan_task is None:
+            self._scan_task = nidaqmx.Task(f'{self.name}_ao_scan')
+            for output in self._outputs:
+                self._scan_task.ao_channels.add_ao_voltage_chan(
+                    f'{output.dev_name}/ao{output.idx}', output.name)
+        ao_task = self._scan_task
+        ao_task.timing.cfg_samp_clk_timing(
+            rate, sample_mode=AcquisitionType.FINITE, samps_per_chan=samples)
+        ao_task.write(waveforms[0] if len(self._outputs) == 1 else waveforms,
+                      auto_start=False)
+        daq_ai._configure_timing(rate, f'/{self.dev_name}/ao/SampleClock', samples)
+        try:
+            # The inputs wait for the first tick of the output sample clock
+            daq_ai.task.start()
+            ao_task.start()
+            data_raw = daq_ai.task.read(number_of_samples_per_channel=samples,
+                                        timeout=timeout)
+            ao_task.wait_until_done(timeout=timeout)
+        finally:
+            daq_ai.task.stop()
+            ao_task.stop()
+            ao_task.control(TaskMode.TASK_UNRESERVE)
+            daq_ai._configure_timing(daq_ai.rate, daq_ai.clock_src, daq_ai.samples_to_read)
+        for output, waveform in zip(self._outputs, waveforms):
+            output._voltage = waveform[-1]
+            output.cache.set(waveform[-1])
+        return _average_samples(data_raw, daq_ai.nchannels, points)
+
+    def close(self) -> None:
+        """Releases the nidaqmx tasks and closes the instrument.
+        """
+        for task in self._tasks.values():
+            task.close()
+        if self._scan_task is not None:
+            self._scan_task.close()
+            self._scan_task = None
+        self._tasks = {}
+        self._active_task = None
+        super().close()
             
 class DAQDigitalOutputState(Parameter):
     """Writes data to one or several DAQ digital outputs.
@@ -189,12 +338,22 @@ class DAQDigitalOutputState(Parameter):
             lineString = lineString.join([val for set in zip(dev, lines, comma) for val in set][0:-1])
 
         self.lines = lineString
+        self._task: Any = None
 
     def set_raw(self, state: Union[list, bool]) -> None:
-        with nidaqmx.Task('daq_do_task') as do_task:
-            do_task.do_channels.add_do_chan(self.lines,
-                                            line_grouping=LineGrouping.CHAN_PER_LINE)
-            do_task.write(state, auto_start=True)
+        if self._task is None:
+            self._task = nidaqmx.Task(f'{self.full_name}_task')
+            self._task.do_channels.add_do_chan(self.lines,
+                                               line_grouping=LineGrouping.CHAN_PER_LINE)
+            self._task.start()
+        self._task.write(state)
+
+    def close_task(self) -> None:
+        """Releases the nidaqmx task, a new one is created by the next set.
+        """
+        if self._task is not None:
+            self._task.close()
+            self._task = None
 
 
 class DAQDigitalOutputs(Instrument):
@@ -222,3 +381,9 @@ class DAQDigitalOutputs(Instrument):
                 parameter_class=DAQDigitalOutputState,
                 label='DO state'
         )
+
+    def close(self) -> None:
+        """Releases the nidaqmx task and closes the instrument.
+        """
+        self.state.close_task()
+        super().close()
@@ -1,12 +1,13 @@
 import numpy as np
 import itertools
 import uuid
-from time import sleep as sleep_s
+from time import sleep as sleep_s, perf_counter
 from qcodes.instrument.channel import InstrumentChannel, ChannelList
 from qcodes.instrument.visa import VisaInstrument
 from pyvisa.errors import VisaIOError
 from qcodes.utils import validators
-from typing import Any, NewType, Sequence, List, Dict, Tuple, Optional
+from typing import Any, Callable, Iterator, NewType, Sequence, List, Dict, Tuple, Optional
+from pyvisa.util import to_ieee_block
 from packaging.version import parse
 
 # Version 1.0.0
@@ -47,6 +48,12 @@ from packaging.version import parse
 error_ambiguous_wave = 'Only one of frequency_Hz or period_s can be ' \
                        'specified for a wave form'
 
+# Number of virtual sweeps remembered by each arrangement
+_max_cached_sweeps = 16
+
+# Maximum size of a message made by concatenating SCPI commands
+_max_batch_bytes = 65536
+
 
 def diff_matrix(initial: Sequence[float],
                 measurements: Sequence[Sequence[float]]) -> np.ndarray:
@@ -213,9 +220,12 @@ class _Channel_Context():
 
 class _Dc_Context(_Channel_Context):
 
+    _hold_command = 'sour{0}:dc:trig:sour hold'
+    _ready_to_start_commands = ('sour{0}:dc:init:cont on', 'sour{0}:dc:init')
+
     def __init__(self, channel: 'QDac2Channel'):
         super().__init__(channel)
-        self._write_channel('sour{0}:dc:trig:sour hold')
+        self._write_channel(self._hold_command)
         self._trigger: Optional[QDac2Trigger_Context] = None
         self._marker_start: Optional[QDac2Trigger_Context] = None
         self._marker_end: Optional[QDac2Trigger_Context] = None
@@ -312,8 +322,8 @@ class _Dc_Context(_Channel_Context):
         self._write_channel('sour{0}:dc:init')
 
     def _make_ready_to_start(self) -> None:
-        self._write_channel('sour{0}:dc:init:cont on')
-        self._write_channel('sour{0}:dc:init')
+        for cmd in self._ready_to_start_commands:
+            self._write_channel(cmd)
 
     def _switch_to_immediate_trigger(self) -> None:
         self._write_channel('sour{0}:dc:init:cont off')
@@ -411,29 +421,45 @@ class List_Context(_Dc_Context):
                  stepped: bool):
         super().__init__(channel)
         self._repetitions = repetitions
-        self._write_channel('sour{0}:volt:mode list')
-        self._set_voltages(voltages)
-        self._set_trigger_mode(stepped)
-        self._write_channel(f'sour{"{0}"}:list:dwel {dwell_s}')
-        self._set_direction(backwards)
-        self._set_repetitions()
-        self._set_triggering()
-
-    def _set_voltages(self, voltages: Sequence[float]) -> None:
-        self._write_channel_floats('sour{0}:list:volt ', voltages)
-
-    def _set_trigger_mode(self, stepped: bool) -> None:
-        if stepped:
-            return self._write_channel('sour{0}:list:tmod step')
-        self._write_channel('sour{0}:list:tmod auto')
+        for cmd, values in self.setup_commands(voltages, repetitions, dwell_s,
+                                               backwards, stepped):
+            if values is None:
+                self._write_channel(cmd)
+            else:
+                self._write_channel_floats(cmd, values)
 
-    def _set_direction(self, backwards: bool) -> None:
-        if backwards:
-            return self._write_channel('sour{0}:list:dir down')
-        self._write_channel('sour{0}:list:dir up')
+    @classmethod
+    def setup_commands(cls, voltages: Sequence[float], repetitions: int,
+                       dwell_s: float, backwards: bool, stepped: bool,
+                       trigger: str = 'bus'
+                       ) -> List[Tuple[str, Optional[Sequence[float]]]]:
+        """Commands that set up a DC list on a channel that is on hold
 
-    def _set_repetitions(self) -> None:
-        self._write_channel(f'sour{"{0}"}:list:coun {self._repetitions}')
+        Args:
+            voltages (Sequence[float]): Voltages in list
+            repetitions (int): Number of repetitions of the list
+            dwell_s (float): Seconds between each voltage
+            backwards (bool): Use list in reverse
+            stepped (bool): True means that each step needs to be triggered
+            trigger (str, optional): Trigger source of the DC generator (default bus)
+
+        Returns:
+            List[Tuple[str, Optional[Sequence[float]]]]: Pairs of SCPI command
+            with a '{0}' placeholder for the channel number and optional values
+            to append
+        """
+        tmod = 'step' if stepped else 'auto'
+        direction = 'down' if backwards else 'up'
+        commands: List[Tuple[str, Optional[Sequence[float]]]] = [
+            ('sour{0}:volt:mode list', None),
+            ('sour{0}:list:volt ', voltages),
+            (f'sour{"{0}"}:list:tmod {tmod}', None),
+            (f'sour{"{0}"}:list:dwel {dwell_s}', None),
+            (f'sour{"{0}"}:list:dir {direction}', None),
+            (f'sour{"{0}"}:list:coun {repetitions}', None),
+            (f'sour{"{0}"}:dc:trig:sour {trigger}', None),
+        ]
+        return commands + [(cmd, None) for cmd in cls._ready_to_start_commands]
 
     def _perpetual(self) -> bool:
         return self._repetitions < 0
@@ -1562,7 +1588,7 @@ class Virtual_Sweep_Context:
 
     def __init__(self, arrangement: 'Arrangement_Context', sweep: np.ndarray,
                  start_trigger: Optional[str], step_time_s: float,
-                 step_trigger: Optional[str], repetitions: Optional[int]):
+                 step_trigger: Optional[str], repetitions: int):
         self._arrangement = arrangement
         self._sweep = sweep
         self._step_trigger = step_trigger
@@ -1608,40 +1634,40 @@ class Virtual_Sweep_Context:
     def _ensure_qdac_setup(self) -> None:
         if self._qdac_ready:
             return self._make_ready_to_start()
-        self._route_inner_trigger()
-        self._send_lists_to_qdac()
+        commands = self._inner_trigger_commands() + self._list_commands()
+        self._arrangement._qdac.write_batch(commands)
         self._qdac_ready = True
 
-    def _route_inner_trigger(self) -> None:
+    def _inner_trigger_commands(self) -> List[Tuple[str, Optional[Sequence[float]]]]:
         if not self._step_trigger:
-            return
+            return []
         trigger = self._arrangement.get_trigger_by_name(self._step_trigger)
         # All channels change in sync, so just use the first channel to make the
         # external trigger.
-        channel = self._get_channel(0)
-        channel.write_channel(f'sour{"{0}"}:dc:mark:sst '
-                              f'{_trigger_context_to_value(trigger)}')
-
-    def _get_channel(self, contact_index: int) -> 'QDac2Channel':
-        channel_number = self._arrangement._channels[contact_index]
-        qdac = self._arrangement._qdac
-        return qdac.channel(channel_number)
-
-    def _send_lists_to_qdac(self) -> None:
-        for contact_index in range(self._arrangement.shape):
-            self._send_list_to_qdac(contact_index, self._sweep[:, contact_index])
-
-    def _send_list_to_qdac(self, contact_index, voltages):
-        channel = self._get_channel(contact_index)
-        dc_list = channel.dc_list(voltages=voltages, dwell_s=self._step_time_s,
-                                  repetitions=self._repetitions)
+        channel = self._arrangement._channels[0]
+        return [(f'sour{channel}:dc:mark:sst '
+                 f'{_trigger_context_to_value(trigger)}', None)]
+
+    def _list_commands(self) -> List[Tuple[str, Optional[Sequence[float]]]]:
+        # Same setup as dc_list() followed by start_on(), but without the
+        # intermediate BUS triggering that start_on() overrides anyway.
         trigger = self._arrangement.get_trigger_by_name(self._start_trigger_name)
-        dc_list.start_on(trigger)
+        internal = _trigger_context_to_value(trigger)
+        commands: List[Tuple[str, Optional[Sequence[float]]]] = []
+        for contact_index, channel in enumerate(self._arrangement._channels):
+            setup: List[Tuple[str, Optional[Sequence[float]]]] = [
+                (List_Context._hold_command, None)]
+            setup += List_Context.setup_commands(
+                self._sweep[:, contact_index], self._repetitions,
+                self._step_time_s, backwards=False, stepped=False,
+                trigger=f'int{internal}')
+            commands += [(cmd.format(channel), values) for cmd, values in setup]
+        return commands
 
     def _make_ready_to_start(self):  # Bug circumvention
-        for contact_index in range(self._arrangement.shape):
-            channel = self._get_channel(contact_index)
-            channel.write_channel('sour{0}:dc:init')
+        self._arrangement._qdac.write_batch(
+            [(f'sour{channel}:dc:init', None)
+             for channel in self._arrangement._channels])
 
 
 class Arrangement_Context:
@@ -1652,6 +1678,7 @@ class Arrangement_Context:
         self._fix_contact_order(contacts)
         self._allocate_triggers(internal_triggers, output_triggers)
         self._correction = np.identity(self.shape)
+        self._sweep_cache: Dict[tuple, np.ndarray] = {}
 
     def __enter__(self):
         return self
@@ -1736,9 +1763,9 @@ class Arrangement_Context:
         self._effectuate_virtual_voltages()
 
     def _effectuate_virtual_voltages(self) -> None:
+        actual_voltages = self.actual_voltages()
         for index, channel_number in enumerate(self._channels):
-            actual_V = self.actual_voltages()[index]
-            self._qdac.channel(channel_number).dc_constant_V(actual_V)
+            self._qdac.channel(channel_number).dc_constant_V(actual_voltages[index])
 
     def add_correction(self, contact: str, factors: Sequence[float]) -> None:
         """Update how much a particular contact influences the other contacts
@@ -1853,15 +1880,40 @@ class Arrangement_Context:
 
     def _calculate_1d_values(self, contact: str, voltages: Sequence[float]
                             ) -> np.ndarray:
-        original_voltage = self.virtual_voltage(contact)
         index = self._contact_index(contact)
-        sweep = []
-        for v in voltages:
-            self._virtual_voltages[index] = v
-            sweep.append(self.actual_voltages())
-        self._virtual_voltages[index] = original_voltage
-        return np.array(sweep)
+        voltages = np.asarray(voltages, dtype=float)
+
+        def calculate() -> np.ndarray:
+            virtual = np.tile(self._virtual_voltages, (len(voltages), 1))
+            virtual[:, index] = voltages
+            return self._actual_sweep(virtual)
 
+        return self._cached_sweep(('1d', index, voltages.tobytes()), calculate)
+
+    def _actual_sweep(self, virtual_sweep: np.ndarray) -> np.ndarray:
+        """Corrected voltages for rows of virtual voltages in one batched
+        matrix product, giving the same result as actual_voltages() per row
+        """
+        sweep = np.matmul(self._correction, virtual_sweep[:, :, np.newaxis])[:, :, 0]
+        if self._qdac._round_off:
+            sweep = np.round(sweep, self._qdac._round_off)
+        return sweep
+
+    def _cached_sweep(self, key: tuple, calculate: Callable[[], np.ndarray]
+                      ) -> np.ndarray:
+        """Return a previously calculated sweep for the same arguments,
+        correction matrix and virtual voltages, or calculate it.
+        """
+        key = (key, self._correction.tobytes(), self._virtual_voltages.tobytes(),
+               self._qdac._round_off)
+        sweep = self._sweep_cache.get(key)
+        if sweep is None:
+            sweep = calculate()
+            sweep.setflags(write=False)
+            if len(self._sweep_cache) >= _max_cached_sweeps:
+                del self._sweep_cache[next(iter(self._sweep_cache))]
+            self._sweep_cache[key] = sweep
+        return sweep
 
     def virtual_sweep2d(self, inner_contact: str, inner_voltages: Sequence[float],
                         outer_contact: str, outer_voltages: Sequence[float],
@@ -1893,19 +1945,22 @@ class Arrangement_Context:
                              inner_voltages: Sequence[float],
                              outer_contact: str,
                              outer_voltages: Sequence[float]) -> np.ndarray:
-        original_fast_voltage = self.virtual_voltage(inner_contact)
-        original_slow_voltage = self.virtual_voltage(outer_contact)
         outer_index = self._contact_index(outer_contact)
         inner_index = self._contact_index(inner_contact)
-        sweep = []
-        for slow_V in outer_voltages:
-            self._virtual_voltages[outer_index] = slow_V
-            for fast_V in inner_voltages:
-                self._virtual_voltages[inner_index] = fast_V
-                sweep.append(self.actual_voltages())
-        self._virtual_voltages[inner_index] = original_fast_voltage
-        self._virtual_voltages[outer_index] = original_slow_voltage
-        return np.array(sweep)
+        inner_voltages = np.asarray(inner_voltages, dtype=float)
+        outer_voltages = np.asarray(outer_voltages, dtype=float)
+
+        def calculate() -> np.ndarray:
+            n_inner = len(inner_voltages)
+            n_outer = len(outer_voltages)
+            virtual = np.tile(self._virtual_voltages, (n_outer * n_inner, 1))
+            virtual[:, outer_index] = np.repeat(outer_voltages, n_inner)
+            virtual[:, inner_index] = np.tile(inner_voltages, n_outer)
+            return self._actual_sweep(virtual)
+
+        key = ('2d', inner_index, inner_voltages.tobytes(),
+               outer_index, outer_voltages.tobytes())
+        return self._cached_sweep(key, calculate)
 
     def virtual_detune(self, contacts: Sequence[str], start_V: Sequence[float],
                        end_V: Sequence[float], steps: int,
@@ -1940,32 +1995,44 @@ class Arrangement_Context:
 
     def _calculate_detune_values(self, contacts: Sequence[str], start_V: Sequence[float],
                                  end_V: Sequence[float], steps: int):
-        original_voltages = [self.virtual_voltage(contact) for contact in contacts]
         indices = [self._contact_index(contact) for contact in contacts]
-        sweep = []
-        forward_V = [forward_and_back(start_V[i], end_V[i], steps) for i in range(len(contacts))]
-        for voltages in zip(*forward_V):
-            for index, voltage in zip(indices, voltages):
-                self._virtual_voltages[index] = voltage
-            sweep.append(self.actual_voltages())
-        for index, voltage in zip(indices, original_voltages):
-            self._virtual_voltages[index] = voltage
-        return np.array(sweep)
 
-    def leakage(self, modulation_V: float, nplc: int = 2) -> np.ndarray:
+        def calculate() -> np.ndarray:
+            forward_V = np.array([list(forward_and_back(start_V[i], end_V[i], steps))
+                                  for i in range(len(contacts))])
+            virtual = np.tile(self._virtual_voltages, (forward_V.shape[1], 1))
+            virtual[:, indices] = forward_V.T
+            return self._actual_sweep(virtual)
+
+        key = ('detune', tuple(indices), np.asarray(start_V, dtype=float).tobytes(),
+               np.asarray(end_V, dtype=float).tobytes(), steps)
+        return self._cached_sweep(key, calculate)
+
+    def leakage(self, modulation_V: float, nplc: int = 2,
+                parallel: bool = False) -> np.ndarray:
         """Run a simple leakage test between the contacts
 
         Each contact is changed in turn and the resulting change in current from
         steady-state is recorded.  The resulting resistance matrix is calculated
         as modulation_voltage divided by current_change.
 
+        In parallel mode, the sensors are set up once to measure on each step
+        of a DC list holding the steady state and all the modulations, so the
+        whole matrix is captured without any communication in between.
+
         Args:
             modulation_V (float): Virtual voltage added to each contact
             nplc (int, Optional): Powerline cycles to wait for each measurement
+            parallel (bool, Optional): Measure all modulations in one sweep
 
         Returns:
             ndarray: contact-to-contact resistance in Ohms
         """
+        if parallel:
+            steady_state_A, currents_matrix = \
+                self._leakage_currents_in_one_sweep(modulation_V, nplc)
+            with np.errstate(divide='ignore'):
+                return np.abs(modulation_V / diff_matrix(steady_state_A, currents_matrix))
         steady_state_A = self.currents_A(nplc)
         currents_matrix = []
         for index, channel_nr in enumerate(self.channel_numbers):
@@ -1977,6 +2044,52 @@ class Arrangement_Context:
         with np.errstate(divide='ignore'):
             return np.abs(modulation_V / diff_matrix(steady_state_A, currents_matrix))
 
+    def _leakage_currents_in_one_sweep(self, modulation_V: float, nplc: int
+                                       ) -> Tuple[np.ndarray, np.ndarray]:
+        slowest_line_freq = 50
+        # Same timing as currents_A(): settle for one powerline cycle before
+        # measuring, plus margin.
+        settle_s = 1 / slowest_line_freq
+        step_s = (nplc + 2) / slowest_line_freq
+        virtual_sweep = np.tile(self._virtual_voltages, (self.shape + 1, 1))
+        virtual_sweep[1:] += modulation_V * np.identity(self.shape)
+        step_trigger = uuid.uuid4().hex
+        self._allocate_internal_triggers([step_trigger])
+        sweep: Optional[Virtual_Sweep_Context] = None
+        # Restore the sensors, voltages and triggers even when interrupted
+        try:
+            internal = _trigger_context_to_value(self.get_trigger_by_name(step_trigger))
+            channels_suffix = f'(@{ints_to_comma_separated_list(self._channels)})'
+            self._qdac.write(f'sens:rang low,{channels_suffix}')
+            self._qdac.write(f'sens:nplc {nplc},{channels_suffix}')
+            commands: List[Tuple[str, Optional[Sequence[float]]]] = []
+            for channel in self._channels:
+                commands += [
+                    (f'sens{channel}:del {settle_s}', None),
+                    (f'sens{channel}:coun 1', None),
+                    (f'sens{channel}:trig:sour int{internal}', None),
+                    (f'sens{channel}:init:cont on', None),
+                    (f'sens{channel}:init', None),
+                ]
+            self._qdac.write_batch(commands)
+            sweep = Virtual_Sweep_Context(self, self._actual_sweep(virtual_sweep),
+                                          None, step_s, step_trigger, 1)
+            sweep.start()
+            sweep_s = len(virtual_sweep) * step_s
+            sleep_s(sweep_s)
+            # Allow the measurements as long again as the sweep itself
+            for currents in self._qdac.stream_currents_A(
+                    self._channels, len(virtual_sweep), timeout_s=sweep_s):
+                pass
+        finally:
+            self._qdac.write_batch(
+                [(f'sens{channel}:init:cont off', None) for channel in self._channels])
+            self._effectuate_virtual_voltages()
+            if sweep is not None:
+                self._free_internal_trigger(sweep._start_trigger_name)
+            self._free_internal_trigger(step_trigger)
+        return currents[:, 0], currents[:, 1:].T
+
     def _contact_index(self, contact: str) -> int:
         return self._contacts[contact]
 
@@ -2003,6 +2116,9 @@ class Arrangement_Context:
         for trigger in self._internal_triggers.values():
             self._qdac.free_trigger(trigger)
 
+    def _free_internal_trigger(self, name: str) -> None:
+        self._qdac.free_trigger(self._internal_triggers.pop(name))
+
 
 def forward_and_back(start: float, end: float, steps: int):
     forward = np.linspace(start, end, steps)
@@ -2224,6 +2340,56 @@ class QDac2(VisaInstrument):
         return Arrangement_Context(self, contacts, output_triggers,
                                    internal_triggers)
 
+    def stream_currents_A(self, channels: Sequence[int], n_points: int,
+                          poll_interval_s: float = 1e-3,
+                          timeout_s: Optional[float] = None
+                          ) -> Iterator[np.ndarray]:
+        """Drain the current-measurement buffers of several channels
+
+        The measurements must already have been started, see
+        QDac2Channel.measurement().  All channels are polled together, so each
+        poll costs the same two queries no matter how many channels are
+        involved.  The measurements are collected in one array, allocated
+        up front and updated in place, where missing measurements are NaN.
+
+        Args:
+            channels (Sequence[int]): Channel numbers
+            n_points (int): Number of measurements to collect per channel
+            poll_interval_s (float, optional): Delay when no new measurements are available
+            timeout_s (float, optional): Maximum time to wait for all the
+                measurements, default is to wait forever
+
+        Yields:
+            np.ndarray: Currents (channel, measurement) each time new measurements arrive
+
+        Raises:
+            TimeoutError: Not all measurements arrived within timeout_s
+        """
+        currents = np.full((len(channels), n_points), np.nan)
+        n_collected = np.zeros(len(channels), dtype=int)
+        deadline_s = None if timeout_s is None else perf_counter() + timeout_s
+        while np.any(n_collected < n_points):
+            n_available = self.ask_batch(
+                [f'sens{channel}:data:poin?' for channel in channels])
+            # Bug circumvention: only ask channels that have measurements
+            ready = [index for index, n in enumerate(n_available)
+                     if int(n) > 0 and n_collected[index] < n_points]
+            if not ready:
+                if deadline_s is not None and perf_counter() > deadline_s:
+                    raise TimeoutError(
+                        f'Collected {n_collected.tolist()} of {n_points} '
+                        f'measurements within {timeout_s}s')
+                sleep_s(poll_interval_s)
+                continue
+            answers = self.ask_batch(
+                [f'sens{channels[index]}:data:rem?' for index in ready])
+            for index, answer in zip(ready, answers):
+                start = n_collected[index]
+                values = np.fromstring(answer, sep=',')[:n_points - start]
+                currents[index, start:start + len(values)] = values
+                n_collected[index] += len(values)
+            yield currents
+
     # -----------------------------------------------------------------------
     # Instrument-wide functions
     # -----------------------------------------------------------------------
@@ -2235,9 +2401,11 @@ class QDac2(VisaInstrument):
         """Record all SCPI commands sent to the instrument
 
         Any previous recordings are removed.  To inspect the SCPI commands sent
-        to the instrument, call get_recorded_scpi_commands().
+        to the instrument, call get_recorded_scpi_commands().  The time spent
+        sending them can be inspected by calling get_recorded_scpi_time_s().
         """
         self._scpi_sent: List[str] = []
+        self._scpi_time_s = 0.0
         self._record_commands = True
 
     def get_recorded_scpi_commands(self) -> List[str]:
@@ -2249,6 +2417,15 @@ class QDac2(VisaInstrument):
         self._scpi_sent = []
         return commands
 
+    def get_recorded_scpi_time_s(self) -> float:
+        """
+        Returns:
+            float: Seconds spent sending the recorded SCPI commands
+        """
+        elapsed_s = self._scpi_time_s
+        self._scpi_time_s = 0.0
+        return elapsed_s
+
     def clear(self) -> None:
         """Reset the VISA message queue of the instrument
         """
@@ -2285,9 +2462,9 @@ class QDac2(VisaInstrument):
         Args:
             cmd (str): SCPI command
         """
-        if self._record_commands:
-            self._scpi_sent.append(cmd)
+        start_s = perf_counter()
         super().write(cmd)
+        self._record(cmd, start_s)
 
     def ask(self, cmd: str) -> str:
         """Send SCPI query to instrument
@@ -2298,9 +2475,9 @@ class QDac2(VisaInstrument):
         Returns:
             str: SCPI answer
         """
-        if self._record_commands:
-            self._scpi_sent.append(cmd)
+        start_s = perf_counter()
         answer = super().ask(cmd)
+        self._record(cmd, start_s)
         return answer
 
     def write_floats(self, cmd: str, values: Sequence[float]) -> None:
@@ -2310,23 +2487,101 @@ class QDac2(VisaInstrument):
 
         Remember to include separating space in command if needed.
         """
+        start_s = perf_counter()
+        if not (self._no_binary_values or self._record_commands):
+            self.visa_handle.write_binary_values(cmd, values)
+            return
+        compiled = f'{cmd}{floats_to_comma_separated_list(values)}'
         if self._no_binary_values:
-            compiled = f'{cmd}{floats_to_comma_separated_list(values)}'
-            if self._record_commands:
-                self._scpi_sent.append(compiled)
-            return super().write(compiled)
+            super().write(compiled)
+        else:
+            self.visa_handle.write_binary_values(cmd, values)
+        self._record(compiled, start_s)
+
+    def write_batch(self, commands: Sequence[Tuple[str, Optional[Sequence[float]]]]
+                    ) -> None:
+        """Send several SCPI commands in as few messages as possible
+
+        The commands are concatenated with semicolons, so each command has to
+        be complete, ie. starting from the root of the SCPI tree.  A message
+        is never made larger than 64kB unless a single command needs more.
+
+        Args:
+            commands (Sequence[Tuple[str, Optional[Sequence[float]]]]): Pairs
+                of SCPI command and optional values to append like
+                write_floats() does
+        """
+        if self._no_concatenation:
+            for cmd, values in commands:
+                if values is None:
+                    self.write(cmd)
+                else:
+                    self.write_floats(cmd, values)
+            return
+        message: List[bytes] = []
+        texts: List[str] = []
+        size = 0
+        # The ASCII rendering is only needed when sending it or recording it
+        need_text = self._no_binary_values or self._record_commands
+        for cmd, values in commands:
+            if values is None:
+                text = cmd
+                data = cmd.encode()
+            elif need_text:
+                text = f'{cmd}{floats_to_comma_separated_list(values)}'
+                if self._no_binary_values:
+                    data = text.encode()
+                else:
+                    data = cmd.encode() + to_ieee_block(values)
+            else:
+                text = cmd
+                data = cmd.encode() + to_ieee_block(values)
+            if message and size + len(data) + 2 > _max_batch_bytes:
+                self._write_concatenated(message, texts)
+                message, texts, size = [], [], 0
+            message.append(data)
+            texts.append(text)
+            size += len(data) + 2
+        if message:
+            self._write_concatenated(message, texts)
+
+    def ask_batch(self, queries: Sequence[str]) -> List[str]:
+        """Send several SCPI queries in one message
+
+        Args:
+            queries (Sequence[str]): Complete SCPI queries
+
+        Returns:
+            List[str]: One answer per query
+        """
+        if not queries:
+            return []
+        if self._no_concatenation:
+            return [self.ask(query) for query in queries]
+        return self.ask(';:'.join(queries)).split(';')
+
+    def _write_concatenated(self, message: Sequence[bytes],
+                            texts: Sequence[str]) -> None:
+        start_s = perf_counter()
+        termination = self.visa_handle.write_termination or ''
+        self.visa_handle.write_raw(b';:'.join(message) + termination.encode())
+        self._record(';:'.join(texts), start_s)
+
+    def _record(self, cmd: str, start_s: float) -> None:
         if self._record_commands:
-            self._scpi_sent.append(f'{cmd}{floats_to_comma_separated_list(values)}')
-        self.visa_handle.write_binary_values(cmd, values)
+            self._scpi_sent.append(cmd)
+            self._scpi_time_s += perf_counter() - start_s
 
     # -----------------------------------------------------------------------
 
     def _set_up_debug_settings(self) -> None:
         self._record_commands = False
         self._scpi_sent = []
+        self._scpi_time_s = 0.0
         self._message_flush_timeout_ms = 1
         self._round_off = None
         self._no_binary_values = False
+        self._no_concatenation = False
 
     def _set_up_serial(self) -> None:
         # No harm in setting the speed even if the connection is not serial.
@@ -1,5 +1,6 @@
 import time
 import logging
+from typing import Dict, List, Optional
 import numpy as np
 import pyvisa  # used for the parity constant
 import traceback
@@ -192,8 +193,111 @@ class IVVI(VisaInstrument):
         return self.snapshot(update=True)
 
     def set_dacs_zero(self):
-        for i in range(self._numdacs):
-            self.set('dac{}'.format(i + 1), 0)
+        self.ramp_dacs({i + 1: 0 for i in range(self._numdacs)})
+
+    def set_dacs(self, mvoltages: Dict[int, float]) -> None:
+        """
+        Sets several dacs at once, without ramping.
+
+        Channels that already hold the requested value, according to the
+        last known dac values, are skipped. The set commands of the remaining
+        channels are sent back to back and their replies are read in one go,
+        so the read round trip is only paid once.
+
+        Args:
+            mvoltages: output voltage in mV per 1 based dac index
+        """
+        for channel, mvoltage in mvoltages.items():
+            self.parameters['dac{}'.format(channel)].validate(mvoltage)
+
+        current = self._known_mvoltages()
+        messages = []
+        changed = {}
+        for channel, mvoltage in mvoltages.items():
+            byte_val = self._mvoltage_to_bytes(
+                mvoltage - self.pol_num[channel - 1])
+            cur_byte_val = self._mvoltage_to_bytes(
+                current[channel - 1] - self.pol_num[channel - 1])
+            if byte_val != cur_byte_val:
+                messages.append(bytes([2, 1, channel]) + byte_val)
+                changed[channel] = mvoltage
+
+        if messages:
+            replies = self._ask_pipelined(messages)
+            for reply in replies:
+                if len(reply) > 1 and reply[1] != 0:
+                    logging.warning('IVVI: set dac error code {}'.format(
+                        reply[1]))
+        for channel, mvoltage in changed.items():
+            self._update_known_mvoltage(channel, mvoltage)
+        for channel, mvoltage in mvoltages.items():
+            self.parameters['dac{}'.format(channel)].cache.set(
+                self.round_dac(mvoltage, channel - 1))
+        if changed:
+            self._time_last_update = 0  # ensures get command will update
+
+    def ramp_dacs(self, mvoltages: Dict[int, float],
+                  step: Optional[float] = None,
+                  delay: Optional[float] = None) -> None:
+        """
+        Ramps several dacs at once to new values.
+
+        All channels are moved together: every round sets the next step of
+        each ramping channel with :meth:`set_dacs`, so that all channels
+        arrive at the same time instead of one after the other.
+
+        Args:
+            mvoltages: target voltage in mV per 1 based dac index
+            step: maximum step in mV, defaults to the step of each dac
+                parameter
+            delay: delay between rounds in seconds, defaults to the largest
+                inter_delay of the ramping dac parameters
+        """
+        for channel, mvoltage in mvoltages.items():
+            self.parameters['dac{}'.format(channel)].validate(mvoltage)
+
+        current = self._known_mvoltages()
+        trajectories = {}
+        delays = [0.0]
+        for channel, mvoltage in mvoltages.items():
+            param = self.parameters['dac{}'.format(channel)]
+            ch_step = step if step is not None else param.step
+            start = current[channel - 1]
+            if ch_step:
+                n_steps = int(math.ceil(abs(mvoltage - start) / ch_step))
+            else:
+                n_steps = 1
+            trajectories[channel] = (start, mvoltage, max(n_steps, 1))
+            delays.append(param.inter_delay)
+        if delay is None:
+            delay = max(delays)
+
+        n_rounds = max((n for _, _, n in trajectories.values()), default=0)
+        t_next = time.perf_counter()
+        for i in range(1, n_rounds + 1):
+            values = {}
+            for channel, (start, stop, _) in trajectories.items():
+                values[channel] = start + (stop - start) * i / n_rounds
+            if i == n_rounds:
+                values = dict(mvoltages)
+            if i > 1:
+                t_next += delay
+                time.sleep(max(0.0, t_next - time.perf_counter()))
+            self.set_dacs(values)
+
+    def _known_mvoltages(self) -> List[float]:
+        """
+        Returns the last known dac values, only reading them from the
+        device if they were never read before.
+        """
+        if getattr(self, '_mvoltages', None) is None:
+            return self._get_dacs()
+        return self._mvoltages
+
+    def _update_known_mvoltage(self, channel: int, mvoltage: float) -> None:
+        if getattr(self, '_mvoltages', None) is not None:
+            self._mvoltages[channel - 1] = self.round_dac(mvoltage,
+                                                          channel - 1)
 
     def linspace(self, start: float, end: float, samples: int, flexible: bool = False, bip: bool = True):
         """
@@ -357,7 +461,7 @@ class IVVI(VisaInstrument):
         proceed = True
 
         if self.check_setpoints():
-            cur_val = self.get('dac{}'.format(channel))
+            cur_val = self._known_mvoltages()[channel - 1]
             # dac range in mV / 16 bits FIXME make range depend on polarity
             byte_res = self.full_range / 2**16
             # eps is a magic number to correct for an offset in the values
@@ -382,6 +486,7 @@ class IVVI(VisaInstrument):
             message = bytes([2, 1, channel]) + byte_val
 
             reply = self.ask(message)
+            self._update_known_mvoltage(channel, mvoltage)
             self._time_last_update = 0  # ensures get command will update
 
             return reply
@@ -426,37 +531,71 @@ class IVVI(VisaInstrument):
 
         if not raw:
             expected_answer_length = message[0]
-            message_len = len(message) + 2
-
-            error_code = bytes([0])
-            message = bytes([message_len]) + error_code + message
+            message = self._frame_message(message)
         self.visa_handle.write_raw(message)
 
         return expected_answer_length
 
-    def ask(self, message, raw=False):
+    @staticmethod
+    def _frame_message(message):
         '''
-        Send <message> to the device and read answer.
-        Raises an error if one occurred
-        Returns a list of bytes
+        Prefixes <message> with the descriptor size and error code
         '''
+        message_len = len(message) + 2
+        error_code = bytes([0])
+        return bytes([message_len]) + error_code + message
+
+    def _acquire_lock(self):
         if self.lock:
             max_tries = 10
             for i in range(max_tries):
                 if self.lock.acquire(timeout=.05):
-                    break
-                else:
-                    logging.warning('IVVI: cannot acquire the lock')
-            if i + 1 == max_tries:
-                raise Exception('IVVI: lock is stuck')
-        # Protocol knows about the expected length of the answer
-        message_len = self.write(message, raw=raw)
-        reply = self.read(message_len=message_len)
-        if self.lock:
-            self.lock.release()
+                    return
+                logging.warning('IVVI: cannot acquire the lock')
+            raise Exception('IVVI: lock is stuck')
+
+    def ask(self, message, raw=False):
+        '''
+        Send <message> to the device and read answer.
+        Raises an error if one occurred
+        Returns a list of bytes
+        '''
+        self._acquire_lock()
+        try:
+            # Protocol knows about the expected length of the answer
+            message_len = self.write(message, raw=raw)
+            reply = self.read(message_len=message_len)
+        finally:
+            if self.lock:
+                self.lock.release()
 
         return reply
 
+    def _ask_pipelined(self, messages):
+        '''
+        Sends all <messages> back to back and then reads all answers at
+        once, instead of waiting for each answer before the next message.
+
+        Returns a list with the reply to each message
+        '''
+        self._acquire_lock()
+        try:
+            self.visa_handle.write_raw(
+                b''.join(self._frame_message(m) for m in messages))
+            lengths = [m[0] for m in messages]
+            mes = self.read(message_len=sum(lengths),
+                            timeout=len(messages))
+        finally:
+            if self.lock:
+                self.lock.release()
+
+        replies = []
+        offset = 0
+        for length in lengths:
+            replies.append(mes[offset:offset + length])
+            offset += length
+        return replies
+
     def _read_raw_bytes_direct(self, size):
         """ Read raw data using the visa lib """
         with(self.visa_handle.ignore_warning(pyvisa.constants.VI_SUCCESS_MAX_CNT)):
@@ -495,11 +634,10 @@ class IVVI(VisaInstrument):
         ret = b''.join(ret)
         return ret
 
-    def read(self, message_len=None):
+    def read(self, message_len=None, timeout=1):
         # because protocol has no termination chars the read reads the number
         # of bytes in the buffer
         bytes_in_buffer = 0
-        timeout = 1
         t0 = time.time()
         t1 = t0
         bytes_in_buffer = 0
@@ -1,10 +1,15 @@
-from qcodes import Instrument
+from qcodes import Instrument, MultiParameter
 from qcodes.utils.validators import Ints, Numbers
 import ctypes
 import os
 import sys
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from qcodes_contrib_drivers.drivers.Andor.DU401 import Andor_DU401
 
 logger = logging.getLogger(__name__)
 
@@ -79,7 +84,7 @@ class ShamrockCIF:
         c_number_pixels = ctypes.c_int(number_pixels)
         code = self.dll.ShamrockGetCalibration(c_device, c_calibration, c_number_pixels)
         self.error_check(code, 'ShamrockGetCalibration')
-        return [max(0.0, v) for v in c_calibration]
+        return np.maximum(np.ctypeslib.as_array(c_calibration).astype(float), 0.0)
 
     def get_grating(self, device):
         c_device = ctypes.c_int(device)
@@ -191,16 +196,55 @@ class ShamrockCIF:
         self.error_check(code, 'ShamrockSetWavelength')
 
 
+class CalibratedSpectrum(MultiParameter):
+    """
+    Parameter class for a spectrum taken with an Andor CCD behind a Shamrock spectrometer.
+    Returns the wavelength axis and the counts, both as NumPy arrays. The wavelength axis is
+    served from the calibration cache of the spectrometer, so only the CCD is read out per point.
+
+    Args:
+        name: Parameter name.
+        ccd: CCD that takes the spectrum.
+    """
+
+    def __init__(self, name: str, instrument: "Shamrock_SR750", ccd: "Andor_DU401", **kwargs):
+        number_pixels = instrument.number_pixels.get_latest()
+        super().__init__(name,
+                         instrument=instrument,
+                         names=('wavelength', 'counts'),
+                         shapes=((number_pixels,), (number_pixels,)),
+                         units=('nm', ''),
+                         labels=('Wavelength', 'Counts'),
+                         **kwargs)
+        self.spectrometer = instrument
+        self.ccd = ccd
+
+    def get_raw(self) -> Tuple[np.ndarray, np.ndarray]:
+        number_pixels = self.spectrometer.number_pixels.get_latest()
+        if number_pixels != self.ccd.x_pixels:
+            raise ValueError(f"Spectrometer is set up for {number_pixels} pixels, "
+                             f"but the CCD has {self.ccd.x_pixels} pixels.")
+        counts = self.ccd.spectrum.get()
+        wavelength = self.spectrometer.calibration.get()
+        return wavelength, counts
+
+
 class Shamrock_SR750(Instrument):
     """
     Instrument driver for the Shamrock SR750 spectrometer.
 
+    The wavelength calibration and the grating info are cached. The calibration is only read
+    again from the DLL after the grating, the wavelength or the pixel settings were changed.
+
     Args:
         name: Instrument name.
         dll_path: Path to the ShamrockCIF.dll file. If not set, a default path is used.
         device_id: ID for the desired spectrometer.
         ccd_number_pixels: Number of pixels on the connected CCD.
         ccd_pixel_width: Pixel width on the connected CCD.
+        ccd: Optional Andor CCD behind the spectrometer. If set, a ``calibrated_spectrum``
+            parameter returning (wavelength, counts) is added. Its number of pixels has to
+            match ccd_number_pixels.
 
     Attributes:
         ShamrockCIF: DLL wrapper for ShamrockCIF.dll
@@ -212,10 +256,20 @@ class Shamrock_SR750(Instrument):
     def __init__(self, name: str,
                  dll_path: Optional[str] = None, device_id: int = 0,
                  ccd_number_pixels: int = 1024, ccd_pixel_width: int = 26,
+                 ccd: Optional["Andor_DU401"] = None,
                  **kwargs):
 
+        if ccd is not None and ccd.x_pixels != ccd_number_pixels:
+            raise ValueError(f"ccd_number_pixels is {ccd_number_pixels}, "
+                             f"but the CCD has {ccd.x_pixels} pixels.")
+
         super().__init__(name, **kwargs)
 
+        # cached calibration and grating info
+        self._calibration: Optional[np.ndarray] = None
+        self._grating: Optional[int] = None
+        self._grating_info: Dict[int, Tuple[float, bytes, int, int]] = {}
+
         # link to dll
         self.ShamrockCIF: ShamrockCIF = ShamrockCIF(dll_path=dll_path)
 
@@ -229,11 +283,26 @@ class Shamrock_SR750(Instrument):
         self.serial_number: int = self.ShamrockCIF.get_serial_number(self.device_id)
         self.number_gratings: int = self.ShamrockCIF.get_number_gratings(self.device_id)
 
+        # add the instrument parameters
+        self.add_parameter('number_pixels',
+                           get_cmd=self._get_number_pixels,
+                           set_cmd=self._set_number_pixels,
+                           get_parser=int,
+                           vals=Ints(min_value=1),
+                           label='Number of CCD pixels')
+
+        self.add_parameter('pixel_width',
+                           get_cmd=self._get_pixel_width,
+                           set_cmd=self._set_pixel_width,
+                           get_parser=float,
+                           vals=Numbers(min_value=0),
+                           unit=u"\u03BC"+'m',
+                           label='CCD pixel width')
+
         # send CCD info to Shamrock
-        self.ShamrockCIF.set_number_pixels(self.device_id, ccd_number_pixels)
-        self.ShamrockCIF.set_pixel_width(self.device_id, ccd_pixel_width)
+        self.number_pixels.set(ccd_number_pixels)
+        self.pixel_width.set(ccd_pixel_width)
 
-        # add the instrument parameters
         self.add_parameter('blaze',
                            get_cmd=self._get_blaze,
                            get_parser=int,
@@ -242,7 +311,9 @@ class Shamrock_SR750(Instrument):
         self.add_parameter('calibration',
                            get_cmd=self._get_calibration,
                            unit='nm',
-                           label='Calibration')
+                           label='Calibration',
+                           docstring='Wavelength of each CCD pixel as a NumPy array. A copy of '
+                                     'the cached calibration is returned.')
 
         self.add_parameter('grating',
                            get_cmd=self._get_grating,
@@ -277,26 +348,43 @@ class Shamrock_SR750(Instrument):
                            unit='nm',
                            label='Wavelength')
 
+        if ccd is not None:
+            self.add_parameter('calibrated_spectrum',
+                               parameter_class=CalibratedSpectrum,
+                               ccd=ccd)
+
         # print connect message
         self.connect_message()
 
     # get methods
 
     def _get_blaze(self):
-        grating = self.ShamrockCIF.get_grating(self.device_id)
-        grating_info = self.ShamrockCIF.get_grating_info(self.device_id, grating)
-        return grating_info[1]
+        return self._get_grating_info()[1]
 
     def _get_calibration(self):
-        return self.ShamrockCIF.get_calibration(self.device_id, 1024)
+        if self._calibration is None:
+            self._calibration = self.ShamrockCIF.get_calibration(self.device_id, self.number_pixels.get_latest())
+        return self._calibration.copy()
 
     def _get_grating(self):
-        return self.ShamrockCIF.get_grating(self.device_id)
+        if self._grating is None:
+            self._grating = self.ShamrockCIF.get_grating(self.device_id)
+        return self._grating
+
+    def _get_grating_info(self):
+        grating = self._get_grating()
+        if grating not in self._grating_info:
+            self._grating_info[grating] = self.ShamrockCIF.get_grating_info(self.device_id, grating)
+        return self._grating_info[grating]
 
     def _get_groove_density(self):
-        grating = self.ShamrockCIF.get_grating(self.device_id)
-        grating_info = self.ShamrockCIF.get_grating_info(self.device_id, grating)
-        return grating_info[0]
+        return self._get_grating_info()[0]
+
+    def _get_number_pixels(self):
+        return self.ShamrockCIF.get_number_pixels(self.device_id)
+
+    def _get_pixel_width(self):
+        return self.ShamrockCIF.get_pixel_width(self.device_id)
 
     def get_idn(self):
         return {'vendor': 'Shamrock', 'serial': self.serial_number}
@@ -310,18 +398,39 @@ class Shamrock_SR750(Instrument):
     # set methods
 
     def _set_grating(self, grating):
+        self.clear_calibration_cache()
         self.ShamrockCIF.set_grating(self.device_id, grating)
+        self._grating = grating
         min_wavelength, max_wavelength = self.ShamrockCIF.get_wavelength_limits(self.device_id, grating)
         self.wavelength.vals = Numbers(min_value=min_wavelength, max_value=max_wavelength)
 
     def _set_slit(self, val):
         self.ShamrockCIF.set_slit(self.device_id, val)
 
+    def _set_number_pixels(self, number_pixels):
+        self.clear_calibration_cache()
+        self.ShamrockCIF.set_number_pixels(self.device_id, number_pixels)
+        if 'calibrated_spectrum' in self.parameters:
+            self.calibrated_spectrum.shapes = ((number_pixels,), (number_pixels,))
+
+    def _set_pixel_width(self, width):
+        self.clear_calibration_cache()
+        self.ShamrockCIF.set_pixel_width(self.device_id, width)
+
     def _set_wavelength(self, wavelength):
+        self.clear_calibration_cache()
         self.ShamrockCIF.set_wavelength(self.device_id, wavelength)
 
     # further methods
 
+    def clear_calibration_cache(self):
+        """
+        Forgets the cached calibration and grating, so that they are read again from the DLL.
+        Only needed if the spectrometer was changed outside of this driver.
+        """
+        self._calibration = None
+        self._grating = None
+
     def close(self):
         self.ShamrockCIF.close()
         super().close()
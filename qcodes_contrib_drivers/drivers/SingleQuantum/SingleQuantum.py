@@ -10,64 +10,114 @@ The above copyright notice and this permission notice shall be included in all c
 THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import numpy as np
-import socket
+import abc
+import codecs
 import json
+import logging
+import selectors
+import socket
 import threading
 import time
-import sys
+from typing import Dict, List, Optional
+
+import numpy as np
 
 from qcodes.instrument.ip import Instrument
 from qcodes.instrument.base import Parameter
 from qcodes.instrument.parameter import ParameterWithSetpoints, MultiParameter
 from qcodes.utils.validators import Arrays
 
+log = logging.getLogger(__name__)
 
-class SQTalk(threading.Thread):
-    def __init__(self, TCP_IP_ADR='localhost', TCP_IP_PORT=12000,
-                 error_callback=None):
+
+class _SocketReader(threading.Thread, abc.ABC):
+    """Reads a TCP connection in a background thread.
+
+    The thread blocks in a selector until data arrives or the reader is
+    closed, so it does not use any CPU while the connection is idle.
+    Subclasses handle the received bytes in ``_feed``.
+    """
+
+    BUFFER = 65536
+
+    def __init__(self, TCP_IP_ADR, TCP_IP_PORT):
         threading.Thread.__init__(self)
         self.TCP_IP_ADR = TCP_IP_ADR
         self.TCP_IP_PORT = TCP_IP_PORT
+        self.shutdown = False
 
         self.socket = socket.socket(
             socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((self.TCP_IP_ADR, self.TCP_IP_PORT))
-        self.socket.settimeout(.1)
-        self.BUFFER = 10000000
-        self.shutdown = False
-        self.labelProps = dict()
 
-        self.error_callback = error_callback
-
-        self.lock = threading.Lock()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.socket, selectors.EVENT_READ)
+        self._selector.register(self._wake_r, selectors.EVENT_READ)
 
     def close(self):
-        # Print("Closing Socket")
-        self.socket.close()
         self.shutdown = True
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(1)
+        self._selector.close()
+        for sock in (self.socket, self._wake_r, self._wake_w):
+            sock.close()
 
-    def send(self, msg):
-        self.socket.send(bytes(msg, "utf-8"))
+    def run(self):
+        try:
+            while self.shutdown is False:
+                for key, _ in self._selector.select():
+                    if key.fileobj is self._wake_r:
+                        return
+                    data = self.socket.recv(self.BUFFER)
+                    if not data:
+                        log.warning(f"Connection to {self.TCP_IP_ADR}:"
+                                    f"{self.TCP_IP_PORT} closed")
+                        return
+                    self._feed(data)
+        except OSError:
+            if not self.shutdown:
+                log.exception(f"Error reading from {self.TCP_IP_ADR}:"
+                              f"{self.TCP_IP_PORT}")
+        finally:
+            self.shutdown = True
+            self._closed()
+
+    @abc.abstractmethod
+    def _feed(self, data: bytes) -> None:
+        pass
+
+    def _closed(self) -> None:
+        pass
+
+
+class SQTalk(_SocketReader):
+    """Control connection, keeps the label properties sent by the server.
+
+    The stream is decoded incrementally: messages are separated by
+    ``\\x17``, several JSON objects may follow each other directly and a
+    message may be split over several reads.
+    """
 
-    def sub_jsons(self, msg):
-        """Return sub json strings.
-        {}{} will be returned as [{},{}]
-        """
-        i = 0
-        result = []
-        split_msg = msg.split('}{')
-        for s in range(len(split_msg)):
-            if i == 0 and len(split_msg) == 1:
-                result.append(split_msg[s])
-            elif i == 0 and len(split_msg) > 1:
-                result.append(split_msg[s] + "}")
-            elif i == len(split_msg) - 1 and len(split_msg) > 1:
-                result.append("{" + split_msg[s])
-            else:
-                result.append("{" + split_msg[s] + "}")
-            i += 1
-        return result
+    def __init__(self, TCP_IP_ADR='localhost', TCP_IP_PORT=12000,
+                 error_callback=None):
+        super().__init__(TCP_IP_ADR, TCP_IP_PORT)
+        self.labelProps: Dict[str, dict] = dict()
+
+        self.error_callback = error_callback
+
+        self.lock = threading.Lock()
+        self._labels_changed = threading.Condition(self.lock)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._json = json.JSONDecoder()
+        self._rcv = ''
+
+    def send(self, msg):
+        self.socket.sendall(bytes(msg, "utf-8"))
 
     def add_labelProps(self, data):
         if "label" in data.keys():
@@ -75,32 +125,33 @@ class SQTalk(threading.Thread):
             if isinstance(data["value"], (dict)):
                 self.labelProps[data["label"]] = data["value"]
             # General label communication, for example from broadcasts
-            else:
-                try:
-                    self.labelProps[data["label"]
-                                    ]["value"] = data["value"]
-                except Exception:
-                    None
+            elif data["label"] in self.labelProps:
+                self.labelProps[data["label"]]["value"] = data["value"]
 
     def check_error(self, data):
         if "label" in data.keys():
-            if "Error" in data["label"]:
+            if "Error" in data["label"] and self.error_callback is not None:
                 self.error_callback(data["value"])
 
-    def get_label(self, label):
-        timeout = 10
-        dt = .1
-        i = 0
+    def get_label(self, label, timeout=10):
+        """Return the properties of label, requesting them from the server
+        until they arrive or timeout (s) expires."""
+        deadline = time.monotonic() + timeout
         while True:
-            if i * dt > timeout:
+            with self.lock:
+                if label in self.labelProps:
+                    return self.labelProps[label]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.shutdown:
                 raise IOError("Could not acquire label")
-            try:
-                return self.labelProps[label]
-            except Exception:
-                self.send(json.dumps(
-                    {"request": "labelProps", "value": "None"}))
-                time.sleep(dt)
-            i += 1
+            # send without the lock, the reader thread needs it to store
+            # the reply
+            self.send(json.dumps(
+                {"request": "labelProps", "value": "None"}))
+            with self.lock:
+                self._labels_changed.wait_for(
+                    lambda: label in self.labelProps or self.shutdown,
+                    min(remaining, 1))
 
     def get_all_labels(self, label):
         return self.labelProps
@@ -108,89 +159,130 @@ class SQTalk(threading.Thread):
     def run(self):
         self.send(json.dumps(
             {"request": "labelProps", "value": "None"}))
-        rcv_msg = []
-
-        while self.shutdown is False:
+        super().run()
+
+    def _feed(self, data):
+        self._rcv += self._utf8.decode(data)
+        messages = self._decode_messages()
+        with self.lock:
+            for message in messages:
+                self.add_labelProps(message)
+            self._labels_changed.notify_all()
+        for message in messages:
+            self.check_error(message)
+
+    def _decode_messages(self) -> List[dict]:
+        """Return the complete JSON objects received so far and keep the
+        incomplete remainder for the next read."""
+        messages = []
+        rcv = self._rcv
+        pos = 0
+        while True:
+            while pos < len(rcv) and (rcv[pos] == '\x17' or rcv[pos].isspace()):
+                pos += 1
+            if pos == len(rcv):
+                break
             try:
-                rcv = "" + rcv_msg[1]
-            except Exception:
-                rcv = ""
-            data = {}
-            r = ""
-            while "\x17" not in rcv:
-                try:
-                    r = str(self.socket.recv(self.BUFFER), 'utf-8')
-                except Exception:
-                    None
-                rcv = rcv + r
-
-            rcv_msg = rcv.split("\x17")
-
-            for rcv_line in rcv_msg:
-                rcv_split = self.sub_jsons(rcv_line)
-                for msg in rcv_split:
-                    try:
-                        data = json.loads(msg)
-                    except Exception:
-                        None
-
-                    with self.lock:
-                        self.add_labelProps(data)
-                        self.check_error(data)
-
-
-class SQCounts(threading.Thread):
+                data, pos = self._json.raw_decode(rcv, pos)
+            except json.JSONDecodeError:
+                end = rcv.find('\x17', pos)
+                if end < 0:
+                    # incomplete message, wait for more data
+                    break
+                log.warning(f"Could not decode message {rcv[pos:end]!r}")
+                pos = end
+                continue
+            if isinstance(data, dict):
+                messages.append(data)
+        self._rcv = rcv[pos:]
+        return messages
+
+    def _closed(self):
+        with self.lock:
+            self._labels_changed.notify_all()
+
+
+class SQCounts(_SocketReader):
+    """Counts connection, keeps the last ``CNTS_BUFFER`` count measurements
+    in a NumPy ring buffer. Each measurement is a row with the timestamp
+    followed by the counts of each detector."""
+
     def __init__(
             self,
             TCP_IP_ADR='localhost',
             TCP_IP_PORT=12345,
             CNTS_BUFFER=100):
-        threading.Thread.__init__(self)
+        super().__init__(TCP_IP_ADR, TCP_IP_PORT)
         self.lock = threading.Lock()
-        self.rlock = threading.RLock()
-        self.TCP_IP_ADR = TCP_IP_ADR
-        self.TCP_IP_PORT = TCP_IP_PORT
-
-        self.socket = socket.socket(
-            socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.connect((self.TCP_IP_ADR, self.TCP_IP_PORT))
-        # self.socket.settimeout(.1)
-        self.BUFFER = 1000000
-        self.shutdown = False
+        self._new_counts = threading.Condition(self.lock)
 
-        self.cnts = []
         self.CNTS_BUFFER = CNTS_BUFFER
         self.n = 0
+        self._ring: Optional[np.ndarray] = None
+        self._partial = b''
 
-    def close(self):
-        # print("Closing Socket")
-        self.socket.close()
-        self.shutdown = True
+    @property
+    def cnts(self) -> np.ndarray:
+        """The buffered count measurements, oldest first."""
+        with self.lock:
+            return self._last(min(self.n, self.CNTS_BUFFER))
 
-    def get_n(self, n):
-        n0 = self.n
-        while self.n < n0 + n:
-            time.sleep(0.001)
-        cnts = self.cnts
-        return cnts[-n:]
-
-    def run(self):
-        while self.shutdown is False:
-            data_raw = str(self.socket.recv(self.BUFFER), 'utf-8')
+    def get_n(self, n, timeout=None):
+        """Wait for n new count measurements and return them, oldest first.
 
-            data_newline = data_raw.split('\n')
-
-            v = []
-            for d in data_newline[0].split(','):
-                v.append(float(d))
-
-            with self.lock:
-                self.cnts.append(v)
-                # Keep Size of self.cnts
-                len_ = len(self.cnts)
-                if len_ > self.CNTS_BUFFER:
-                    self.cnts = self.cnts[len_ - self.CNTS_BUFFER:]
+        The ring buffer is enlarged if it holds fewer than n measurements.
+        """
+        with self.lock:
+            if n > self.CNTS_BUFFER:
+                self._resize(n)
+            n0 = self.n
+            if not self._new_counts.wait_for(
+                    lambda: self.n >= n0 + n or self.shutdown, timeout):
+                raise TimeoutError(f"Received {self.n - n0} of {n} counts")
+            if self.n < n0 + n:
+                raise IOError("Counts connection closed")
+            return self._last(n)
+
+    def _last(self, n):
+        if self._ring is None:
+            return np.empty((0, 0))
+        return self._ring[np.arange(self.n - n, self.n) % len(self._ring)]
+
+    def _resize(self, size):
+        if self._ring is not None:
+            kept = self._last(min(self.n, self.CNTS_BUFFER))
+            ring = np.full((size, self._ring.shape[1]), np.nan)
+            ring[np.arange(self.n - len(kept), self.n) % size] = kept
+            self._ring = ring
+        self.CNTS_BUFFER = size
+
+    def _feed(self, data):
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                rows.append(np.array(line.split(b','), dtype=float))
+            except ValueError:
+                log.warning(f"Skipping malformed counts {line!r}")
+        with self.lock:
+            for row in rows:
+                if self._ring is None:
+                    # the first measurement fixes the number of detectors
+                    self._ring = np.full((self.CNTS_BUFFER, len(row)), np.nan)
+                elif self._ring.shape[1] != len(row):
+                    log.warning(f"Skipping counts with {len(row)} instead "
+                                f"of {self._ring.shape[1]} values")
+                    continue
+                self._ring[self.n % self.CNTS_BUFFER] = row
                 self.n += 1
+            self._new_counts.notify_all()
+
+    def _closed(self):
+        with self.lock:
+            self._new_counts.notify_all()
 
 
 class ChannelArray(ParameterWithSetpoints):
@@ -266,8 +358,7 @@ class CommunicationHandler(object):
         Return (numpy_array): Acquired counts with timestamp in first row.
         """
         n = self.root_instrument.npts()
-        cnts = self.cnts.get_n(n)
-        return np.array(cnts).T
+        return self.cnts.get_n(n).T
 
     def set_measurement_periode(self, t_in_ms):
         msg = json.dumps(
@@ -352,6 +443,10 @@ class CommunicationHandler(object):
         self.log.warning("ERROR DETECTED")
         self.log.warning(error_msg)
 
+    def close(self):
+        self.talk.close()
+        self.cnts.close()
+
 
 class WebSQControlqcode(Instrument):
     """The instrument.
@@ -360,13 +455,13 @@ class WebSQControlqcode(Instrument):
     Always call 'counters' if you want to fetch the next 'npts' counts.
     """
 
-    def __init__(self, name, address, port, **kwargs):
+    def __init__(self, name, address, port, counts_port=12345, **kwargs):
         # super().__init__(name, address, port, **kwargs)
         super().__init__(name, **kwargs)
 
         self.TCP_IP_ADR = address
         self.CONTROL_PORT = port
-        self.COUNTS_PORT = 12345
+        self.COUNTS_PORT = counts_port
         self.NUMBER_OF_DETECTORS = 0
 
         self.comm = CommunicationHandler(self.root_instrument, self.log,
@@ -463,3 +558,7 @@ class WebSQControlqcode(Instrument):
         )
 
         self.connect_message()
+
+    def close(self):
+        self.comm.close()
+        super().close()
@@ -17,7 +17,7 @@ import logging
 import numpy as np
 import ctypes as ct
 from functools import partial
-from typing import Union, Type
+from typing import Iterator, Optional, Union, Type
 
 from qcodes.utils.validators import Enum, Numbers, Anything, Ints
 from qcodes.instrument.base import Instrument
@@ -619,6 +619,13 @@ class M4i(Instrument):
         # memsize used for simple channel read-out
         self._channel_memsize = 2**12
 
+        # ring buffer used for FIFO acquisition, allocated on first use
+        self._fifo_buffer: Optional[np.ndarray] = None
+        # transfer buffer reused by segmented acquisitions
+        self._transfer_buffer: Optional[np.ndarray] = None
+        # voltage buffer reused by segmented acquisitions on request
+        self._segment_buffer: Optional[np.ndarray] = None
+
     # checks if requirements for the compensation get and set functions are met
     def _get_compensation(self, i):
         # if HF enabled
@@ -844,12 +851,25 @@ class M4i(Instrument):
         self.general_command(pyspcm.M2CMD_CARD_START
                              | pyspcm.M2CMD_CARD_ENABLETRIGGER)
 
-    def get_data(self):
+    def get_data(self, raw: bool = False, out: Optional[np.ndarray] = None,
+                 dtype=np.float64) -> np.ndarray:
         """ Reads measurement data from the digitizer.
 
         The data acquisition must have been started by start_acquisition() or
         start_triggered().
 
+        The conversion to voltages is done in a single broadcast of the
+        per channel scale factors over the transfer buffer, without
+        intermediate copies of the data.
+
+        Args:
+            raw (bool): If True, return the raw samples as a (samples, channels)
+                view on the transfer buffer without conversion to voltages.
+                The scale factors can be obtained with voltage_scale_factors()
+            out (None or array): array of shape (channels, samples) to write
+                the voltages into, for example a preallocated float32 array
+            dtype: data type of the voltages if no out array is given
+
         Returns:
             2D array with voltages per channel in V.
         """
@@ -873,13 +893,103 @@ class M4i(Instrument):
         finally:
             self._stop_acquisition()
 
+        raw_data = raw_data.reshape((-1, numch))
+        if raw:
+            return raw_data
+
+        if out is None:
+            out = np.empty((numch, raw_data.shape[0]), dtype=dtype)
+        elif out.shape != (numch, raw_data.shape[0]):
+            raise ValueError(f'out should have shape {(numch, raw_data.shape[0])}, got {out.shape}')
+        scale = self.voltage_scale_factors(active_channels, box_averages).astype(out.dtype)
+        np.multiply(raw_data, scale, out=out.T)
+        return out
+
+    def voltage_scale_factors(self, channels=None, box_averages=1) -> np.ndarray:
+        """ Return the factors to convert raw samples to voltages
+
+        Args:
+            channels (None or list): channel indices. If None, use the active channels
+            box_averages (int): number of boxcar averages in the raw data
+        Returns:
+            array with the scale factor in V per LSB for each channel
+        """
+        if channels is None:
+            channels = self.active_channels()
         resolution = self.ADC_to_voltage.cache()
-        voltages = np.zeros((numch, len(raw_data)//numch))
-        for i,ch in enumerate(active_channels):
-            mV_range = self.get(f'range_channel_{ch}')
-            voltages[i,:] = raw_data[i::numch] * (mV_range / 1000 / resolution / box_averages)
-        return voltages
+        mV_ranges = np.array([self.get(f'range_channel_{ch}') for ch in channels], dtype=float)
+        return mV_ranges / (1000 * resolution * box_averages)
+
+    def pipelined_acquisition(self, n_points: int, n_buffers: int = 2,
+                              raw: bool = False, dtype=np.float64) -> Iterator[np.ndarray]:
+        """ Acquire a series of data traces with overlapping acquisition and readout
+
+        After the data of a point has been transferred to the host the card is
+        re-armed for the next point immediately, before the data is converted
+        and handed to the caller. The conversion and any processing by the
+        caller thus overlap with the acquisition of the next point.
+
+        The card must have been configured for the acquisition, for example
+        with setup_multi_recording() or by one of the acquisition methods. The
+        data is transferred into n_buffers preallocated host buffers that are
+        used in turn, so a yielded array remains valid for n_buffers - 1
+        further iterations.
+
+        Args:
+            n_points (int): number of data traces to acquire
+            n_buffers (int): number of host buffers, at least 2
+            raw (bool): If True, yield the raw samples as (samples, channels)
+                arrays instead of voltages
+            dtype: data type of the voltages
+
+        Yields:
+            2D array with voltages per channel in V for every point
+
+        Example:
+            digitizer.setup_multi_recording(size, n_triggers)
+            for data in digitizer.pipelined_acquisition(n_points=100):
+                store(data)
+        """
+        if n_buffers < 2:
+            raise ValueError('n_buffers should be at least 2')
+
+        active_channels = self.active_channels()
+        memsize = self.data_memory_size.cache()
+        numch = len(active_channels)
+
+        card_mode = self.card_mode()
+        if card_mode == pyspcm.SPC_REC_STD_BOXCAR:
+            bytes_per_sample, averages = 4, self.box_averages()
+        elif card_mode == pyspcm.SPC_REC_STD_AVERAGE:
+            bytes_per_sample, averages = 4, self._param32bit(pyspcm.SPC_AVERAGES)
+        else:
+            bytes_per_sample, averages = 2, 1
+        sample_dtype = np.int16 if bytes_per_sample == 2 else np.int32
+
+        raw_buffers = [np.empty(memsize * numch, dtype=sample_dtype) for _ in range(n_buffers)]
+        voltage_buffers = [] if raw else [np.empty((numch, memsize), dtype=dtype) for _ in range(n_buffers)]
+        scale = self.voltage_scale_factors(active_channels, averages).astype(dtype)
 
+        self.start_triggered()
+        try:
+            for point in range(n_points):
+                self._check_ready(self.wait_ready())
+
+                index = point % n_buffers
+                raw_data = self._transfer_buffer_numpy(memsize, numch, bytes_per_sample,
+                                                       out=raw_buffers[index]).reshape((-1, numch))
+                self._stop_acquisition()
+                if point + 1 < n_points:
+                    self.start_triggered()
+
+                if raw:
+                    yield raw_data
+                else:
+                    voltages = voltage_buffers[index]
+                    np.multiply(raw_data, scale, out=voltages.T)
+                    yield voltages
+        finally:
+            self._stop_acquisition()
 
     def _stop_acquisition(self):
 
@@ -891,21 +1001,21 @@ class M4i(Instrument):
 
         self.general_command(pyspcm.M2CMD_CARD_STOP)
 
-    # TODO: if multiple channels are used at the same time, the voltage conversion needs to be updated
-    # TODO: the data also needs to be organized nicely (currently it
-    # interleaves the data)
     def multiple_trigger_acquisition(self, mV_range, memsize, seg_size, posttrigger_size):
         """ Acquire traces with the SPC_REC_STD_MULTI mode
 
         This method does not update the triggering properties.
 
         Args:
-            mV_range (float): Input range used for coversion to voltage
+            mV_range (float): Not used, the samples of each channel are
+                converted with the range of that channel
             memsize (int): Size of total buffer to acquire
             seg_size (int): Size of segments to record
             posttrigger_size (int): Size of the if post trigger buffer
         Returns:
-            Array with measured voltages
+            Array with measured voltages. If multiple channels are read, then
+            the data is interleaved. Use segmented_acquisition to obtain the
+            data per segment and channel.
 
         """
         self.card_mode(pyspcm.SPC_REC_STD_MULTI)  # multi
@@ -913,21 +1023,109 @@ class M4i(Instrument):
         self.data_memory_size(memsize)
         self.segment_size(seg_size)
         self.posttrigger_memory_size(posttrigger_size)
-        numch = self._num_channels()
+        active_channels = self.active_channels()
+        numch = len(active_channels)
 
         self.general_command(pyspcm.M2CMD_CARD_START | pyspcm.M2CMD_CARD_ENABLETRIGGER)
-        self.wait_ready()
 
         # convert transfer data to numpy array
         try:
+            self._check_ready(self.wait_ready())
             output = self._transfer_buffer_numpy(memsize, numch, bytes_per_sample=2)
         finally:
             self._stop_acquisition()
 
-        voltages = self.convert_to_voltage(output, mV_range / 1000)
+        # samples of all channels are interleaved
+        scale = self.voltage_scale_factors(active_channels)
+        voltages = (output.reshape((-1, numch)) * scale).ravel()
 
         return voltages
 
+    def segmented_acquisition(self, seg_size: int, n_segments: int,
+                              posttrigger_size: Optional[int] = None,
+                              average: bool = False, out: Optional[np.ndarray] = None,
+                              dtype=np.float64, reuse_buffer: bool = False) -> np.ndarray:
+        """ Acquire triggered segments with the SPC_REC_STD_MULTI mode
+
+        The transfer buffer is reused between calls with the same settings and
+        reshaped in place to segments and channels. Without an out array a new
+        array is allocated for the voltages on every call, unless reuse_buffer
+        is set. To avoid allocations in a loop, pass the previous result as out
+        or use reuse_buffer.
+
+        This method does not update the triggering properties.
+
+        Args:
+            seg_size (int): number of samples per segment, must be a multiple of 16
+            n_segments (int): number of segments (triggers) to acquire
+            posttrigger_size (None or int): size of the segment after the trigger.
+                If None, use seg_size - 16
+            average (bool): If True, average the segments
+            out (None or array): array to write the voltages into. The shape
+                should be (n_segments, n_channels, seg_size), or
+                (n_channels, seg_size) when averaging
+            dtype: data type of the voltages if no out array is given
+            reuse_buffer (bool): If True and no out array is given, write the
+                voltages into an array that is kept between calls with the same
+                shape and dtype. The returned array is then overwritten by the
+                next acquisition
+        Returns:
+            Array with voltages of shape (n_segments, n_channels, seg_size), or
+            (n_channels, seg_size) when averaging
+        """
+        if seg_size % 16:
+            raise ValueError('seg_size should be a multiple of 16')
+        if posttrigger_size is None:
+            posttrigger_size = seg_size - 16
+        memsize = n_segments * seg_size
+
+        self.card_mode(pyspcm.SPC_REC_STD_MULTI)
+        self.data_memory_size(memsize)
+        self.segment_size(seg_size)
+        self.posttrigger_memory_size(posttrigger_size)
+        active_channels = self.active_channels()
+        numch = len(active_channels)
+
+        shape = (numch, seg_size) if average else (n_segments, numch, seg_size)
+        if out is None and reuse_buffer:
+            out = self._segment_buffer
+            if out is None or out.shape != shape or out.dtype != dtype:
+                out = self._segment_buffer = np.empty(shape, dtype=dtype)
+        elif out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif out.shape != shape:
+            raise ValueError(f'out should have shape {shape}, got {out.shape}')
+
+        self.general_command(pyspcm.M2CMD_CARD_START | pyspcm.M2CMD_CARD_ENABLETRIGGER)
+
+        try:
+            self._check_ready(self.wait_ready())
+            raw_data = self._transfer_buffer_numpy(memsize, numch, reuse_buffer=True)
+        finally:
+            self._stop_acquisition()
+
+        # samples of all channels are interleaved within each segment
+        segments = raw_data.reshape((n_segments, seg_size, numch)).transpose(0, 2, 1)
+        scale = self.voltage_scale_factors(active_channels).astype(out.dtype)[:, np.newaxis]
+        if average:
+            np.sum(segments, axis=0, dtype=out.dtype, out=out)
+            out *= scale / n_segments
+        else:
+            np.multiply(segments, scale, out=out)
+
+        return out
+
+    def _check_ready(self, res: int) -> None:
+        """ Raise if waiting for the card did not succeed
+
+        Args:
+            res (int): result of wait_ready()
+        """
+        if res == pyspcm.ERR_TIMEOUT:
+            raise Exception(f'Timeout waiting for data (timeout: {self.timeout()} ms)')
+        elif res != pyspcm.ERR_OK:
+            raise Exception(f'Error waiting for data: (0x{res:04x})')
+
     def start_acquisition(self, mV_range, memsize, posttrigger_size=None, verbose=0):
         """ Start data acquisition of a single data trace
 
@@ -955,45 +1153,146 @@ class M4i(Instrument):
 
         return {'memsize': memsize, 'numch': numch, 'mV_range': mV_range}
 
-    def _transfer_buffer_numpy(self, memsize: int, numch: int, bytes_per_sample=2) -> np.ndarray:
+    def _transfer_buffer_numpy(self, memsize: int, numch: int, bytes_per_sample=2,
+                               reuse_buffer: bool = False,
+                               out: Optional[np.ndarray] = None) -> np.ndarray:
         """ Transfer buffer to numpy array
 
         Args:
             memsize (int): number of samples to transfer
             numch (int): number of channels
             bytes_per_sample (int): specifies the datatype. 2 for int16, 4 for int32
+            reuse_buffer (bool): If True, transfer into a buffer that is kept
+                between calls with the same size and datatype. The returned
+                array is then overwritten by the next transfer
+            out (None or array): preallocated 1D array to transfer into
         Returns:
             array: transfered data
 
         """
         # setup software buffer
-        sample_ctype: Union[Type[ct.c_int16], Type[ct.c_int32]]
+        sample_dtype: Union[Type[np.int16], Type[np.int32]]
         if bytes_per_sample == 2:
-            sample_ctype = ct.c_int16
+            sample_dtype = np.int16
         elif bytes_per_sample == 4:
-            sample_ctype = ct.c_int32
+            sample_dtype = np.int32
         else:
             raise ValueError('bytes_per_sample should be 2 or 4')
 
-        ctype_buffer_type = sample_ctype * memsize * numch
-        data_buffer = (ctype_buffer_type)()
-        data_pointer = ct.cast(data_buffer, ct.c_void_p)
+        nsamples = memsize * numch
+        if out is not None:
+            if out.dtype != sample_dtype or out.size != nsamples or not out.flags.c_contiguous:
+                raise ValueError(f'out should be a contiguous {np.dtype(sample_dtype)} array of size {nsamples}')
+            output = out
+        elif reuse_buffer:
+            output = self._transfer_buffer
+            if output is None or output.dtype != sample_dtype or output.size != nsamples:
+                output = self._transfer_buffer = np.empty(nsamples, dtype=sample_dtype)
+        else:
+            output = np.empty(nsamples, dtype=sample_dtype)
+        data_pointer = ct.c_void_p(output.ctypes.data)
 
         # data acquisition
         self._def_transfer64bit(
-            pyspcm.SPCM_BUF_DATA, pyspcm.SPCM_DIR_CARDTOPC, 0, data_pointer, 0, bytes_per_sample * memsize * numch)
+            pyspcm.SPCM_BUF_DATA, pyspcm.SPCM_DIR_CARDTOPC, 0, data_pointer, 0, bytes_per_sample * nsamples)
         self.general_command(pyspcm.M2CMD_DATA_STARTDMA | pyspcm.M2CMD_DATA_WAITDMA)
         if self._last_set_result != pyspcm.ERR_OK:
             res = self._last_set_result
             raise Exception(f'Error transferring data: {_errormsg_dict[res]} (0x{res:04x})')
 
-        # convert buffer to numpy array
-        # this does not typecheck with numpy 1.22 should be updated
-        # by someone with access to test on the real data.
-        output = np.frombuffer(data_buffer, dtype=sample_ctype) # type: ignore[call-overload]
-
         return output
 
+    @staticmethod
+    def _page_aligned_buffer(nbytes: int, dtype=np.int16, alignment: int = 4096) -> np.ndarray:
+        """ Allocate a numpy array of nbytes bytes starting at a page boundary
+
+        The Spectrum driver requires page aligned memory for FIFO transfers.
+        """
+        raw = np.empty(nbytes + alignment, dtype=np.uint8)
+        offset = -raw.ctypes.data % alignment
+        return raw[offset:offset + nbytes].view(dtype)
+
+    def fifo_acquisition(self, notify_size: int = 2**20, buffer_blocks: int = 16,
+                         n_blocks: Optional[int] = None,
+                         pretrigger_size: int = 16) -> Iterator[np.ndarray]:
+        """ Stream data from the card using the SPC_REC_FIFO_SINGLE mode
+
+        The card continuously transfers data into a page aligned ring buffer of
+        ``buffer_blocks * notify_size`` bytes. The ring buffer is allocated once
+        and reused by subsequent calls. Each time ``notify_size`` bytes are
+        available a numpy view on that part of the ring buffer is yielded. A
+        view is only valid until the next iteration, since then the memory is
+        handed back to the card. The acquisition is stopped when the generator
+        is exhausted or closed.
+
+        This method does not update the triggering properties.
+
+        Args:
+            notify_size (int): number of bytes per yielded block, must be a
+                multiple of 4096
+            buffer_blocks (int): size of the ring buffer in blocks
+            n_blocks (None or int): number of blocks to acquire. If None, acquire
+                until the generator is closed
+            pretrigger_size (int): size of data trace before triggering
+
+        Yields:
+            1D int16 array with the raw samples of a block. If multiple channels
+            are enabled, then the data is interleaved
+
+        Example:
+            for block in digitizer.fifo_acquisition(notify_size=2**20, n_blocks=1000):
+                process(block)
+        """
+        if notify_size <= 0 or notify_size % 4096:
+            raise ValueError('notify_size should be a positive multiple of 4096 bytes')
+        if buffer_blocks < 2:
+            raise ValueError('buffer_blocks should be at least 2')
+
+        bytes_per_sample = 2
+        numch = self._num_channels()
+        block_samples = notify_size // bytes_per_sample
+        buffer_size = notify_size * buffer_blocks
+
+        if self._fifo_buffer is None or self._fifo_buffer.nbytes != buffer_size:
+            self._fifo_buffer = self._page_aligned_buffer(buffer_size)
+        buffer = self._fifo_buffer
+
+        segment_size = block_samples // numch
+        self.card_mode(pyspcm.SPC_REC_FIFO_SINGLE)
+        self.segment_size(segment_size)
+        self.pretrigger_memory_size(pretrigger_size)
+        self.posttrigger_memory_size(segment_size - pretrigger_size)
+        self.total_segments(0 if n_blocks is None else n_blocks)
+
+        self._def_transfer64bit(pyspcm.SPCM_BUF_DATA, pyspcm.SPCM_DIR_CARDTOPC, notify_size,
+                                ct.c_void_p(buffer.ctypes.data), 0, buffer_size)
+        self.general_command(pyspcm.M2CMD_CARD_START | pyspcm.M2CMD_CARD_ENABLETRIGGER
+                             | pyspcm.M2CMD_DATA_STARTDMA)
+
+        blocks = 0
+        try:
+            while n_blocks is None or blocks < n_blocks:
+                available = self._param64bit(pyspcm.SPC_DATA_AVAIL_USER_LEN)
+                if available < notify_size:
+                    self.general_command(pyspcm.M2CMD_DATA_WAITDMA)
+                    if self._last_set_result == pyspcm.ERR_TIMEOUT:
+                        raise Exception(f'Timeout waiting for FIFO data (timeout: {self.timeout()} ms)')
+                    if self.card_status() & pyspcm.M2STAT_DATA_OVERRUN:
+                        raise Exception('FIFO overrun: data was not read out fast enough')
+                    continue
+
+                position = self._param64bit(pyspcm.SPC_DATA_AVAIL_USER_POS)
+                for _ in range(available // notify_size):
+                    if n_blocks is not None and blocks >= n_blocks:
+                        break
+                    start = position // bytes_per_sample
+                    yield buffer[start:start + block_samples]
+                    self.card_available_length(notify_size)
+                    position = (position + notify_size) % buffer_size
+                    blocks += 1
+        finally:
+            self._stop_acquisition()
+
     def retrieve_data(self, trace):
         """ Retrieve data from the digitizer
 
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import logging
 import numpy as np
@@ -36,6 +37,7 @@ class SIM928(VisaInstrument):
             if self.slot_names[i] in self.module_nr:
                 raise ValueError('Duplicate names in slot_names')
             self.module_nr[self.slot_names[i]] = i
+        self._ramp_executor = None
 
         self.write('*DCL')  # device clear
         self.write('FLSH')  # flush port buffers
@@ -69,6 +71,15 @@ class SIM928(VisaInstrument):
 
         super().connect_message()
 
+    def close(self):
+        """
+        Wait for any background ramp to finish and close the connection.
+        """
+        if self._ramp_executor is not None:
+            self._ramp_executor.shutdown(wait=True)
+            self._ramp_executor = None
+        super().close()
+
     def get_module_idn(self, i):
         """
         Get the vendor, model, serial number and firmware version of a module.
@@ -187,18 +198,29 @@ class SIM928(VisaInstrument):
             i = self.module_nr[i]
         return float(self.ask_module(i, 'VOLT?'))
 
-    def set_smooth(self, voltagedict, equitime=False):
+    def set_smooth(self, voltagedict, equitime=False, wait=True):
         """
         Set the voltages as specified in ``voltagedict` smoothly,
         by changing the output on each module at a rate
         ``volt_#_step/smooth_timestep``.
 
+        All ramps run one after the other on a single worker thread. The
+        trajectories of all modules are calculated when the ramp begins,
+        starting from the cached voltages, and each step is sent to all
+        modules in a single write to the mainframe.
+
         Args:
             voltagedict (Dict[float]): A dictionary where keys are module slot
                 numbers or names and values are the desired output voltages.
             equitime (bool): If ``True``, uses smaller step sizes for some of
                 the modules so that all modules reach the desired value at the
                 same time.
+            wait (bool): If ``False``, the ramp runs in a background thread
+                and a ``concurrent.futures.Future`` is returned, which is done
+                when the ramp has finished. Ramps submitted while another one
+                is running start where that one ends. Avoid other
+                communication with the instrument until then. Default
+                ``True``.
         """
 
         # convert voltagedict to contain module names only and validate inputs
@@ -215,46 +237,95 @@ class SIM928(VisaInstrument):
             vdict[name] = voltagedict[i]
             self.parameters['volt_{}'.format(name)].validate(vdict[name])
 
-        intermediate = []
+        names = list(vdict)
+        stop = np.array([vdict[name] for name in names])
+        stepsize = np.array([self.get('volt_{}_step'.format(name))
+                             for name in names])
+        if self._ramp_executor is None:
+            self._ramp_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='{}_ramp'.format(self.name))
+        future = self._ramp_executor.submit(self._smooth_ramp, names, stop,
+                                            stepsize, equitime)
+        if wait:
+            return future.result()
+        return future
+
+    def _smooth_ramp(self, names, stop, stepsize, equitime):
+        """
+        Ramp the modules from their cached voltages to ``stop``. Runs on the
+        ramp executor, so the start is read only once all ramps submitted
+        before have finished.
+
+        Args:
+            names (List): Module names, matching the entries of ``stop``.
+            stop (np.ndarray): Desired voltage of each module.
+            stepsize (np.ndarray): Largest voltage step of each module.
+            equitime (bool): If ``True``, all modules reach the desired value
+                at the same time.
+        """
+        start = np.array([self.parameters['volt_{}'.format(name)].cache.get()
+                          for name in names])
+        trajectories = self._smooth_trajectories(start, stop, stepsize,
+                                                 equitime)
+        self._ramp(names, start, trajectories)
+
+    @staticmethod
+    def _smooth_trajectories(start, stop, stepsize, equitime):
+        """
+        Calculate the intermediate voltages of a smooth change.
+
+        Args:
+            start (np.ndarray): Voltage of each module before the change.
+            stop (np.ndarray): Desired voltage of each module.
+            stepsize (np.ndarray): Largest voltage step of each module.
+            equitime (bool): If ``True``, scale the steps so that all modules
+                reach the desired value at the same time.
+
+        Returns:
+            np.ndarray: Voltages (step, module), where modules that have
+            already reached the desired value keep it.
+        """
+        deltav = stop - start
+        steps = np.ceil(np.abs(deltav) / stepsize).astype(int)
+        nsteps = int(steps.max(initial=0))
         if equitime:
-            maxsteps = 0
-            deltav = {}
-            for i in vdict:
-                deltav[i] = vdict[i]-self.get('volt_{}'.format(i))
-                stepsize = self.get('volt_{}_step'.format(i))
-                steps = abs(int(np.ceil(deltav[i]/stepsize)))
-                if steps > maxsteps:
-                    maxsteps = steps
-            for s in range(maxsteps):
-                intermediate.append({})
-                for i in vdict:
-                    intermediate[-1][i] = vdict[i] - \
-                                          deltav[i]*(maxsteps-s-1)/maxsteps
-        else:
-            done = []
-            prevvals = {}
-            for i in vdict:
-                prevvals[i] = self.get('volt_{}'.format(i))
-            while len(done) != len(vdict):
-                intermediate.append({})
-                for i in vdict:
-                    if i in done:
-                        continue
-                    stepsize = self.get('volt_{}_step'.format(i))
-                    deltav = vdict[i]-prevvals[i]
-                    if abs(deltav) <= stepsize:
-                        intermediate[-1][i] = vdict[i]
-                        done.append(i)
-                    elif deltav > 0:
-                        intermediate[-1][i] = prevvals[i] + stepsize
-                    else:
-                        intermediate[-1][i] = prevvals[i] - stepsize
-                    prevvals[i] = intermediate[-1][i]
-
-        for voltages in intermediate:
-            for i in voltages:
-                self.set_voltage(i, voltages[i])
-            time.sleep(self.smooth_timestep())
+            fraction = np.arange(1, nsteps + 1)[:, np.newaxis] / nsteps
+            return stop - deltav * (1 - fraction)
+        nsteps = max(nsteps, 1)
+        change = np.arange(1, nsteps + 1)[:, np.newaxis] * stepsize
+        trajectories = start + np.sign(deltav) * np.minimum(change,
+                                                            np.abs(deltav))
+        trajectories[np.maximum(steps, 1) - 1, np.arange(len(stop))] = stop
+        return np.where(np.arange(nsteps)[:, np.newaxis] < steps[np.newaxis, :],
+                        trajectories, stop)
+
+    def _ramp(self, names, start, trajectories):
+        """
+        Send precalculated voltages to the modules, one step per
+        ``smooth_timestep``.
+
+        Args:
+            names (List): Module names, matching the columns of
+                ``trajectories``.
+            start (np.ndarray): Voltage of each module before the change.
+            trajectories (np.ndarray): Voltages (step, module).
+        """
+        slots = [self.module_nr.get(name, name) for name in names]
+        parameters = [self.parameters['volt_{}'.format(name)]
+                      for name in names]
+        timestep = self.smooth_timestep()
+        previous = start
+        deadline = time.perf_counter()
+        for voltages in trajectories:
+            changed = np.flatnonzero(voltages != previous)
+            if len(changed):
+                self.write(';'.join('SNDT {},"VOLT {:.3f}"'.format(
+                    slots[j], voltages[j]) for j in changed))
+                for j in changed:
+                    parameters[j].cache.set(voltages[j])
+            previous = voltages
+            deadline += timestep
+            time.sleep(max(0.0, deadline - time.perf_counter()))
 
     def get_module_status(self, i):
         """
@@ -20,11 +20,61 @@
 
 
 import time
+import hashlib
 import logging
 import numpy as np
 import struct
 from qcodes import VisaInstrument, validators as vals
 
+# One waveform sample in a MAGIC 1000/2000 file: a little-endian float
+# followed by the marker byte (marker 1 in bit 0, marker 2 in bit 1)
+_SAMPLE_DTYPE = np.dtype([('w', '<f4'), ('m', 'u1')])
+
+# Size of the pieces in which files are written to the instrument
+_UPLOAD_CHUNK_BYTES = 2**20
+
+
+def _encode_waveform_file(magic, w, m1, m2, clock):
+    """
+    Encodes a waveform or pattern file as an IEEE definite length block,
+    ready to be appended to a ``MMEM:DATA`` command.
+
+    The samples are written in one vectorised pass into a preallocated
+    buffer, using a structured dtype with the layout of the file format.
+
+    Args:
+        magic (str): file type, 'MAGIC 1000' for waveforms or 'MAGIC 2000'
+            for patterns
+        w (float[numpoints]): waveform
+        m1 (int[numpoints]): marker1
+        m2 (int[numpoints]): marker2
+        clock (float): frequency (Hz)
+
+    Returns:
+        bytearray: the encoded block
+    """
+    n = len(w)
+    magic_line = ('%s\n' % magic).encode()
+    data_header = ('#%d%d' % (len(str(n * _SAMPLE_DTYPE.itemsize)),
+                              n * _SAMPLE_DTYPE.itemsize)).encode()
+    clock_line = ('CLOCK %.10e\n' % clock).encode()
+    body_len = (len(magic_line) + len(data_header)
+                + n * _SAMPLE_DTYPE.itemsize + len(clock_line))
+    block_header = ('#%d%d' % (len(str(body_len)), body_len)).encode()
+
+    buf = bytearray(len(block_header) + body_len)
+    offset = 0
+    for part in (block_header, magic_line, data_header):
+        buf[offset:offset + len(part)] = part
+        offset += len(part)
+    samples = np.frombuffer(buf, dtype=_SAMPLE_DTYPE, count=n, offset=offset)
+    samples['w'] = w
+    samples['m'] = (np.asarray(m1).astype(np.uint8)
+                    + 2 * np.asarray(m2).astype(np.uint8))
+    offset += n * _SAMPLE_DTYPE.itemsize
+    buf[offset:] = clock_line
+    return buf
+
 
 class Tektronix_AWG520(VisaInstrument):
     """
@@ -377,7 +427,7 @@ class Tektronix_AWG520(VisaInstrument):
                     bestand = ""
                 elif bool:
                     bestand = bestand + lijst[i]
-        if exists:
+        if exists and name not in self._values['files']:
             data = self.visa_handle.ask('MMEM:DATA? "%s"' %name)
             logging.debug(__name__  + ' : File exists on instrument, loading \
             into local memory')
@@ -414,7 +464,7 @@ class Tektronix_AWG520(VisaInstrument):
 
             self._values['recent_channel_%s' %channel] = self._values['files'][name]
             self._values['recent_channel_%s' %channel]['filename'] = name
-        else:
+        elif not exists:
             logging.error(__name__ + ' : Invalid filename specified %s' %name)
 
         if (self._numpoints==self._values['files'][name]['numpoints']):
@@ -435,10 +485,12 @@ class Tektronix_AWG520(VisaInstrument):
         return self
     # Send waveform to the device
 
-    def send_waveform(self, w, m1, m2, filename, clock):
+    def send_waveform(self, w, m1, m2, filename, clock, force=False):
         """
         Sends a complete waveform. All parameters need to be specified.
         choose a file extension 'wfm' (must end with .pat)
+        The upload is skipped if the file was already sent with the same
+        content, unless force is True.
         See also: resend_waveform()
 
         Input:
@@ -447,6 +499,7 @@ class Tektronix_AWG520(VisaInstrument):
             m2 (int[numpoints])  : marker2
             filename (str)    : filename
             clock (int)          : frequency (Hz)
+            force (bool)         : upload even if the file is unchanged
 
         Output:
             None
@@ -458,34 +511,16 @@ class Tektronix_AWG520(VisaInstrument):
 
         if (not((len(w) == len(m1)) and ((len(m1) == len(m2))))):
             return 'error'
-        self._values['files'][filename] = {}
-        self._values['files'][filename]['w'] = w
-        self._values['files'][filename]['m1'] = m1
-        self._values['files'][filename]['m2'] = m2
-        self._values['files'][filename]['clock'] = clock
-        self._values['files'][filename]['numpoints'] = len(w)
-
-        m = m1 + np.multiply(m2, 2)
-        ws = ''
-        for i in range(0, len(w)):
-            ws = ws + struct.pack('<fB', w[i], int(m[i]))
-        s1 = 'MMEM:DATA "%s",' % filename
-        s3 = 'MAGIC 1000\n'
-        s5 = ws
-        s6 = 'CLOCK %.10e\n' % clock
 
-        s4 = '#' + str(len(str(len(s5)))) + str(len(s5))
-        lenlen = str(len(str(len(s6) + len(s5) + len(s4) + len(s3))))
-        s2 = '#' + lenlen + str(len(s6) + len(s5) + len(s4) + len(s3))
+        self._send_file(filename, 'MAGIC 1000', w, m1, m2, clock, force)
 
-        mes = s1 + s2 + s3 + s4 + s5 + s6
-        self.visa_handle.write(mes)
-
-    def send_pattern(self, w, m1, m2, filename, clock):
+    def send_pattern(self, w, m1, m2, filename, clock, force=False):
         """
         Sends a pattern file.
         similar to waveform except diff file extension
         number of poitns different. diff byte conversion
+        The upload is skipped if the file was already sent with the same
+        content, unless force is True.
         See also: resend_waveform()
 
         Input:
@@ -494,6 +529,7 @@ class Tektronix_AWG520(VisaInstrument):
             m2 (int[numpoints])  : marker2
             filename (str)    : filename
             clock (int)          : frequency (Hz)
+            force (bool)         : upload even if the file is unchanged
 
         Output:
             None
@@ -504,35 +540,63 @@ class Tektronix_AWG520(VisaInstrument):
         dim = len(w)
         if (not((len(w)==len(m1)) and ((len(m1)==len(m2))))):
             return 'error'
-        self._values['files'][filename]={}
-        self._values['files'][filename]['w']=w
-        self._values['files'][filename]['m1']=m1
-        self._values['files'][filename]['m2']=m2
-        self._values['files'][filename]['clock']=clock
-        self._values['files'][filename]['numpoints']=len(w)
-
-        m = m1 + np.multiply(m2, 2)
-        ws = ''
-        for i in range(0, len(w)):
-            ws = ws + struct.pack('<fB', w[i], int(m[i]))
 
-        s1 = 'MMEM:DATA "%s",' % filename
-        s3 = 'MAGIC 2000\n'
-        s5 = ws
-        s6 = 'CLOCK %.10e\n' % clock
+        self._send_file(filename, 'MAGIC 2000', w, m1, m2, clock, force)
 
-        s4 = '#' + str(len(str(len(s5)))) + str(len(s5))
-        lenlen=str(len(str(len(s6) + len(s5) + len(s4) + len(s3))))
-        s2 = '#' + lenlen + str(len(s6) + len(s5) + len(s4) + len(s3))
+    def _send_file(self, filename, magic, w, m1, m2, clock, force=False):
+        """
+        Encodes a waveform or pattern file and streams it to the instrument,
+        unless the cached file of the same name has the same digest.
 
-        mes = s1 + s2 + s3 + s4 + s5 + s6
-        self.visa_handle.write(mes)
+        Returns True if the file was uploaded.
+        """
+        block = _encode_waveform_file(magic, w, m1, m2, clock)
+        digest = hashlib.sha1(block).hexdigest()
+        cached = self._values['files'].get(filename, {})
+        if not force and cached.get('digest') == digest:
+            logging.debug(__name__ + ' : %s is unchanged, not sending it'
+                          % filename)
+            return False
+
+        self._values['files'][filename] = {}
+        self._values['files'][filename]['w'] = w
+        self._values['files'][filename]['m1'] = m1
+        self._values['files'][filename]['m2'] = m2
+        self._values['files'][filename]['clock'] = clock
+        self._values['files'][filename]['numpoints'] = len(w)
+        self._values['files'][filename]['digest'] = digest
 
+        self._write_chunked([('MMEM:DATA "%s",' % filename).encode(),
+                             block,
+                             self.visa_handle.write_termination.encode()])
+        return True
+
+    def _write_chunked(self, parts, chunk_size=_UPLOAD_CHUNK_BYTES):
+        """
+        Writes the concatenation of parts as one message, in pieces of at
+        most chunk_size bytes. The end of the message is only signalled
+        with the last piece.
+        """
+        chunks = (bytes(view[i:i + chunk_size])
+                  for view in map(memoryview, parts)
+                  for i in range(0, len(view), chunk_size))
+        send_end = self.visa_handle.send_end
+        try:
+            self.visa_handle.send_end = False
+            chunk = next(chunks)
+            for next_chunk in chunks:
+                self.visa_handle.write_raw(chunk)
+                chunk = next_chunk
+            self.visa_handle.send_end = send_end
+            self.visa_handle.write_raw(chunk)
+        finally:
+            self.visa_handle.send_end = send_end
 
     def resend_waveform(self, channel, w=[], m1=[], m2=[], clock=[]):
         """
         Resends the last sent waveform for the designated channel
         Overwrites only the parameters specifiedta
+        The file is only uploaded if its content changed.
 
         Input: (mandatory)
             channel (int) : 1 or 2, the number of the designated channel
@@ -550,11 +614,11 @@ class Tektronix_AWG520(VisaInstrument):
         logging.debug(__name__ + ' : Resending %s to channel %s' % (filename, channel))
 
 
-        if (w==[]):
+        if len(w) == 0:
             w = self._values['recent_channel_%s' %channel]['w']
-        if (m1==[]):
+        if len(m1) == 0:
             m1 = self._values['recent_channel_%s' %channel]['m1']
-        if (m2==[]):
+        if len(m2) == 0:
             m2 = self._values['recent_channel_%s' %channel]['m2']
         if (clock==[]):
             clock = self._values['recent_channel_%s' %channel]['clock']
@@ -563,7 +627,7 @@ class Tektronix_AWG520(VisaInstrument):
             logging.error(__name__ + ' : one (or more) lengths of waveforms do not match with numpoints')
 
         self.send_waveform(w, m1, m2, filename, clock)
-        self.do_set_filename(filename, channel)
+        self._do_set_filename(filename, channel)
 
     def delete_all_waveforms_from_list(self):
         """
@@ -572,22 +636,28 @@ class Tektronix_AWG520(VisaInstrument):
         """
         pass
 
-    def send_sequence(self, wfs, rep, wait, goto, logic_jump, filename):
+    def send_sequence(self, wfs, rep, wait, goto, logic_jump, filename,
+                      waveforms=None):
         """
         Sends a sequence file (for the moment only for ch1)
 
         Args:
 
            wfs:  list of filenames
+           waveforms: optional dict of filename to (w, m1, m2, clock) for
+               the files referenced by the sequence. Files ending with .pat
+               are sent as patterns, others as waveforms. Only the files
+               that are new or changed are uploaded.
 
         Returs:
 
-            None
+            list of the waveform files that were uploaded
         """
+        uploaded = self._send_sequence_waveforms(wfs, waveforms or {})
         logging.debug(__name__ + ' : Sending sequence %s to instrument' % filename)
         N = str(len(rep))
         try:
-            wfs.remove(N*[None])
+            wfs.remove(len(rep)*[None])
         except ValueError:
             pass
         s1 = 'MMEM:DATA "%s",' % filename
@@ -611,6 +681,24 @@ class Tektronix_AWG520(VisaInstrument):
 
         mes = s1 + s2 + s3 + s4 + s5
         self.visa_handle.write(mes)
+        return uploaded
+
+    def _send_sequence_waveforms(self, wfs, waveforms):
+        """
+        Sends the files of waveforms that are referenced in wfs and differ
+        from the cached files.
+
+        Returns the list of uploaded filenames
+        """
+        uploaded = []
+        for name in dict.fromkeys(np.ravel(np.array(wfs, dtype=object))):
+            if name not in waveforms:
+                continue
+            magic = 'MAGIC 2000' if name.endswith('.pat') else 'MAGIC 1000'
+            w, m1, m2, clock = waveforms[name]
+            if self._send_file(name, magic, w, m1, m2, clock):
+                uploaded.append(name)
+        return uploaded
 
     def send_sequence2(self,wfs1,wfs2,rep,wait,goto,logic_jump,filename):
         """
@@ -657,9 +745,13 @@ class Tektronix_AWG520(VisaInstrument):
         """
         self.visa_handle.write('SOUR%s:FUNC:USER "%s","MAIN"' % (1, filename))
 
-    def load_and_set_sequence(self,wfs,rep,wait,goto,logic_jump,filename):
+    def load_and_set_sequence(self,wfs,rep,wait,goto,logic_jump,filename,
+                              waveforms=None):
         """
         Loads and sets the awg sequecne
+        Only the new or changed files of waveforms are uploaded, see
+        send_sequence.
         """
-        self.send_sequence(wfs,rep,wait,goto,logic_jump,filename)
+        self.send_sequence(wfs,rep,wait,goto,logic_jump,filename,
+                           waveforms=waveforms)
         self.set_sequence(filename)
@@ -3,7 +3,7 @@ Test AWG memory manager:
 * default initialization
 * allocate / release
 '''
-from qcodes_contrib_drivers.drivers.Keysight.SD_common.memory_manager import MemoryManager
+from qcodes_contrib_drivers.drivers.Keysight.SD_common.memory_manager import MemoryManager, exact_fit
 
 import unittest
 import logging
@@ -94,3 +94,55 @@ class TestMemoryManager(unittest.TestCase):
         mm.set_waveform_limit(VERY_LARGE_SIZE)
         new_slots = mm.get_uninitialized_slots()
         self.assertEqual(len(new_slots), N_VERY_LARGE)
+
+
+    def test_custom_memory_sizes(self):
+        mm = MemoryManager(logging, MEDIUM_SIZE, memory_sizes=[(int(1e4), 10), (int(1e5), 1000)])
+
+        new_slots = mm.get_uninitialized_slots()
+        self.assertEqual(len(new_slots), 1010)
+
+        slots = [mm.allocate(MEDIUM_SIZE) for i in range(1000)]
+        with self.assertRaises(Exception):
+            mm.allocate(MEDIUM_SIZE)
+
+        for allocated_slot in slots:
+            allocated_slot.release()
+
+        with self.assertRaises(Exception):
+            MemoryManager(logging, memory_sizes=[(1000, 10)])
+
+
+    def test_exact_fit(self):
+        mm = MemoryManager(logging, LARGE_SIZE, strategy=exact_fit)
+
+        slots = [mm.allocate(SMALL_SIZE) for i in range(N_SMALL)]
+
+        with self.assertRaises(Exception):
+            # larger slots are not used for small waveforms
+            mm.allocate(SMALL_SIZE)
+
+        allocated_slot = mm.allocate(MEDIUM_SIZE)
+        allocated_slot.release()
+
+        for allocated_slot in slots:
+            allocated_slot.release()
+
+
+    def test_fragmentation(self):
+        mm = MemoryManager(logging)
+
+        slots = [mm.allocate(SMALL_SIZE) for i in range(N_SMALL + 1)]
+
+        stats = mm.fragmentation()
+        self.assertEqual(stats['allocated'], N_SMALL * 10_000 + 100_000)
+        self.assertEqual(stats['used'], (N_SMALL + 1) * SMALL_SIZE)
+        self.assertAlmostEqual(stats['unused_fraction'],
+                               1 - stats['used'] / stats['allocated'])
+        self.assertEqual(stats['oversized'], 1)
+        self.assertEqual(stats['failed'], 0)
+
+        for allocated_slot in slots:
+            allocated_slot.release()
+
+        self.assertEqual(mm.fragmentation()['allocated'], 0)
@@ -0,0 +1,53 @@
+'''
+Test SD_AWG_Async with a mocked keysightSD1:
+* int16 waveforms are uploaded without conversion to float
+* upload statistics
+'''
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+with patch.dict(sys.modules, keysightSD1=MagicMock(name='keysightSD1')):
+    from qcodes_contrib_drivers.drivers.Keysight.SD_common import SD_AWG_Async as SD_AWG_Async_module
+    from qcodes_contrib_drivers.drivers.Keysight.SD_common.SD_AWG_Async import SD_AWG_Async
+
+
+class TestSD_AWG_Async(unittest.TestCase):
+
+    def setUp(self):
+        self.awg = SD_AWG_Async('awg', 0, 2, 4, 8, waveform_size_limit=2000,
+                                memory_sizes=[(2000, 4)])
+        self.addCleanup(self.awg.close)
+        self.awg.awg.waveformReLoadArrayInt16.return_value = 0
+        self.awg.awg.waveformReLoad.return_value = 0
+
+    def test_upload_int16(self):
+        sd_wave = SD_AWG_Async_module.keysightSD1.SD_Wave
+        wave = np.arange(2000, dtype=np.int16)
+
+        ref = self.awg.upload_waveform(wave)
+        ref.wait_uploaded()
+
+        for call in sd_wave.return_value.newFromArrayDouble.call_args_list:
+            self.assertFalse(np.array_equal(call.args[1], wave))
+        data = self.awg.awg.waveformReLoadArrayInt16.call_args.args[1]
+        self.assertIs(data, wave)
+        stats = self.awg.upload_stats()
+        self.assertEqual(stats['uploads'], 1)
+        self.assertEqual(stats['samples'], 2000)
+        ref.release()
+
+    def test_upload_float(self):
+        ref = self.awg.upload_waveform(np.linspace(-1, 1, 2000))
+        ref.wait_uploaded()
+
+        self.awg.awg.waveformReLoadArrayInt16.assert_not_called()
+        self.assertEqual(self.awg.upload_stats()['uploads'], 1)
+        ref.release()
+
+    def test_upload_stats_needs_asynchronous(self):
+        self.awg.set_asynchronous(False)
+        with self.assertRaisesRegex(Exception, 'upload_stats is not enabled'):
+            self.awg.upload_stats()
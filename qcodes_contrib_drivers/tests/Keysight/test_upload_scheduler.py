@@ -0,0 +1,112 @@
+'''
+Test upload scheduler:
+* round robin execution of modules
+* prioritization of movable tasks
+* completion on unregister
+* cancellation of waiting tasks on unregister
+'''
+import logging
+import sys
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from qcodes_contrib_drivers.drivers.Keysight.SD_common.memory_manager import MemoryManager
+
+with patch.dict(sys.modules, keysightSD1=MagicMock(name='keysightSD1')):
+    from qcodes_contrib_drivers.drivers.Keysight.SD_common.SD_AWG_Async import (
+        Task, UploadScheduler, _WaveformReferenceInternal)
+
+
+class Module:
+    def __init__(self, name):
+        self.name = name
+        self._start_time = None
+
+
+def record(module, executed, label):
+    executed.append(label)
+
+
+def block(module, gate):
+    gate.wait(5)
+
+
+class TestUploadScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.executed = []
+        self.gate = threading.Event()
+        self.scheduler = UploadScheduler(n_workers=1)
+        self.addCleanup(self.scheduler.stop)
+
+    def submit(self, module_id, module, label, movable=False):
+        task = Task(record, module, self.executed, label)
+        task.movable = movable
+        self.scheduler.submit(module_id, task)
+        return task
+
+    def hold(self, module_id, module):
+        task = Task(block, module, self.gate)
+        self.scheduler.submit(module_id, task)
+
+    def test_round_robin(self):
+        awg1, awg2 = Module('awg1'), Module('awg2')
+        self.scheduler.register('awg1')
+        self.scheduler.register('awg2')
+
+        self.hold('awg1', awg1)
+        for i in range(3):
+            self.submit('awg1', awg1, f'awg1-{i}')
+        for i in range(3):
+            self.submit('awg2', awg2, f'awg2-{i}')
+        self.gate.set()
+
+        self.assertTrue(self.scheduler.unregister('awg1', 5))
+        self.assertTrue(self.scheduler.unregister('awg2', 5))
+        self.assertEqual(self.executed,
+                         ['awg2-0', 'awg1-0', 'awg2-1', 'awg1-1', 'awg2-2', 'awg1-2'])
+
+    def test_prioritize(self):
+        awg1 = Module('awg1')
+        self.scheduler.register('awg1')
+
+        self.hold('awg1', awg1)
+        self.submit('awg1', awg1, 'upload-0', movable=True)
+        self.submit('awg1', awg1, 'init')
+        self.submit('awg1', awg1, 'upload-1', movable=True)
+        last = self.submit('awg1', awg1, 'upload-2', movable=True)
+        first = self.submit('awg1', awg1, 'upload-3', movable=True)
+
+        self.scheduler.prioritize('awg1', last)
+        self.scheduler.prioritize('awg1', first)
+        self.gate.set()
+
+        self.assertTrue(self.scheduler.unregister('awg1', 5))
+        # uploads are not moved ahead of a task that is not movable
+        self.assertEqual(self.executed,
+                         ['upload-0', 'init', 'upload-3', 'upload-2', 'upload-1'])
+
+    def test_unregister_cancels_waiting_tasks(self):
+        awg1 = Module('awg1')
+        self.scheduler.register('awg1')
+        mm = MemoryManager(logging, 10_000, memory_sizes=[(10_000, 2)])
+        wave_ref = _WaveformReferenceInternal(mm.allocate(100), 'awg1')
+
+        self.hold('awg1', awg1)
+        task = self.submit('awg1', awg1, 'init')
+        upload = self.submit('awg1', awg1, 'upload', movable=True)
+        upload.on_cancel = wave_ref._upload_cancelled
+        self.addCleanup(self.gate.set)
+
+        self.assertFalse(self.scheduler.unregister('awg1', 0.05))
+        with self.assertRaisesRegex(Exception, 'cancelled: module awg1 unregistered'):
+            task.result
+        with self.assertRaisesRegex(Exception, 'upload cancelled'):
+            wave_ref.wait_uploaded()
+        self.gate.set()
+        self.scheduler.stop()
+        self.assertEqual(self.executed, [])
+        wave_ref.release()
@@ -0,0 +1,96 @@
+'''
+Test AWG waveform cache:
+* hit / miss
+* shared release
+* eviction of unused waveforms
+'''
+from qcodes_contrib_drivers.drivers.Keysight.SD_common.memory_manager import MemoryManager
+
+import sys
+import unittest
+import logging
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+with patch.dict(sys.modules, keysightSD1=MagicMock(name='keysightSD1')):
+    from qcodes_contrib_drivers.drivers.Keysight.SD_common.SD_AWG_Async import (
+        _WaveformCache, _WaveformReferenceInternal)
+
+
+class TestWaveformCache(unittest.TestCase):
+
+    def setUp(self):
+        self.mm = MemoryManager(logging, 10_000, memory_sizes=[(10_000, 2)])
+        self.cache = _WaveformCache()
+
+    def upload(self, wave):
+        key = self.cache.key(wave)
+        ref = self.cache.get(key)
+        if ref is None:
+            ref = _WaveformReferenceInternal(self.mm.allocate(len(wave)), 'awg')
+            self.cache.add(key, ref)
+            ref._uploaded.set()
+        return ref
+
+    def test_hit_miss(self):
+        wave = np.linspace(-0.5, 0.5, 5000)
+
+        ref1 = self.upload(wave)
+        ref2 = self.upload(list(wave))
+        ref3 = self.upload(wave * 0.5)
+
+        self.assertIs(ref1, ref2)
+        self.assertIsNot(ref1, ref3)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+        for ref in [ref1, ref2, ref3]:
+            ref.release()
+        with self.assertRaises(Exception):
+            ref1.release()
+        self.cache.clear()
+
+    def test_int16_key(self):
+        wave = np.arange(5000, dtype=np.int16)
+
+        self.assertEqual(self.cache.key(wave), self.cache.key(wave.copy()))
+        self.assertNotEqual(self.cache.key(wave), self.cache.key(wave.astype(float)))
+
+    def test_shared_reference_stays_in_memory(self):
+        wave = np.zeros(5000)
+
+        ref1 = self.upload(wave)
+        ref1.release()
+        self.assertEqual(self.mm.fragmentation()['allocated'], 10_000)
+
+        ref2 = self.upload(wave)
+        self.assertIs(ref1, ref2)
+        ref2.wait_uploaded()
+        ref2.release()
+        self.cache.clear()
+        self.assertEqual(self.mm.fragmentation()['allocated'], 0)
+
+    def test_evict(self):
+        waves = [np.full(5000, 0.1 * i) for i in range(3)]
+
+        refs = [self.upload(wave) for wave in waves[:2]]
+        with self.assertRaises(Exception):
+            self.mm.allocate(5000)
+        # waveforms in use cannot be evicted
+        self.assertFalse(self.cache.evict(5000))
+
+        refs[1].release()
+        refs[0].release()
+        self.assertTrue(self.cache.evict(5000))
+        refs.append(self.upload(waves[2]))
+
+        # least recently used waveform has been evicted
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertIs(self.upload(waves[1]), refs[1])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+        refs[1].release()
+        refs[2].release()
+        self.cache.clear()
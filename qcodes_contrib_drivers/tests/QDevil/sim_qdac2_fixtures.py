@@ -31,6 +31,7 @@ class DUT:
             raise
         else:
             self.dac._no_binary_values = True
+            self.dac._no_concatenation = True
 
     def __exit__(self):
         self.dac.close()
@@ -1,4 +1,5 @@
 import pytest
+import numpy as np
 from .sim_qdac2_fixtures import qdac  # noqa
 from qcodes_contrib_drivers.drivers.QDevil.QDAC2 import ExternalInput
 
@@ -155,6 +156,53 @@ def test_measurement_remove_two(qdac):  # noqa
     assert isinstance(available[1], float)
 
 
+def test_stream_currents(qdac):  # noqa
+    qdac.ch02.measurement(repetitions=2)
+    qdac.ch03.measurement(repetitions=2)
+    qdac.start_recording_scpi()
+    # -----------------------------------------------------------------------
+    chunks = [chunk.copy() for chunk in qdac.stream_currents_A([2, 3], 2)]
+    # -----------------------------------------------------------------------
+    assert len(chunks) == 1
+    assert np.array_equal(chunks[0], [[0.01, 0.02], [0.03, 0.04]])
+    assert qdac.get_recorded_scpi_commands() == [
+        'sens2:data:poin?',
+        'sens3:data:poin?',
+        'sens2:data:rem?',
+        'sens3:data:rem?',
+    ]
+
+
+def test_stream_currents_concatenated(qdac, mocker):  # noqa
+    answers = iter(['2;2', '0.01,0.02;0.03,0.04'])
+    query = mocker.patch.object(qdac.visa_handle, 'query',
+                                side_effect=lambda cmd: next(answers))
+    qdac._no_concatenation = False
+    qdac.start_recording_scpi()
+    # -----------------------------------------------------------------------
+    try:
+        chunks = [chunk.copy() for chunk in qdac.stream_currents_A([2, 3], 2)]
+    finally:
+        qdac._no_concatenation = True
+    # -----------------------------------------------------------------------
+    assert len(chunks) == 1
+    assert np.array_equal(chunks[0], [[0.01, 0.02], [0.03, 0.04]])
+    assert qdac.get_recorded_scpi_commands() == [
+        'sens2:data:poin?;:sens3:data:poin?',
+        'sens2:data:rem?;:sens3:data:rem?',
+    ]
+    assert query.call_count == 2
+
+
+def test_stream_currents_timeout(qdac, mocker):  # noqa
+    mocker.patch.object(qdac, 'ask_batch', return_value=['0', '0'])
+    # -----------------------------------------------------------------------
+    with pytest.raises(TimeoutError, match='Collected'):
+        for _ in qdac.stream_currents_A([2, 3], 2, timeout_s=0.01):
+            pass
+    # -----------------------------------------------------------------------
+
+
 def test_measurement_last(qdac):  # noqa
     measurement = qdac.ch02.measurement()
     qdac.start_recording_scpi()
@@ -127,3 +127,131 @@ def test_arrangement_leakage(qdac, mocker):  # noqa
     inf = math.inf
     expected = [[inf, inf, inf], [inf, inf, inf], [inf, inf, inf]]
     assert np.allclose(leakage_matrix, np.array(expected))
+
+
+def test_arrangement_leakage_parallel(qdac, mocker):  # noqa
+    sleep_fn = mocker.patch('qcodes_contrib_drivers.drivers.QDevil.QDAC2.sleep_s')
+    qdac.free_all_triggers()
+    gates = {'sensor1': 1, 'plunger2': 2, 'plunger3': 3}
+    arrangement = qdac.arrange(gates)
+    arrangement.set_virtual_voltages({'sensor1': 0.3, 'plunger3': 0.4})
+    triggers_before = len(qdac._internal_triggers)
+    qdac.start_recording_scpi()
+    # -----------------------------------------------------------------------
+    nplc=2
+    leakage_matrix = arrangement.leakage(modulation_V=0.005, nplc=nplc,
+                                         parallel=True)
+    # -----------------------------------------------------------------------
+    commands = qdac.get_recorded_scpi_commands()
+    assert commands == [
+        # Sensors set up once
+        'sens:rang low,(@1,2,3)',
+        'sens:nplc 2,(@1,2,3)',
+        'sens1:del 0.02',
+        'sens1:coun 1',
+        'sens1:trig:sour int1',
+        'sens1:init:cont on',
+        'sens1:init',
+        'sens2:del 0.02',
+        'sens2:coun 1',
+        'sens2:trig:sour int1',
+        'sens2:init:cont on',
+        'sens2:init',
+        'sens3:del 0.02',
+        'sens3:coun 1',
+        'sens3:trig:sour int1',
+        'sens3:init:cont on',
+        'sens3:init',
+        # Steady state followed by each modulation
+        'sour1:dc:mark:sst 1',
+        'sour1:dc:trig:sour hold',
+        'sour1:volt:mode list',
+        'sour1:list:volt 0.3,0.305,0.3,0.3',
+        'sour1:list:tmod auto',
+        'sour1:list:dwel 0.08',
+        'sour1:list:dir up',
+        'sour1:list:coun 1',
+        'sour1:dc:trig:sour int2',
+        'sour1:dc:init:cont on',
+        'sour1:dc:init',
+        'sour2:dc:trig:sour hold',
+        'sour2:volt:mode list',
+        'sour2:list:volt 0,0,0.005,0',
+        'sour2:list:tmod auto',
+        'sour2:list:dwel 0.08',
+        'sour2:list:dir up',
+        'sour2:list:coun 1',
+        'sour2:dc:trig:sour int2',
+        'sour2:dc:init:cont on',
+        'sour2:dc:init',
+        'sour3:dc:trig:sour hold',
+        'sour3:volt:mode list',
+        'sour3:list:volt 0.4,0.4,0.4,0.405',
+        'sour3:list:tmod auto',
+        'sour3:list:dwel 0.08',
+        'sour3:list:dir up',
+        'sour3:list:coun 1',
+        'sour3:dc:trig:sour int2',
+        'sour3:dc:init:cont on',
+        'sour3:dc:init',
+        'tint 2',
+        # The simulation only has two measurements available per poll
+        'sens1:data:poin?',
+        'sens2:data:poin?',
+        'sens3:data:poin?',
+        'sens1:data:rem?',
+        'sens2:data:rem?',
+        'sens3:data:rem?',
+        'sens1:data:poin?',
+        'sens2:data:poin?',
+        'sens3:data:poin?',
+        'sens1:data:rem?',
+        'sens2:data:rem?',
+        'sens3:data:rem?',
+        'sens1:init:cont off',
+        'sens2:init:cont off',
+        'sens3:init:cont off',
+        # Back to steady state
+        'sour1:volt:mode fix',
+        'sour1:volt 0.3',
+        'sour2:volt:mode fix',
+        'sour2:volt 0.0',
+        'sour3:volt:mode fix',
+        'sour3:volt 0.4',
+    ]
+    assert len(qdac._internal_triggers) == triggers_before
+    sleep_fn.assert_called_once_with(4 * (nplc+2)/50)
+    # Hard-coded in simulation: 0.05,0.06 (sensor1), 0.01,0.02 (plunger2) and
+    # 0.03,0.04 (plunger3), repeated
+    inf = math.inf
+    expected = [[0.5, 0.5, 0.5], [inf, inf, inf], [0.5, 0.5, 0.5]]
+    assert np.allclose(leakage_matrix, np.array(expected))
+
+
+def test_arrangement_leakage_parallel_restores_on_error(qdac, mocker):  # noqa
+    mocker.patch('qcodes_contrib_drivers.drivers.QDevil.QDAC2.sleep_s')
+    mocker.patch.object(qdac, 'stream_currents_A',
+                        side_effect=KeyboardInterrupt)
+    qdac.free_all_triggers()
+    gates = {'sensor1': 1, 'plunger2': 2, 'plunger3': 3}
+    arrangement = qdac.arrange(gates)
+    arrangement.set_virtual_voltages({'sensor1': 0.3})
+    triggers_before = len(qdac._internal_triggers)
+    qdac.start_recording_scpi()
+    # -----------------------------------------------------------------------
+    with pytest.raises(KeyboardInterrupt):
+        arrangement.leakage(modulation_V=0.005, parallel=True)
+    # -----------------------------------------------------------------------
+    commands = qdac.get_recorded_scpi_commands()
+    assert commands[-9:] == [
+        'sens1:init:cont off',
+        'sens2:init:cont off',
+        'sens3:init:cont off',
+        'sour1:volt:mode fix',
+        'sour1:volt 0.3',
+        'sour2:volt:mode fix',
+        'sour2:volt 0.0',
+        'sour3:volt:mode fix',
+        'sour3:volt 0.0',
+    ]
+    assert len(qdac._internal_triggers) == triggers_before
@@ -1,6 +1,6 @@
 import pytest
 from .sim_qdac2_fixtures import qdac  # noqa
-from qcodes_contrib_drivers.drivers.QDevil.QDAC2 import ExternalInput
+from qcodes_contrib_drivers.drivers.QDevil.QDAC2 import ExternalInput, List_Context
 
 
 def test_list_explicit(qdac):  # noqa
@@ -45,6 +45,25 @@ def test_list_implicit(qdac):  # noqa
     ]
 
 
+def test_list_setup_commands():
+    # -----------------------------------------------------------------------
+    commands = List_Context.setup_commands(
+        [-1, 1], repetitions=2, dwell_s=1e-6, backwards=False, stepped=True,
+        trigger='int3')
+    # -----------------------------------------------------------------------
+    assert [cmd.format(7) for cmd, _ in commands] == [
+        'sour7:volt:mode list',
+        'sour7:list:volt ',
+        'sour7:list:tmod step',
+        'sour7:list:dwel 1e-06',
+        'sour7:list:dir up',
+        'sour7:list:coun 2',
+        'sour7:dc:trig:sour int3',
+        'sour7:dc:init:cont on',
+        'sour7:dc:init',
+    ]
+    assert [values for _, values in commands if values is not None] == [[-1, 1]]
+
 def test_list_points(qdac):  # noqa
     dc_list = qdac.ch01.dc_list(voltages=range(1, 5))
     qdac.start_recording_scpi()
@@ -1,5 +1,6 @@
 import pytest
 from .sim_qdac2_fixtures import qdac  # noqa
+from qcodes_contrib_drivers.drivers.QDevil import QDAC2
 from qcodes_contrib_drivers.drivers.QDevil.QDAC2 import forward_and_back
 import numpy as np
 
@@ -77,6 +78,20 @@ def test_arrangement_default_actuals_2d(qdac):  # noqa
                        np.repeat([-0.7, -0.4875, -0.275, -0.0625, 0.15], 5))
 
 
+def test_arrangement_sweep_values_cached(qdac):  # noqa
+    arrangement = qdac.arrange(contacts={'plunger1': 1, 'plunger2': 2})
+    voltages = np.linspace(-0.1, 0.1, 5)
+    sweep = arrangement.virtual_sweep(contact='plunger1', voltages=voltages)
+    # -----------------------------------------------------------------------
+    same_sweep = arrangement.virtual_sweep(contact='plunger1', voltages=voltages)
+    arrangement.add_correction('plunger2', [0.5, 1.0])
+    corrected_sweep = arrangement.virtual_sweep(contact='plunger1', voltages=voltages)
+    # -----------------------------------------------------------------------
+    assert same_sweep._sweep is sweep._sweep
+    assert corrected_sweep._sweep is not sweep._sweep
+    assert np.allclose(corrected_sweep.actual_values_V('plunger2'), 0.5 * voltages)
+
+
 def test_arrangement_sweep(qdac):  # noqa
     qdac.free_all_triggers()
     arrangement = qdac.arrange(contacts={'plunger1': 1, 'plunger2': 2, 'plunger3': 3})
@@ -100,9 +115,6 @@ def test_arrangement_sweep(qdac):  # noqa
         'sour1:list:dwel 2e-06',
         'sour1:list:dir up',
         'sour1:list:coun 1',
-        'sour1:dc:trig:sour bus',
-        'sour1:dc:init:cont on',
-        'sour1:dc:init',
         'sour1:dc:trig:sour int1',
         'sour1:dc:init:cont on',
         'sour1:dc:init',
@@ -114,9 +126,6 @@ def test_arrangement_sweep(qdac):  # noqa
         'sour2:list:dwel 2e-06',
         'sour2:list:dir up',
         'sour2:list:coun 1',
-        'sour2:dc:trig:sour bus',
-        'sour2:dc:init:cont on',
-        'sour2:dc:init',
         'sour2:dc:trig:sour int1',
         'sour2:dc:init:cont on',
         'sour2:dc:init',
@@ -128,9 +137,6 @@ def test_arrangement_sweep(qdac):  # noqa
         'sour3:list:dwel 2e-06',
         'sour3:list:dir up',
         'sour3:list:coun 1',
-        'sour3:dc:trig:sour bus',
-        'sour3:dc:init:cont on',
-        'sour3:dc:init',
         'sour3:dc:trig:sour int1',
         'sour3:dc:init:cont on',
         'sour3:dc:init',
@@ -139,6 +145,63 @@ def test_arrangement_sweep(qdac):  # noqa
     ]
 
 
+def test_arrangement_sweep_concatenated(qdac):  # noqa
+    qdac.free_all_triggers()
+    arrangement = qdac.arrange(contacts={'plunger1': 1, 'plunger2': 2})
+    sweep = arrangement.virtual_sweep(
+        contact='plunger2',
+        voltages=np.linspace(-0.2, 0.2, 3),
+        step_time_s=2e-6)
+    qdac._no_concatenation = False
+    qdac.start_recording_scpi()
+    # -----------------------------------------------------------------------
+    sweep.start()
+    # -----------------------------------------------------------------------
+    commands = qdac.get_recorded_scpi_commands()
+    elapsed_s = qdac.get_recorded_scpi_time_s()
+    qdac._no_concatenation = True
+    # The simulator does not understand concatenated commands
+    qdac.clear_read_queue()
+    assert commands == [
+        'sour1:dc:trig:sour hold;:sour1:volt:mode list;:'
+        'sour1:list:volt 0,0,0;:sour1:list:tmod auto;:sour1:list:dwel 2e-06;:'
+        'sour1:list:dir up;:sour1:list:coun 1;:sour1:dc:trig:sour int1;:'
+        'sour1:dc:init:cont on;:sour1:dc:init;:'
+        'sour2:dc:trig:sour hold;:sour2:volt:mode list;:'
+        'sour2:list:volt -0.2,0,0.2;:sour2:list:tmod auto;:sour2:list:dwel 2e-06;:'
+        'sour2:list:dir up;:sour2:list:coun 1;:sour2:dc:trig:sour int1;:'
+        'sour2:dc:init:cont on;:sour2:dc:init',
+        'tint 1'
+    ]
+    assert elapsed_s > 0
+
+
+def test_arrangement_sweep_binary_skips_ascii(qdac, mocker):  # noqa
+    qdac.free_all_triggers()
+    arrangement = qdac.arrange(contacts={'plunger1': 1, 'plunger2': 2})
+    sweep = arrangement.virtual_sweep(
+        contact='plunger2',
+        voltages=np.linspace(-0.2, 0.2, 3),
+        step_time_s=2e-6)
+    qdac._record_commands = False
+    qdac._no_binary_values = False
+    qdac._no_concatenation = False
+    to_ascii = mocker.patch.object(QDAC2, 'floats_to_comma_separated_list')
+    write_raw = mocker.patch.object(qdac.visa_handle, 'write_raw')
+    mocker.patch.object(qdac.visa_handle, 'write')
+    try:
+        # -------------------------------------------------------------------
+        sweep.start()
+        # -------------------------------------------------------------------
+    finally:
+        qdac._no_binary_values = True
+        qdac._no_concatenation = True
+    to_ascii.assert_not_called()
+    message = write_raw.call_args_list[0].args[0]
+    assert b'sour2:list:volt #' in message
+    assert b'sour2:list:volt -0.2' not in message
+
+
 def test_arrangement_context_releases_trigger(qdac):  # noqa
     before = len(qdac._internal_triggers)
     # -----------------------------------------------------------------------
@@ -301,9 +364,6 @@ def test_stability_diagram_external(qdac):  # noqa
         'sour3:list:dwel 1e-06',
         'sour3:list:dir up',
         'sour3:list:coun 1',
-        'sour3:dc:trig:sour bus',
-        'sour3:dc:init:cont on',
-        'sour3:dc:init',
         'sour3:dc:trig:sour int2',
         'sour3:dc:init:cont on',
         'sour3:dc:init',
@@ -315,9 +375,6 @@ def test_stability_diagram_external(qdac):  # noqa
         'sour6:list:dwel 1e-06',
         'sour6:list:dir up',
         'sour6:list:coun 1',
-        'sour6:dc:trig:sour bus',
-        'sour6:dc:init:cont on',
-        'sour6:dc:init',
         'sour6:dc:trig:sour int2',
         'sour6:dc:init:cont on',
         'sour6:dc:init',
@@ -329,9 +386,6 @@ def test_stability_diagram_external(qdac):  # noqa
         'sour7:list:dwel 1e-06',
         'sour7:list:dir up',
         'sour7:list:coun 1',
-        'sour7:dc:trig:sour bus',
-        'sour7:dc:init:cont on',
-        'sour7:dc:init',
         'sour7:dc:trig:sour int2',
         'sour7:dc:init:cont on',
         'sour7:dc:init',
@@ -343,9 +397,6 @@ def test_stability_diagram_external(qdac):  # noqa
         'sour8:list:dwel 1e-06',
         'sour8:list:dir up',
         'sour8:list:coun 1',
-        'sour8:dc:trig:sour bus',
-        'sour8:dc:init:cont on',
-        'sour8:dc:init',
         'sour8:dc:trig:sour int2',
         'sour8:dc:init:cont on',
         'sour8:dc:init',
@@ -396,9 +447,6 @@ def test_arrangement_detune(qdac):  # noqa
         'sour1:list:dwel 5e-06',
         'sour1:list:dir up',
         'sour1:list:coun 2',
-        'sour1:dc:trig:sour bus',
-        'sour1:dc:init:cont on',
-        'sour1:dc:init',
         'sour1:dc:trig:sour int1',
         'sour1:dc:init:cont on',
         'sour1:dc:init',
@@ -410,9 +458,6 @@ def test_arrangement_detune(qdac):  # noqa
         'sour2:list:dwel 5e-06',
         'sour2:list:dir up',
         'sour2:list:coun 2',
-        'sour2:dc:trig:sour bus',
-        'sour2:dc:init:cont on',
-        'sour2:dc:init',
         'sour2:dc:trig:sour int1',
         'sour2:dc:init:cont on',
         'sour2:dc:init',
@@ -1,3 +1,5 @@
+import ctypes
+import numpy as np
 import unittest
 from unittest.mock import MagicMock
 from unittest.mock import patch
@@ -20,3 +22,242 @@ class TestM2j(unittest.TestCase):
             m4i.wait_ready()
             self.mock_pyspcm_module.spcm_dwSetParam_i32.assert_called()
             m4i.close()
+
+    def test_M4i_fifo_acquisition(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            notify_size = 4096
+            user_len = [0, 2 * notify_size, notify_size]
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, '_num_channels', return_value=2), \
+                    patch.object(m4i, '_param64bit', side_effect=lambda param: user_len.pop(0)
+                                 if param == 'len' else 0), \
+                    patch.object(m4i, 'card_status', return_value=0):
+                self.mock_pyspcm_module.SPC_DATA_AVAIL_USER_LEN = 'len'
+                self.mock_pyspcm_module.SPC_DATA_AVAIL_USER_POS = 'pos'
+                self.mock_pyspcm_module.M2STAT_DATA_OVERRUN = 0x400
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.spcm_dwSetParam_i32.return_value = 0
+
+                blocks = list(m4i.fifo_acquisition(notify_size=notify_size, buffer_blocks=4, n_blocks=3))
+
+            self.assertEqual(len(blocks), 3)
+            for block in blocks:
+                self.assertEqual(block.dtype, np.int16)
+                self.assertEqual(block.size, notify_size // 2)
+                self.assertEqual(block.ctypes.data % 4096, 0)
+            self.assertEqual(blocks[1].ctypes.data - blocks[0].ctypes.data, notify_size)
+            m4i.close()
+
+    def test_M4i_get_data(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            raw_data = np.arange(12, dtype=np.int16)
+            ranges = {'range_channel_0': 1000, 'range_channel_2': 2000}
+            m4i.ADC_to_voltage.cache.set(10)
+            m4i.data_memory_size.cache.set(16)
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, 'active_channels', return_value=[0, 2]), \
+                    patch.object(m4i, 'get', side_effect=ranges.get), \
+                    patch.object(m4i, 'wait_ready', return_value=0), \
+                    patch.object(m4i, 'card_mode', return_value=0), \
+                    patch.object(m4i, '_stop_acquisition'), \
+                    patch.object(m4i, '_transfer_buffer_numpy', return_value=raw_data):
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.SPC_REC_STD_BOXCAR = 1
+
+                raw = m4i.get_data(raw=True)
+                voltages = m4i.get_data()
+                out = np.zeros((2, 6), dtype=np.float32)
+                result = m4i.get_data(out=out)
+
+            self.assertEqual(raw.shape, (6, 2))
+            self.assertTrue(np.shares_memory(raw, raw_data))
+            expected = np.array([raw_data[0::2] * 1e-1, raw_data[1::2] * 2e-1])
+            np.testing.assert_allclose(voltages, expected)
+            self.assertIs(result, out)
+            np.testing.assert_allclose(out, expected, rtol=1e-6)
+            m4i.close()
+
+    def test_M4i_segmented_acquisition(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            n_segments, numch, seg_size = 3, 2, 16
+            # card memory holds the segments one after another with interleaved channels
+            data = np.arange(n_segments * seg_size * numch, dtype=np.int16)
+            expected = data.reshape((n_segments, seg_size, numch)).transpose(0, 2, 1) * np.array([[1.], [2.]])
+
+            def transfer(buffer_type, direction, notify, pointer, offset, length):
+                ctypes.memmove(pointer.value, data.ctypes.data, length)
+
+            m4i.ADC_to_voltage.cache.set(1)
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, 'active_channels', return_value=[0, 1]), \
+                    patch.object(m4i, 'voltage_scale_factors', return_value=np.array([1., 2.])), \
+                    patch.object(m4i, 'wait_ready', return_value=0), \
+                    patch.object(m4i, '_def_transfer64bit', side_effect=transfer), \
+                    patch.object(m4i, '_stop_acquisition'):
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.spcm_dwSetParam_i32.return_value = 0
+
+                voltages = m4i.segmented_acquisition(seg_size, n_segments)
+                buffer = m4i._transfer_buffer
+                out = np.empty((numch, seg_size))
+                average = m4i.segmented_acquisition(seg_size, n_segments, average=True, out=out)
+                reused = m4i.segmented_acquisition(seg_size, n_segments, reuse_buffer=True)
+                reused_again = m4i.segmented_acquisition(seg_size, n_segments, reuse_buffer=True)
+                other_dtype = m4i.segmented_acquisition(seg_size, n_segments, reuse_buffer=True,
+                                                        dtype=np.float32)
+
+            self.assertEqual(voltages.shape, (n_segments, numch, seg_size))
+            np.testing.assert_allclose(voltages, expected)
+            self.assertIs(m4i._transfer_buffer, buffer)
+            self.assertIs(average, out)
+            np.testing.assert_allclose(average, expected.mean(axis=0))
+            self.assertIsNot(reused, voltages)
+            self.assertIs(reused_again, reused)
+            np.testing.assert_allclose(reused, expected)
+            self.assertIsNot(other_dtype, reused)
+            self.assertIs(m4i._segment_buffer, other_dtype)
+            m4i.close()
+
+    def test_M4i_pipelined_acquisition(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            events = []
+
+            def transfer(buffer_type, direction, notify, pointer, offset, length):
+                data = np.full(length // 2, len(events), dtype=np.int16)
+                ctypes.memmove(pointer.value, data.ctypes.data, length)
+                events.append('transfer')
+
+            m4i.data_memory_size.cache.set(16)
+            m4i._last_set_result = 0
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, 'active_channels', return_value=[0]), \
+                    patch.object(m4i, 'voltage_scale_factors', return_value=np.array([1.])), \
+                    patch.object(m4i, 'card_mode', return_value=0), \
+                    patch.object(m4i, 'wait_ready', return_value=0), \
+                    patch.object(m4i, 'general_command'), \
+                    patch.object(m4i, 'start_triggered', side_effect=lambda: events.append('arm')), \
+                    patch.object(m4i, '_def_transfer64bit', side_effect=transfer), \
+                    patch.object(m4i, '_stop_acquisition'):
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.SPC_REC_STD_BOXCAR = 1
+                self.mock_pyspcm_module.SPC_REC_STD_AVERAGE = 2
+
+                results = []
+                for data in m4i.pipelined_acquisition(n_points=3):
+                    events.append('process')
+                    results.append(data)
+
+            self.assertEqual(events, ['arm', 'transfer', 'arm', 'process', 'transfer', 'arm', 'process',
+                                      'transfer', 'process'])
+            self.assertEqual(results[0].shape, (1, 16))
+            self.assertIs(results[0], results[2])
+            self.assertIsNot(results[0], results[1])
+            np.testing.assert_array_equal(results[1], 4)
+            m4i.close()
+
+    def test_M4i_pipelined_acquisition_timeout(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            m4i.data_memory_size.cache.set(16)
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, 'active_channels', return_value=[0]), \
+                    patch.object(m4i, 'voltage_scale_factors', return_value=np.array([1.])), \
+                    patch.object(m4i, 'card_mode', return_value=0), \
+                    patch.object(m4i, 'wait_ready', side_effect=[0, 0x107]), \
+                    patch.object(m4i, 'start_triggered'), \
+                    patch.object(m4i, '_transfer_buffer_numpy',
+                                 return_value=np.zeros(16, dtype=np.int16)) as transfer, \
+                    patch.object(m4i, '_stop_acquisition') as stop:
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.SPC_REC_STD_BOXCAR = 1
+                self.mock_pyspcm_module.SPC_REC_STD_AVERAGE = 2
+
+                results = []
+                with self.assertRaisesRegex(Exception, 'Timeout waiting for data'):
+                    for data in m4i.pipelined_acquisition(n_points=3):
+                        results.append(data)
+
+            self.assertEqual(len(results), 1)
+            transfer.assert_called_once()
+            self.assertEqual(stop.call_count, 2)
+            m4i.close()
+
+    def test_M4i_segmented_acquisition_timeout(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, 'active_channels', return_value=[0]), \
+                    patch.object(m4i, 'wait_ready', return_value=0x107), \
+                    patch.object(m4i, '_transfer_buffer_numpy') as transfer, \
+                    patch.object(m4i, '_stop_acquisition') as stop:
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.spcm_dwSetParam_i32.return_value = 0
+
+                with self.assertRaisesRegex(Exception, 'Timeout waiting for data'):
+                    m4i.segmented_acquisition(16, 2)
+
+            transfer.assert_not_called()
+            stop.assert_called_once()
+            m4i.close()
+
+    def test_M4i_multiple_trigger_acquisition(self):
+
+        with patch.dict('sys.modules', pyspcm=self.mock_pyspcm_module):
+            import qcodes_contrib_drivers.drivers.Spectrum.M4i as M4i_module
+            m4i = M4i_module.M4i('test_m4i_instrument')
+            self.addCleanup(M4i_module.M4i.close_all)
+
+            raw_data = np.arange(32, dtype=np.int16)
+            ranges = {'range_channel_0': 1000, 'range_channel_2': 2000}
+            m4i.ADC_to_voltage.cache.set(10)
+            with patch.object(M4i_module, 'pyspcm', self.mock_pyspcm_module), \
+                    patch.object(m4i, 'active_channels', return_value=[0, 2]), \
+                    patch.object(m4i, 'get', side_effect=ranges.get), \
+                    patch.object(m4i, 'wait_ready', return_value=0), \
+                    patch.object(m4i, '_stop_acquisition'), \
+                    patch.object(m4i, '_transfer_buffer_numpy', return_value=raw_data):
+                self.mock_pyspcm_module.ERR_OK = 0
+                self.mock_pyspcm_module.ERR_TIMEOUT = 0x107
+                self.mock_pyspcm_module.spcm_dwSetParam_i32.return_value = 0
+
+                voltages = m4i.multiple_trigger_acquisition(1000, 16, 16, 0)
+
+            expected = np.empty(32)
+            expected[0::2] = raw_data[0::2] * 1e-1
+            expected[1::2] = raw_data[1::2] * 2e-1
+            np.testing.assert_allclose(voltages, expected)
+            m4i.close()
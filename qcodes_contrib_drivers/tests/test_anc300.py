@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+from typing import Dict, List, Tuple
+
+import pytest
+
+from qcodes_contrib_drivers.drivers.Attocube.ANC300 import ANC300
+
+
+class VisaStandIn:
+    """
+    Stands in for the serial VISA resource of an ANC300 with two ANM150
+    modules. The output voltage of an axis drops to zero after it has been
+    asked for a given number of times.
+    """
+
+    def __init__(self):
+        self.timeout = 5000
+        self.write_termination = "\r\n"
+        self.read_termination = "\r\n"
+        self.geto: List[Tuple[float, int]] = []
+        self.polls_left: Dict[int, int] = {}
+        self.reply_delay = 0.0
+        self._status: List[str] = []
+
+    def query(self, message: str) -> str:
+        command, *args = message.split()
+        if command == "ver":
+            self._status = ["OK"]
+            return "attocube ANC300 controller version 1.1.0"
+        if command == "getser":
+            if int(args[0]) > 2:
+                self._status = ["ERROR"]
+                return "Wrong axis type"
+            self._status = ["OK"]
+            return "ANM150A1"
+        if command == "geto":
+            axis = int(args[0])
+            self.geto.append((time.monotonic(), axis))
+            time.sleep(self.reply_delay)
+            left = self.polls_left.get(axis, 0)
+            self.polls_left[axis] = max(left - 1, 0)
+            self._status = ["OK"]
+            return "voltage = {} V".format(30.0 if left > 0 else 0.0)
+        self._status = ["OK"]
+        return message
+
+    def read(self) -> str:
+        return self._status.pop(0)
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture()
+def visa(mocker):
+    stand_in = VisaStandIn()
+    mocker.patch.object(ANC300, "_open_resource",
+                        return_value=(stand_in, "sim"))
+    return stand_in
+
+
+@pytest.fixture()
+def anc(visa):
+    instrument = ANC300("anc300", "ASRL1::INSTR")
+    instrument.poll_interval_min = 0.01
+    instrument.poll_interval_max = 0.04
+    yield instrument
+    if ANC300.is_valid(instrument):
+        instrument.close()
+
+
+def test_move_axes_complete(anc, visa):
+    visa.polls_left = {1: 1, 2: 3}
+    futures = anc.move_axes({1: 10, 2: -5})
+    assert futures[1].result(timeout=2) is None
+    assert futures[2].result(timeout=2) is None
+    assert [axis for _, axis in visa.geto] == [1, 2, 1, 2, 2, 2]
+    deadline = time.monotonic() + 2
+    while anc._watcher is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_watch_axes_back_off(anc, visa):
+    visa.polls_left = {1: 6}
+    anc.watch_axes([1])[1].result(timeout=2)
+    times = [t for t, _ in visa.geto]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert len(gaps) == 6
+    # 0.01, 0.02, 0.04 and then capped at poll_interval_max
+    for gap, interval in zip(gaps, [0.01, 0.02, 0.04, 0.04, 0.04, 0.04]):
+        assert interval <= gap < interval + 0.1
+
+
+def test_watch_axes_timeout(anc, visa):
+    visa.polls_left = {1: 1000}
+    future = anc.watch_axes([1], timeout=0.05)[1]
+    with pytest.raises(RuntimeError, match="timed out"):
+        future.result(timeout=2)
+
+
+def test_cancelled_future_is_dropped(anc, visa):
+    visa.polls_left = {1: 1000, 2: 2}
+    futures = anc.watch_axes([1, 2])
+    assert futures[1].cancel()
+    futures[2].result(timeout=2)
+    polled = len(visa.geto)
+    time.sleep(0.1)
+    assert len(visa.geto) == polled
+    assert anc._watcher is None
+
+
+def test_close_while_moving(anc, visa):
+    visa.polls_left = {1: 1000}
+    visa.reply_delay = 0.02
+    future = anc.watch_axes([1])[1]
+    time.sleep(0.05)
+    watcher = anc._watcher
+    assert watcher is not None
+    anc.close()
+    assert not watcher.is_alive()
+    with pytest.raises(CancelledError):
+        future.result(timeout=0)
+    polled = len(visa.geto)
+    time.sleep(0.1)
+    assert len(visa.geto) == polled
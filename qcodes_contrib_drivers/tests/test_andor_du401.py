@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from qcodes_contrib_drivers.drivers.Andor.DU401 import (KineticSeries,
+                                                        Spectrum, atmcd64d)
+
+DRV_SUCCESS = 20002
+
+
+def _fill(out, size):
+    out[:size] = np.arange(size, dtype=np.int32)
+    return DRV_SUCCESS
+
+
+@pytest.fixture()
+def wrapper():
+    instance = object.__new__(atmcd64d)
+    instance.verbose = False
+    instance.dll = MagicMock(name='atmcd64d.dll')
+    instance.dll.StartAcquisition.return_value = DRV_SUCCESS
+    instance.dll.WaitForAcquisition.return_value = DRV_SUCCESS
+    instance.dll.GetAcquiredData.side_effect = _fill
+    return instance
+
+
+def _ccd(wrapper, acquisition_mode, number_kinetics=1, x_pixels=4):
+    return SimpleNamespace(
+        atmcd64d=wrapper,
+        x_pixels=x_pixels,
+        acquisition_mode=MagicMock(get=lambda: acquisition_mode),
+        number_accumulations=MagicMock(get=lambda: 2),
+        number_kinetics=MagicMock(get=lambda: number_kinetics))
+
+
+def test_get_acquired_data_fills_buffer(wrapper):
+    out = np.zeros((2, 3), dtype=np.int32)
+    data = wrapper.get_acquired_data(6, out=out)
+    assert data is out
+    assert np.array_equal(out, [[0, 1, 2], [3, 4, 5]])
+    assert np.array_equal(wrapper.get_acquired_data(3), [0, 1, 2])
+
+
+@pytest.mark.parametrize('out, match', [
+    (np.zeros(5, dtype=np.int32), 'does not match the requested size'),
+    (np.zeros(6, dtype=np.int64), 'int32'),
+    (np.zeros((3, 2), dtype=np.int32).T, 'C contiguous'),
+    (np.zeros(12, dtype=np.int32)[::2], 'C contiguous'),
+])
+def test_get_acquired_data_rejects_buffer(wrapper, out, match):
+    with pytest.raises(ValueError, match=match):
+        wrapper.get_acquired_data(6, out=out)
+    wrapper.dll.GetAcquiredData.assert_not_called()
+
+
+def test_get_acquired_data_rejects_read_only_buffer(wrapper):
+    out = np.zeros(6, dtype=np.int32)
+    out.flags.writeable = False
+    with pytest.raises(ValueError, match='writeable'):
+        wrapper.get_acquired_data(6, out=out)
+    wrapper.dll.GetAcquiredData.assert_not_called()
+
+
+def test_kinetic_series_shape(wrapper):
+    series = KineticSeries('kinetic_series', instrument=None)
+    series.ccd = _ccd(wrapper, 'kinetics', number_kinetics=3)
+    frames = series.get()
+    assert frames.shape == (3, 4)
+    assert frames.dtype == np.int32
+    assert np.array_equal(frames.ravel(), np.arange(12))
+    assert wrapper.dll.WaitForAcquisition.call_count == 6
+
+
+def test_kinetic_series_needs_kinetics_mode(wrapper):
+    series = KineticSeries('kinetic_series', instrument=None)
+    series.ccd = _ccd(wrapper, 'single scan')
+    with pytest.raises(ValueError, match="'kinetics'"):
+        series.get()
+    wrapper.dll.StartAcquisition.assert_not_called()
+
+
+def test_spectrum_rejects_kinetics_mode(wrapper):
+    spectrum = Spectrum('spectrum', instrument=None)
+    spectrum.ccd = _ccd(wrapper, 'kinetics')
+    with pytest.raises(ValueError, match='kinetic_series'):
+        spectrum.get()
+    wrapper.dll.StartAcquisition.assert_not_called()
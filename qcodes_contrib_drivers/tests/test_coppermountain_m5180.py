@@ -0,0 +1,103 @@
+from typing import List
+
+import numpy as np
+import pytest
+
+from qcodes_contrib_drivers.drivers.CopperMountain.M5180 import M5180
+
+
+class VisaStandIn:
+    """
+    Stands in for the VISA resource of an M5180 answering trace queries with
+    binary blocks.
+    """
+
+    def __init__(self, npts: int = 1001):
+        self.written: List[str] = []
+        self.timeout = 100000
+        self.write_termination = "\n"
+        self.read_termination = "\n"
+        self.npts = npts
+        self.freq = np.linspace(1e9, 2e9, npts)
+        rng = np.random.default_rng(1)
+        self.traces = {
+            trace: rng.normal(size=2 * npts) for trace in range(1, 5)
+        }
+        self.answers = {
+            "SENS1:FREQ:STAR?": "1000000000",
+            "SENS1:FREQ:STOP?": "2000000000",
+            "SENS1:SWE:POIN?": str(npts),
+            "TRIG:SOUR?": "BUS",
+            "*OPC?": "1",
+            "*IDN?": "CMT,M5180,0123,21.1",
+        }
+
+    def write(self, message: str) -> None:
+        self.written.append(message)
+
+    def query(self, message: str) -> str:
+        self.written.append(message)
+        return self.answers.get(message, "0")
+
+    def query_binary_values(self, message: str, datatype: str,
+                            is_big_endian: bool, container: type
+                            ) -> np.ndarray:
+        self.written.append(message)
+        assert datatype == "d"
+        assert not is_big_endian
+        if message == "SENS1:FREQ:DATA?":
+            return self.freq.copy()
+        return self.traces[int(message[len("CALC1:TRAC")])].copy()
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture()
+def visa(mocker):
+    stand_in = VisaStandIn()
+    mocker.patch.object(M5180, "_open_resource", return_value=(stand_in, "sim"))
+    return stand_in
+
+
+@pytest.fixture()
+def vna(visa):
+    instrument = M5180("m5180", "TCPIP::localhost::5025::SOCKET")
+    yield instrument
+    instrument.close()
+
+
+def test_get_s_binary(vna, visa):
+    visa.written.clear()
+    freq, *s = vna.get_s()
+    assert np.array_equal(freq, visa.freq)
+    for trace in range(1, 5):
+        data = visa.traces[trace]
+        sxx = data[0::2] + 1j * data[1::2]
+        assert np.allclose(s[2 * trace - 2], 20 * np.log10(np.abs(sxx)))
+        assert np.allclose(s[2 * trace - 1], np.angle(sxx))
+    assert visa.written == [
+        "CALC1:PAR:COUN 4;:CALC1:PAR1:DEF S11;:CALC1:PAR2:DEF S12;"
+        ":CALC1:PAR3:DEF S21;:CALC1:PAR4:DEF S22;:CALC1:TRAC1:FORM SMITH;"
+        ":CALC1:TRAC2:FORM SMITH;:CALC1:TRAC3:FORM SMITH;"
+        ":CALC1:TRAC4:FORM SMITH;:TRIG:SEQ:SING",
+        "*OPC?",
+        "FORM:BORD SWAP;:FORM:DATA REAL",
+        "SENS1:FREQ:DATA?",
+        "CALC1:TRAC1:DATA:FDAT?",
+        "CALC1:TRAC2:DATA:FDAT?",
+        "CALC1:TRAC3:DATA:FDAT?",
+        "CALC1:TRAC4:DATA:FDAT?",
+    ]
+    assert vna.data_transfer_format.cache.get() == "real"
+
+
+def test_sweep_mag_phase_binary(vna, visa):
+    magnitude, phase = vna.s21()
+    data = visa.traces[1]
+    sxx = data[0::2] + 1j * data[1::2]
+    assert np.allclose(magnitude, 20 * np.log10(np.abs(sxx)))
+    assert np.allclose(phase, np.unwrap(np.angle(sxx)))
@@ -0,0 +1,193 @@
+import json
+from typing import Dict, List
+
+import pytest
+
+from qcodes_contrib_drivers.drivers.ERAInstruments import erasynth
+from qcodes_contrib_drivers.drivers.ERAInstruments.erasynth import (
+    ConfirmPolicy,
+    ERASynthPlus,
+)
+
+
+class SerialStandIn:
+    """
+    Stands in for the serial VISA resource of an ERASynth+.
+
+    Settings confirmed through the configuration JSON are ignored the first
+    ``n_ignored`` times they are written, to mimic a slow synthesizer.
+    """
+
+    def __init__(self, n_ignored: int = 0):
+        self.n_ignored = n_ignored
+        self.written: List[str] = []
+        self.timeout = 2000
+        self.write_termination = "\r\n"
+        self.read_termination = "\r\n"
+        self.bytes_in_buffer = 0
+        self.config: Dict[str, str] = {
+            "rfoutput": "0",
+            "amplitude": "0.00",
+            "frequency": "1000000000",
+            **{key: "0" for key in erasynth._CMD_TO_JSON_MAPPING.values()},
+        }
+        self.diagnostic: Dict[str, str] = {
+            "temperature": "38.5",
+            "voltage": "5.1",
+            "current": "0.8",
+            "em": "1.0.9",
+            "rssi": "0",
+            "lock_lmx1": "1",
+            "lock_lmx2": "1",
+            "lock_xtal": "1",
+            "model": "1",
+            "serial_number": "0123",
+        }
+
+    def write(self, message: str) -> None:
+        self.written.append(message)
+        self._respond(message[1:])
+
+    def query(self, message: str) -> str:
+        self.written.append(message)
+        return self._respond(message[1:])
+
+    def read_bytes(self, count: int) -> bytes:
+        return b""
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _respond(self, cmd: str) -> str:
+        if cmd == "RA":
+            return json.dumps(self.config, separators=(",", ":"))
+        if cmd == "RD":
+            return json.dumps(self.diagnostic, separators=(",", ":"))
+        for command, json_key in {
+            **erasynth._CMD_TO_JSON_MAPPING,
+            **erasynth._SET_AND_CONFIRM_TO_JSON_MAPPING,
+        }.items():
+            if cmd.startswith(command):
+                if self.n_ignored > 0:
+                    self.n_ignored -= 1
+                    return ""
+                value = cmd[len(command):]
+                self.config[json_key] = value
+                if command == "P0":
+                    return "RF output " + {"0": "OFF", "1": "ON"}[value]
+                return f"{json_key} set to {value}"
+        return ""
+
+
+@pytest.fixture()
+def serial(mocker):
+    stand_in = SerialStandIn()
+    mocker.patch.object(
+        ERASynthPlus, "_open_resource", return_value=(stand_in, "sim")
+    )
+    return stand_in
+
+
+@pytest.fixture()
+def sleeps(mocker):
+    return mocker.patch.object(erasynth.time, "sleep")
+
+
+@pytest.fixture()
+def lo(serial):
+    instrument = ERASynthPlus("erasynth", "ASRL1::INSTR")
+    yield instrument
+    instrument.close()
+
+
+def test_snapshot_reads_each_json_once(lo, serial):
+    serial.written.clear()
+    lo.snapshot(update=True)
+    assert serial.written.count(">RA") == 1
+    assert serial.written.count(">RD") == 1
+
+
+def test_write_invalidates_json_cache(lo, serial):
+    assert lo.modulation_freq() == 0
+    serial.config["modulation_freq"] = "2000"
+    assert lo.modulation_freq() == 0
+    lo.wifi_off()
+    serial.written.clear()
+    assert lo.modulation_freq() == 2000
+    assert serial.written == [">RA"]
+
+
+def test_write_confirmed_with_backoff(lo, serial, sleeps):
+    serial.n_ignored = 3
+    serial.written.clear()
+    lo.modulation_freq(2000)
+    assert serial.written.count(">M32000") == 4
+    assert [c.args[0] for c in sleeps.call_args_list] == [0.01, 0.02, 0.04]
+
+
+def test_write_confirm_gives_up(lo, serial, sleeps):
+    lo.confirm_policy = ConfirmPolicy(max_attempts=3)
+    serial.n_ignored = 10
+    serial.written.clear()
+    with pytest.raises(TimeoutError):
+        lo.modulation_freq(2000)
+    assert serial.written.count(">M32000") == 3
+    # no wait after the last attempt
+    assert [c.args[0] for c in sleeps.call_args_list] == [0.01, 0.02]
+
+
+def test_write_confirm_gives_up_before_timeout(lo, serial, sleeps):
+    lo.confirm_policy = ConfirmPolicy(timeout=0.015)
+    serial.n_ignored = 10
+    serial.written.clear()
+    with pytest.raises(TimeoutError, match="in 2 attempts"):
+        lo.modulation_freq(2000)
+    # waiting another 0.02 s would exceed the timeout
+    assert [c.args[0] for c in sleeps.call_args_list] == [0.01]
+
+
+def test_set_and_confirm_with_backoff(lo, serial, sleeps):
+    serial.n_ignored = 1
+    serial.written.clear()
+    lo.status(True)
+    assert serial.written == [">P01", ">P01"]
+    assert [c.args[0] for c in sleeps.call_args_list] == [0.01]
+
+
+def test_set_and_confirm_gives_up(lo, serial, sleeps):
+    lo.confirm_policy = ConfirmPolicy(max_attempts=2)
+    serial.n_ignored = 10
+    serial.written.clear()
+    with pytest.raises(TimeoutError):
+        lo.frequency(5e9)
+    assert serial.written == [">F5000000000", ">F5000000000"]
+    assert [c.args[0] for c in sleeps.call_args_list] == [0.01]
+
+
+def test_confirm_policy_needs_an_attempt():
+    with pytest.raises(ValueError, match="max_attempts"):
+        ConfirmPolicy(max_attempts=0)
+
+
+def test_confirm_together(lo, serial, sleeps):
+    serial.n_ignored = 1
+    serial.written.clear()
+    with lo.confirm_together():
+        lo.frequency(5e9)
+        lo.power(3)
+        lo.modulation_freq(2000)
+    assert serial.config["frequency"] == "5000000000"
+    assert serial.config["amplitude"] == "3.00"
+    assert serial.config["modulation_freq"] == "2000"
+    # The ignored frequency is resent after the first readback
+    assert serial.written == [
+        ">F5000000000",
+        ">A3.00",
+        ">M32000",
+        ">RA",
+        ">F5000000000",
+        ">RA",
+    ]
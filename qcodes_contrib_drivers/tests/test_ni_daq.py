@@ -0,0 +1,121 @@
+import sys
+from unittest.mock import MagicMock, call, patch
+
+import numpy as np
+import pytest
+
+nidaqmx = MagicMock(name='nidaqmx')
+with patch.dict(sys.modules, nidaqmx=nidaqmx, **{'nidaqmx.constants': nidaqmx.constants}):
+    from qcodes_contrib_drivers.drivers.NationalInstruments.DAQ import (
+        DAQAnalogInputs, DAQAnalogOutputs, DAQDigitalOutputs)
+
+
+@pytest.fixture()
+def tasks():
+    nidaqmx.Task.reset_mock()
+    created = []
+
+    def new_task(name):
+        task = MagicMock(name=name)
+        created.append(task)
+        return task
+
+    nidaqmx.Task.side_effect = new_task
+    yield created
+    nidaqmx.Task.side_effect = None
+
+
+@pytest.fixture()
+def daq_ao(tasks):
+    instrument = DAQAnalogOutputs('daq_ao', 'Dev1', {'G1': 0, 'G2': 3})
+    yield instrument
+    instrument.close()
+
+
+def test_ao_task_reused(daq_ao, tasks):
+    for voltage in np.linspace(0, 1, 5):
+        daq_ao.voltage_g1(voltage)
+    assert len(tasks) == 1
+    task = tasks[0]
+    task.ao_channels.add_ao_voltage_chan.assert_called_once_with(
+        'Dev1/ao0', 'voltage_g1')
+    task.start.assert_called_once()
+    assert task.write.call_count == 5
+    assert daq_ao.voltage_g1() == 1.0
+
+
+def test_ao_write_all_channels(daq_ao, tasks):
+    daq_ao.voltage_g1(0.5)
+    daq_ao.voltages([0.1, 0.2])
+    assert len(tasks) == 2
+    single, group = tasks
+    # The outputs are released before the other task reserves them
+    single.stop.assert_called_once()
+    single.control.assert_called_once_with(nidaqmx.constants.TaskMode.TASK_UNRESERVE)
+    group.ao_channels.add_ao_voltage_chan.assert_has_calls([
+        call('Dev1/ao0', 'voltage_g1'), call('Dev1/ao3', 'voltage_g2')])
+    group.write.assert_called_once()
+    assert np.array_equal(group.write.call_args.args[0], [0.1, 0.2])
+    assert daq_ao.voltage_g2() == 0.2
+    assert np.array_equal(daq_ao.voltages(), [0.1, 0.2])
+    with pytest.raises(ValueError):
+        daq_ao.voltages([0.1])
+
+
+def test_ao_close_releases_tasks(tasks):
+    daq_ao = DAQAnalogOutputs('daq_ao_close', 'Dev1', {'G1': 0, 'G2': 1})
+    daq_ao.voltage_g1(0.5)
+    daq_ao.voltages([0.1, 0.2])
+    daq_ao.close()
+    for task in tasks:
+        task.close.assert_called_once()
+
+
+def test_ai_voltage_averaged():
+    ai_task = MagicMock(name='ai_task')
+    ai_task.read.return_value = [[1, 3, 5, 7], [0, 2, 4, 6]]
+    daq_ai = DAQAnalogInputs('daq_ai_avg', 'Dev1', 1000, {'A': 0, 'B': 1}, ai_task,
+                             samples_to_read=4, target_points=2)
+    assert np.array_equal(daq_ai.voltage(), [[2, 6], [1, 5]])
+    daq_ai.close()
+
+
+def test_buffered_scan(daq_ao, tasks):
+    ai_task = MagicMock(name='ai_task')
+    daq_ai = DAQAnalogInputs('daq_ai', 'Dev1', 1000, {'A': 0}, ai_task)
+    ai_task.read.return_value = [1, 3, 5, 7, 9, 11]
+    daq_ao.voltage_g1(0.5)
+    # -----------------------------------------------------------------------
+    data = daq_ao.buffered_scan([[0, 1, 2], [3, 4, 5]], daq_ai, rate=2000,
+                                samples_per_point=2)
+    # -----------------------------------------------------------------------
+    assert np.array_equal(data, [[2, 6, 10]])
+    single, scan = tasks
+    single.control.assert_called_once_with(nidaqmx.constants.TaskMode.TASK_UNRESERVE)
+    scan.timing.cfg_samp_clk_timing.assert_called_once_with(
+        2000, sample_mode=nidaqmx.constants.AcquisitionType.FINITE, samps_per_chan=6)
+    assert np.array_equal(scan.write.call_args.args[0],
+                          [[0, 0, 1, 1, 2, 2], [3, 3, 4, 4, 5, 5]])
+    ai_task.timing.cfg_samp_clk_timing.assert_has_calls([
+        call(2000, source='/Dev1/ao/SampleClock',
+             sample_mode=nidaqmx.constants.AcquisitionType.FINITE, samps_per_chan=6),
+        # Restored
+        call(1000, sample_mode=nidaqmx.constants.AcquisitionType.FINITE,
+             samps_per_chan=2)])
+    ai_task.read.assert_called_once_with(number_of_samples_per_channel=6, timeout=60)
+    assert daq_ao.voltage_g2() == 5
+    daq_ai.close()
+
+
+def test_do_task_reused(tasks):
+    daq_do = DAQDigitalOutputs('daq_do', 'Dev1', ['port0/line0', 'port0/line1'])
+    daq_do.state([True, False])
+    daq_do.state([False, True])
+    assert len(tasks) == 1
+    task = tasks[0]
+    task.do_channels.add_do_chan.assert_called_once()
+    assert task.do_channels.add_do_chan.call_args.args[0] == \
+        'Dev1/port0/line0, Dev1/port0/line1'
+    assert task.write.call_args_list == [call([True, False]), call([False, True])]
+    daq_do.close()
+    task.close.assert_called_once()
@@ -0,0 +1,129 @@
+import logging
+from typing import List
+from unittest.mock import MagicMock
+
+import pytest
+
+from qcodes_contrib_drivers.drivers.QuTech.IVVI import IVVI
+
+
+class SerialStandIn:
+    """
+    Stands in for the serial VISA resource of an IVVI rack. Every framed
+    message written is answered in the reply buffer like the rack does.
+    """
+
+    def __init__(self, numdacs: int = 16):
+        self.dacs = [32768] * numdacs
+        self.raw_written: List[bytes] = []
+        self.reply_buffer = b''
+        self.error_code = 0
+        self.timeout = 1000
+        self.session = 1
+        self.visalib = self
+        self.ignore_warning = MagicMock()
+
+    def set_visa_attribute(self, *args) -> None:
+        pass
+
+    @property
+    def bytes_in_buffer(self) -> int:
+        return len(self.reply_buffer)
+
+    def write_raw(self, message: bytes) -> None:
+        self.raw_written.append(bytes(message))
+        offset = 0
+        while offset < len(message):
+            frame = message[offset:offset + message[offset]]
+            offset += len(frame)
+            if frame[3] == 1:
+                self.dacs[frame[4] - 1] = int.from_bytes(frame[5:7], 'big')
+                self.reply_buffer += bytes([2, self.error_code])
+            elif frame[3] == 2:
+                self.reply_buffer += bytes([2 * len(self.dacs) + 2, 0])
+                self.reply_buffer += b''.join(
+                    value.to_bytes(2, 'big') for value in self.dacs)
+
+    def read(self, session: int, size: int):
+        data = self.reply_buffer[:size]
+        self.reply_buffer = self.reply_buffer[size:]
+        return data, 0
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _frames(message: bytes) -> List[bytes]:
+    frames = []
+    offset = 0
+    while offset < len(message):
+        frames.append(message[offset:offset + message[offset]])
+        offset += message[offset]
+    return frames
+
+
+def _set_values(message: bytes):
+    """Channel and bipolar voltage in mV of each set command of a message."""
+    return [(frame[4], int.from_bytes(frame[5:7], 'big') / 65535 * 4000 - 2000)
+            for frame in _frames(message)]
+
+
+@pytest.fixture()
+def serial(mocker):
+    stand_in = SerialStandIn()
+    mocker.patch.object(IVVI, "_open_resource", return_value=(stand_in, "sim"))
+    return stand_in
+
+
+@pytest.fixture()
+def ivvi(serial):
+    instrument = IVVI("ivvi", "ASRL1::INSTR", use_locks=True)
+    instrument.dac_read_buffer_sleep(0)
+    instrument.dac_voltages()
+    serial.raw_written.clear()
+    yield instrument
+    instrument.close()
+
+
+def test_set_dacs_frames(ivvi, serial):
+    ivvi.set_dacs({1: 100, 2: 0, 3: -50})
+    # dac2 already is at 0 mV and is skipped
+    assert serial.raw_written == [
+        bytes([7, 0, 2, 1, 1, 0x86, 0x66, 7, 0, 2, 1, 3, 0x7C, 0xCC])]
+    assert serial.reply_buffer == b''
+    assert ivvi.dac1.cache.get() == pytest.approx(100, abs=0.1)
+    assert ivvi.dac3.cache.get() == pytest.approx(-50, abs=0.1)
+    # the known values are used, nothing is sent for unchanged dacs
+    ivvi.set_dacs({1: 100, 3: -50})
+    assert len(serial.raw_written) == 1
+
+
+def test_set_dacs_reply_error(ivvi, serial, caplog):
+    serial.error_code = 4
+    with caplog.at_level(logging.WARNING):
+        ivvi.set_dacs({1: 10, 2: 20})
+    assert caplog.text.count('set dac error code 4') == 2
+
+
+def test_ramp_dacs_interleaved(ivvi, serial):
+    ivvi.ramp_dacs({1: 30, 4: -20}, step=10, delay=0)
+    rounds = [_set_values(message) for message in serial.raw_written]
+    assert [[channel for channel, _ in values] for values in rounds] == \
+        [[1, 4]] * 3
+    assert [value for values in rounds for _, value in values] == \
+        pytest.approx([10, -20 / 3, 20, -40 / 3, 30, -20], abs=0.1)
+    assert ivvi.dac1() == pytest.approx(30, abs=0.1)
+    assert ivvi.dac4() == pytest.approx(-20, abs=0.1)
+
+
+def test_lock_released_on_error(ivvi, mocker):
+    mocker.patch.object(IVVI, "read", side_effect=TimeoutError)
+    with pytest.raises(TimeoutError):
+        ivvi.set_dacs({1: 10})
+    assert not ivvi.lock.locked()
+    with pytest.raises(TimeoutError):
+        ivvi.ask(bytes([34, 2]))
+    assert not ivvi.lock.locked()
@@ -0,0 +1,59 @@
+import logging
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+from pyvisa.util import from_ieee_block, to_ieee_block
+
+from qcodes_contrib_drivers.drivers.RohdeSchwarz.ZVL13 import ZVL13
+
+
+class VisaStandIn:
+    """
+    Stands in for the VISA resource of a ZVL13, answering trace queries with
+    a binary block in the data format and byte order set by FORM commands.
+    """
+
+    def __init__(self, trace: np.ndarray):
+        self.written: List[str] = []
+        self.trace = trace
+        self.datatype = "f"
+        self.big_endian = True
+
+    def write(self, message: str) -> None:
+        self.written.append(message)
+        for command in message.split(";:"):
+            if command == "FORM REAL,32":
+                self.datatype = "f"
+            elif command == "FORM REAL,64":
+                self.datatype = "d"
+            elif command == "FORM:BORD SWAP":
+                self.big_endian = False
+            elif command == "FORM:BORD NORM":
+                self.big_endian = True
+
+    def query_binary_values(self, message: str, datatype: str,
+                            is_big_endian: bool, container: type):
+        self.written.append(message)
+        block = to_ieee_block(self.trace, self.datatype, self.big_endian)
+        return from_ieee_block(block, datatype, is_big_endian, container)
+
+
+@pytest.fixture()
+def vna():
+    rng = np.random.default_rng(0)
+    visa = VisaStandIn(rng.normal(scale=50, size=1001))
+    return SimpleNamespace(visa_handle=visa, write=visa.write,
+                           log=logging.getLogger(__name__))
+
+
+def test_ask_binary_trace(vna):
+    data = ZVL13._ask_binary_trace(vna, "TRAC? TRACE1")
+    trace = vna.visa_handle.trace
+    assert vna.visa_handle.written == ["FORM REAL,32;:FORM:BORD SWAP",
+                                       "TRAC? TRACE1"]
+    assert data.dtype == np.float64
+    assert data.shape == trace.shape
+    assert np.array_equal(data, trace.astype(np.float32))
+    np.testing.assert_allclose(data, trace, rtol=1e-7)
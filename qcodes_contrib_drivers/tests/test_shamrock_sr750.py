@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from qcodes_contrib_drivers.drivers.Shamrock import SR750
+from qcodes_contrib_drivers.drivers.Shamrock.SR750 import Shamrock_SR750
+
+
+@pytest.fixture()
+def cif(mocker):
+    stand_in = MagicMock(name='ShamrockCIF')
+    stand_in.get_serial_number.return_value = 1234
+    stand_in.get_number_gratings.return_value = 2
+    stand_in.get_grating.return_value = 1
+    stand_in.get_wavelength_limits.return_value = (0.0, 2000.0)
+    stand_in.get_grating_info.return_value = (600.0, b'500', 0, 0)
+    stand_in.get_number_pixels.return_value = 8
+    stand_in.get_calibration.side_effect = \
+        lambda device, number_pixels: np.linspace(500, 600, number_pixels)
+    mocker.patch.object(SR750, 'ShamrockCIF', return_value=stand_in)
+    return stand_in
+
+
+@pytest.fixture()
+def ccd():
+    return SimpleNamespace(x_pixels=8,
+                           spectrum=MagicMock(get=lambda: np.arange(8)))
+
+
+@pytest.fixture()
+def spectrometer(cif, ccd):
+    instrument = Shamrock_SR750('sr750', ccd_number_pixels=8, ccd=ccd)
+    yield instrument
+    instrument.close()
+
+
+def test_calibration_cached(spectrometer, cif):
+    first = spectrometer.calibration()
+    assert isinstance(first, np.ndarray)
+    first[0] = 0
+    wavelength, counts = spectrometer.calibrated_spectrum()
+    spectrometer.calibration()
+    assert cif.get_calibration.call_count == 1
+    assert wavelength[0] == 500
+    assert np.array_equal(counts, np.arange(8))
+
+
+@pytest.mark.parametrize('name, value', [
+    ('grating', 2),
+    ('wavelength', 700.0),
+    ('number_pixels', 8),
+    ('pixel_width', 13.5),
+])
+def test_calibration_read_again_after_set(spectrometer, cif, name, value):
+    spectrometer.calibration()
+    spectrometer.parameters[name].set(value)
+    spectrometer.calibration()
+    spectrometer.calibrated_spectrum()
+    assert cif.get_calibration.call_count == 2
+
+
+def test_ccd_number_pixels_mismatch(cif, ccd):
+    with pytest.raises(ValueError, match='CCD has 8 pixels'):
+        Shamrock_SR750('sr750', ccd_number_pixels=1024, ccd=ccd)
+
+
+def test_calibrated_spectrum_number_pixels_mismatch(spectrometer, cif):
+    spectrometer.number_pixels(16)
+    with pytest.raises(ValueError, match='CCD has 8 pixels'):
+        spectrometer.calibrated_spectrum()
+    cif.get_calibration.assert_not_called()
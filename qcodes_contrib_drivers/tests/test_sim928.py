@@ -0,0 +1,154 @@
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from qcodes.instrument.parameter import Parameter
+from qcodes.utils.validators import Numbers
+
+from qcodes_contrib_drivers.drivers.StanfordResearchSystems import SIM928
+from qcodes_contrib_drivers.drivers.StanfordResearchSystems.SIM928 import \
+    SIM928 as SIM928Driver
+
+
+def _assert_smooth(start, stop, stepsize, trajectories):
+    path = np.vstack([start, trajectories])
+    assert np.all(np.abs(np.diff(path, axis=0)) <= stepsize + 1e-12)
+    assert np.allclose(trajectories[-1], stop)
+
+
+@pytest.mark.parametrize("start, stop", [
+    ([0.0, 0.0], [-0.25, 0.25]),
+    ([0.5, -0.5], [-0.35, 0.45]),
+    ([-1.0, 1.0], [-1.3, 0.7]),
+    ([0.2, 0.2], [0.2, -0.2]),
+])
+@pytest.mark.parametrize("equitime", [False, True])
+def test_smooth_trajectories_respect_step(start, stop, equitime):
+    start = np.array(start)
+    stop = np.array(stop)
+    stepsize = np.array([0.1, 0.1])
+    trajectories = SIM928Driver._smooth_trajectories(start, stop, stepsize,
+                                                     equitime)
+    _assert_smooth(start, stop, stepsize, trajectories)
+
+
+def test_smooth_trajectories_negative_step_count():
+    trajectories = SIM928Driver._smooth_trajectories(
+        np.array([0.0, 0.0]), np.array([-0.25, 0.25]), np.array([0.1, 0.1]),
+        False)
+    assert np.allclose(trajectories, [[-0.1, 0.1], [-0.2, 0.2],
+                                      [-0.25, 0.25]])
+
+
+def test_smooth_trajectories_equitime_arrive_together():
+    start = np.array([0.0, 1.0])
+    stop = np.array([-0.3, 0.9])
+    trajectories = SIM928Driver._smooth_trajectories(
+        start, stop, np.array([0.1, 0.1]), True)
+    assert len(trajectories) == 3
+    assert np.allclose(trajectories[:, 1], [0.9 + 0.2 / 3, 0.9 + 0.1 / 3,
+                                            0.9])
+    _assert_smooth(start, stop, np.array([0.1, 0.1]), trajectories)
+
+
+def test_smooth_trajectories_no_change():
+    trajectories = SIM928Driver._smooth_trajectories(
+        np.array([0.1]), np.array([0.1]), np.array([0.1]), False)
+    assert np.allclose(trajectories, [[0.1]])
+
+
+def test_ramp_sends_only_changed_modules(mocker):
+    sleep = mocker.patch.object(SIM928.time, "sleep")
+    parameters = {'volt_a': MagicMock(), 'volt_b': MagicMock()}
+    sim = SimpleNamespace(module_nr={'a': 2, 'b': 5},
+                          parameters=parameters,
+                          smooth_timestep=lambda: 0.01,
+                          write=MagicMock())
+    start = np.array([0.0, 0.0])
+    stop = np.array([-0.25, 0.1])
+    trajectories = SIM928Driver._smooth_trajectories(
+        start, stop, np.array([0.1, 0.1]), False)
+    SIM928Driver._ramp(sim, ['a', 'b'], start, trajectories)
+    assert [c.args[0] for c in sim.write.call_args_list] == [
+        'SNDT 2,"VOLT -0.100";SNDT 5,"VOLT 0.100"',
+        'SNDT 2,"VOLT -0.200"',
+        'SNDT 2,"VOLT -0.250"',
+    ]
+    assert parameters['volt_a'].cache.set.call_args.args[0] == -0.25
+    assert parameters['volt_b'].cache.set.call_count == 1
+    assert sleep.call_count == 3
+
+
+class MainframeStandIn:
+    """
+    Runs the smooth ramping of the SIM928 driver on two modules without a
+    VISA connection, recording the voltages written and the writing thread.
+    """
+    set_smooth = SIM928Driver.set_smooth
+    _smooth_ramp = SIM928Driver._smooth_ramp
+    _smooth_trajectories = staticmethod(SIM928Driver._smooth_trajectories)
+    _ramp = SIM928Driver._ramp
+
+    def __init__(self):
+        self.name = 'sim900'
+        self.modules = [1, 2]
+        self.slot_names = {}
+        self.module_nr = {}
+        self.parameters = {}
+        for i in self.modules:
+            self.parameters['volt_{}'.format(i)] = Parameter(
+                'volt_{}'.format(i), vals=Numbers(-20, 20), set_cmd=None,
+                initial_value=0)
+            self.parameters['volt_{}_step'.format(i)] = Parameter(
+                'volt_{}_step'.format(i), set_cmd=None, initial_value=1)
+        self.smooth_timestep = lambda: 0.001
+        self._ramp_executor = None
+        self.written = []
+
+    def get(self, name):
+        return self.parameters[name].get()
+
+    def write(self, cmd):
+        self.written.append((threading.current_thread().name, cmd))
+
+    def voltages(self, slot):
+        return [float(part.split('VOLT ')[1].rstrip('"'))
+                for _, cmd in self.written for part in cmd.split(';')
+                if part.startswith('SNDT {},'.format(slot))]
+
+
+@pytest.fixture()
+def mainframe():
+    stand_in = MainframeStandIn()
+    yield stand_in
+    if stand_in._ramp_executor is not None:
+        stand_in._ramp_executor.shutdown(wait=True)
+
+
+def test_background_ramps_start_where_previous_ends(mainframe):
+    first = mainframe.set_smooth({1: 5}, wait=False)
+    second = mainframe.set_smooth({1: -2}, wait=False)
+    assert first.result(timeout=5) is None
+    assert second.result(timeout=5) is None
+    assert mainframe.voltages(1) == [1, 2, 3, 4, 5, 4, 3, 2, 1, 0, -1, -2]
+    assert mainframe.parameters['volt_1'].cache.get() == -2
+
+
+def test_background_ramp_validates_on_submit(mainframe):
+    with pytest.raises(ValueError):
+        mainframe.set_smooth({1: 25}, wait=False)
+    with pytest.raises(KeyError):
+        mainframe.set_smooth({3: 1}, wait=False)
+    assert mainframe._ramp_executor is None
+
+
+def test_waiting_ramp_queues_behind_background_ramp(mainframe):
+    background = mainframe.set_smooth({1: 3, 2: 1}, wait=False)
+    mainframe.set_smooth({1: 0})
+    assert background.done()
+    assert mainframe.voltages(1) == [1, 2, 3, 2, 1, 0]
+    assert mainframe.voltages(2) == [1]
+    assert len({thread for thread, _ in mainframe.written}) == 1
+    assert mainframe.written[0][0].startswith('sim900_ramp')
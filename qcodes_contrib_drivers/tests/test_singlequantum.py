@@ -0,0 +1,248 @@
+import json
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from qcodes_contrib_drivers.drivers.SingleQuantum.SingleQuantum import (
+    SQCounts,
+    SQTalk,
+    WebSQControlqcode,
+    _SocketReader,
+)
+
+LABELS = {
+    "NumberOfDetectors": {"value": 2},
+    "InptMeasurementPeriod": {"value": 10},
+    "BiasCurrent": {"value": [1.0, 2.0]},
+}
+
+
+def wait_until(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+class StandInServer:
+    """Local TCP server accepting a single connection."""
+
+    def __init__(self):
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.conn = None
+
+    def accept(self):
+        self.conn, _ = self.listener.accept()
+        return self.conn
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.listener.close()
+
+
+class LabelServer(StandInServer, threading.Thread):
+    """Answers every labelProps request with all labels, as two JSON
+    objects glued together and split over several packets."""
+
+    def __init__(self):
+        StandInServer.__init__(self)
+        threading.Thread.__init__(self, daemon=True)
+        self.requests = []
+
+    def run(self):
+        conn = self.accept()
+        while True:
+            try:
+                data = conn.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            self.requests.append(data)
+            items = list(LABELS.items())
+            reply = "".join(json.dumps({"label": label, "value": value})
+                            for label, value in items[:2])
+            reply += "\x17" + json.dumps(
+                {"label": items[2][0], "value": items[2][1]}) + "\x17"
+            reply = reply.encode()
+            conn.sendall(reply[:7])
+            time.sleep(0.01)
+            conn.sendall(reply[7:])
+
+
+@pytest.fixture()
+def server():
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture()
+def talk(server):
+    errors = []
+    reader = SQTalk("127.0.0.1", server.port, error_callback=errors.append)
+    reader.errors = errors
+    conn = server.accept()
+    reader.daemon = True
+    reader.start()
+    assert json.loads(conn.recv(4096)) == {"request": "labelProps",
+                                           "value": "None"}
+    yield reader
+    reader.close()
+
+
+@pytest.fixture()
+def counts(server):
+    reader = SQCounts("127.0.0.1", server.port, CNTS_BUFFER=4)
+    server.accept()
+    reader.daemon = True
+    reader.start()
+    yield reader
+    reader.close()
+
+
+def test_talk_decodes_split_and_glued_messages(talk, server):
+    stream = ('{"label": "A", "value": {"value": 1}}'
+              '{"label": "B", "value": {"value": "µA"}}\x17'
+              '{"label": "A", "value": 5}\x17').encode()
+    # split inside a JSON object and inside the two byte UTF-8 character
+    split = stream.index("µ".encode()) + 1
+    for chunk in (stream[:10], stream[10:split], stream[split:]):
+        server.conn.sendall(chunk)
+        time.sleep(0.01)
+    wait_until(lambda: talk.labelProps.get("A") == {"value": 5})
+    assert talk.labelProps["B"] == {"value": "µA"}
+
+
+def test_talk_skips_malformed_message(talk, server):
+    server.conn.sendall(b'{"label": oops}\x17{"label": "A", "value": {}}\x17')
+    wait_until(lambda: "A" in talk.labelProps)
+
+
+def test_get_label_waits_for_reply(talk, server):
+    def reply():
+        server.conn.recv(4096)
+        server.conn.sendall(
+            b'{"label": "NumberOfDetectors", "value": {"value": 2}}\x17')
+
+    replier = threading.Thread(target=reply)
+    replier.start()
+    assert talk.get_label("NumberOfDetectors", timeout=2) == {"value": 2}
+    replier.join()
+
+
+def test_get_label_timeout(talk):
+    with pytest.raises(IOError):
+        talk.get_label("Missing", timeout=0.05)
+
+
+def test_get_label_sends_without_lock(talk, server, mocker):
+    def send(msg):
+        assert not talk.lock.locked()
+        server.conn.sendall(
+            b'{"label": "NumberOfDetectors", "value": {"value": 2}}\x17')
+
+    mocker.patch.object(talk, "send", side_effect=send)
+    assert talk.get_label("NumberOfDetectors", timeout=2) == {"value": 2}
+
+
+def test_socket_reader_is_abstract(server):
+    with pytest.raises(TypeError):
+        _SocketReader("127.0.0.1", server.port)
+
+
+def test_error_callback(talk, server):
+    server.conn.sendall(b'{"label": "Error", "value": "boom"}\x17')
+    wait_until(lambda: talk.errors == ["boom"])
+
+
+def test_counts_ring_buffer(counts, server):
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(counts.get_n(3)))
+    waiter.start()
+    stream = b"".join(b"%d,%d,%d\n" % (t, 10 * t, 100 * t)
+                      for t in range(1, 6))
+    server.conn.sendall(stream[:5])
+    time.sleep(0.01)
+    server.conn.sendall(stream[5:])
+    waiter.join(2)
+    assert not waiter.is_alive()
+    assert counts.n == 5
+    assert result[0].shape == (3, 3)
+    assert np.array_equal(counts.cnts[:, 0], [2, 3, 4, 5])
+    assert np.array_equal(counts.cnts[-1], [5, 50, 500])
+
+
+def test_counts_get_n_grows_buffer(counts, server):
+    server.conn.sendall(b"1,1,1\n2,2,2\n3,3,3\n")
+    wait_until(lambda: counts.n == 3)
+
+    def send():
+        time.sleep(0.05)
+        server.conn.sendall(b"".join(b"%d,0,0\n" % t for t in range(4, 10)))
+
+    sender = threading.Thread(target=send)
+    sender.start()
+    cnts = counts.get_n(6, timeout=2)
+    sender.join()
+    assert np.array_equal(cnts[:, 0], np.arange(4, 10))
+    assert counts.CNTS_BUFFER == 6
+    assert np.array_equal(counts.cnts[:, 0], np.arange(4, 10))
+
+
+def test_counts_skip_bad_rows(counts, server, caplog):
+    server.conn.sendall(b"1,10,100\n2,oops,200\n3,30\n4,40,400\n")
+    wait_until(lambda: counts.n == 2)
+    assert np.array_equal(counts.cnts, [[1, 10, 100], [4, 40, 400]])
+    assert "malformed" in caplog.text
+    assert "2 instead of 3" in caplog.text
+
+
+def test_counts_timeout_and_close(counts, server):
+    with pytest.raises(TimeoutError):
+        counts.get_n(1, timeout=0.05)
+    server.conn.close()
+    with pytest.raises(IOError):
+        counts.get_n(1, timeout=2)
+
+
+def test_idle_readers_use_no_cpu(talk, counts):
+    start = time.process_time()
+    time.sleep(0.5)
+    assert time.process_time() - start < 0.1
+
+
+def test_instrument_counters():
+    labels = LabelServer()
+    labels.start()
+    counts = StandInServer()
+    accepted = threading.Thread(target=counts.accept)
+    accepted.start()
+    sq = WebSQControlqcode("sq", "127.0.0.1", labels.port,
+                           counts_port=counts.port)
+    try:
+        accepted.join()
+        assert sq.NUMBER_OF_DETECTORS == 2
+        assert sq.measurement_periode() == 10
+        sq.npts(2)
+
+        def send():
+            time.sleep(0.05)
+            counts.conn.sendall(b"0.1,1,2\n0.2,3,4\n")
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        cnts = sq.counters()
+        sender.join()
+        assert np.array_equal(cnts, [[0.1, 0.2], [1, 3], [2, 4]])
+        assert np.array_equal(sq.channel2(), [2, 4])
+        assert np.array_equal(sq.timing(), [0.1, 0.2])
+    finally:
+        sq.close()
+        labels.close()
+        counts.close()
@@ -0,0 +1,197 @@
+import os
+import struct
+import time
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+from qcodes_contrib_drivers.drivers.Tektronix import AWG520
+from qcodes_contrib_drivers.drivers.Tektronix.AWG520 import (
+    Tektronix_AWG520,
+    _encode_waveform_file,
+)
+
+
+def _encode_reference(magic, w, m1, m2, clock):
+    data = b''.join(struct.pack('<fB', w[i], int(m1[i] + 2 * m2[i]))
+                    for i in range(len(w)))
+    body = ((magic + '\n').encode()
+            + ('#%d%d' % (len(str(len(data))), len(data))).encode()
+            + data
+            + ('CLOCK %.10e\n' % clock).encode())
+    return ('#%d%d' % (len(str(len(body))), len(body))).encode() + body
+
+
+# The encoder benchmark is only run when asked for, e.g. with
+# AWG520_BENCHMARK=1 pytest -s -k benchmark
+benchmark = pytest.mark.skipif(
+    os.environ.get('AWG520_BENCHMARK', '') == '',
+    reason='encoder benchmark not requested (AWG520_BENCHMARK)')
+
+
+class VisaStandIn:
+    """
+    Stands in for the GPIB VISA resource of an AWG520, recording raw writes
+    together with the state of send_end.
+    """
+
+    def __init__(self):
+        self.raw_written: List[Tuple[bytes, bool]] = []
+        self.written: List[str] = []
+        self.timeout = 2000
+        self.write_termination = "\n"
+        self.read_termination = "\n"
+        self.send_end = True
+
+    def write(self, message: str) -> None:
+        self.written.append(message)
+
+    def write_raw(self, message: bytes) -> None:
+        self.raw_written.append((bytes(message), self.send_end))
+
+    def query(self, message: str) -> str:
+        return "TEKTRONIX,AWG520,0,SCPI:95.0"
+
+    def clear(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture()
+def visa(mocker):
+    stand_in = VisaStandIn()
+    mocker.patch.object(
+        Tektronix_AWG520, "_open_resource", return_value=(stand_in, "sim")
+    )
+    return stand_in
+
+
+@pytest.fixture()
+def awg(visa):
+    instrument = Tektronix_AWG520("awg520", "GPIB::1::INSTR")
+    yield instrument
+    instrument.close()
+
+
+@pytest.mark.parametrize("magic", ["MAGIC 1000", "MAGIC 2000"])
+def test_encode_matches_reference(magic):
+    rng = np.random.default_rng(0)
+    w = rng.uniform(-1, 1, 1234)
+    m1 = rng.integers(0, 2, 1234)
+    m2 = rng.integers(0, 2, 1234)
+    assert (bytes(_encode_waveform_file(magic, w, m1, m2, 1e9))
+            == _encode_reference(magic, w, m1, m2, 1e9))
+
+
+def test_encode_large_waveform():
+    n = 4_000_000
+    w = np.linspace(-1, 1, n)
+    m1 = np.zeros(n, dtype=int)
+    m2 = np.ones(n, dtype=int)
+    block = _encode_waveform_file('MAGIC 1000', w, m1, m2, 1e9)
+    data_header = b'MAGIC 1000\n#820000000'
+    data_start = block.index(data_header) + len(data_header)
+    assert block.startswith(b'#820000044')
+    assert block.endswith(b'CLOCK 1.0000000000e+09\n')
+    assert len(block) == data_start + 5 * n + len(b'CLOCK 1.0000000000e+09\n')
+    samples = np.frombuffer(block, dtype=AWG520._SAMPLE_DTYPE, count=n,
+                            offset=data_start)
+    assert np.array_equal(samples['w'], w.astype(np.float32))
+    assert np.all(samples['m'] == 2)
+
+
+@benchmark
+def test_encode_benchmark():
+    n = 4_000_000
+    repeats = 5
+    w = np.linspace(-1, 1, n)
+    m1 = np.zeros(n, dtype=int)
+    m2 = np.ones(n, dtype=int)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        block = _encode_waveform_file('MAGIC 1000', w, m1, m2, 1e9)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print('\n_encode_waveform_file: {} points in {:.1f} ms (best of {}), '
+          '{:.2f} GB/s'.format(n, best * 1e3, repeats,
+                               len(block) / best / 1e9))
+
+
+def test_send_waveform(awg, visa):
+    w = np.linspace(-1, 1, 1000)
+    m1 = np.zeros(1000, dtype=int)
+    m2 = np.ones(1000, dtype=int)
+    awg.send_waveform(w, m1, m2, 'test.wfm', 1e9)
+    assert b''.join(chunk for chunk, _ in visa.raw_written) == (
+        b'MMEM:DATA "test.wfm",'
+        + _encode_reference('MAGIC 1000', w, m1, m2, 1e9)
+        + b'\n')
+    assert [end for _, end in visa.raw_written] == [False, False, True]
+
+
+def test_write_chunked(awg, visa):
+    awg._write_chunked([b'a' * 5, b'b' * 7, b'c'], chunk_size=3)
+    assert visa.raw_written == [
+        (b'aaa', False),
+        (b'aa', False),
+        (b'bbb', False),
+        (b'bbb', False),
+        (b'b', False),
+        (b'c', True),
+    ]
+    assert visa.send_end
+
+
+def _uploaded(visa):
+    return [chunk[len(b'MMEM:DATA "'):].split(b'"')[0].decode()
+            for chunk, _ in visa.raw_written
+            if chunk.startswith(b'MMEM:DATA')]
+
+
+def _waveform(level, n=100):
+    return (np.full(n, level), np.zeros(n, dtype=int),
+            np.zeros(n, dtype=int), 1e9)
+
+
+def test_send_waveform_skips_unchanged(awg, visa):
+    awg.send_waveform(*_waveform(0.5)[:3], 'a.wfm', 1e9)
+    awg.send_waveform(*_waveform(0.5)[:3], 'a.wfm', 1e9)
+    assert _uploaded(visa) == ['a.wfm']
+    awg.send_waveform(*_waveform(0.5)[:3], 'a.wfm', 1e9, force=True)
+    awg.send_waveform(*_waveform(0.25)[:3], 'a.wfm', 1e9)
+    awg.send_waveform(*_waveform(0.25)[:3], 'a.wfm', 2e8)
+    assert _uploaded(visa) == ['a.wfm'] * 4
+
+
+def test_resend_waveform_skips_unchanged(awg, visa):
+    awg.numpoints(100)
+    awg.send_waveform(*_waveform(0.5)[:3], 'a.wfm', 1e9)
+    awg._do_set_filename('a.wfm', 1)
+    visa.written.clear()
+    awg.resend_waveform(1)
+    assert _uploaded(visa) == ['a.wfm']
+    assert visa.written == ['SOUR1:FUNC:USER "a.wfm","MAIN"']
+    awg.resend_waveform(1, w=np.full(100, 0.1))
+    assert _uploaded(visa) == ['a.wfm', 'a.wfm']
+
+
+def test_send_sequence_uploads_only_changed(awg, visa):
+    waveforms = {'a.wfm': _waveform(0.1), 'b.wfm': _waveform(0.2)}
+    uploaded = awg.send_sequence(['a.wfm', 'b.wfm', 'a.wfm'], [1, 1, 1],
+                                 [0, 0, 0], [0, 0, 1], [0, 0, 0], 's.seq',
+                                 waveforms=waveforms)
+    assert uploaded == ['a.wfm', 'b.wfm']
+
+    waveforms['b.wfm'] = _waveform(0.3)
+    waveforms['c.pat'] = _waveform(0.4)
+    uploaded = awg.send_sequence(['a.wfm', 'b.wfm', 'c.pat'], [1, 1, 1],
+                                 [0, 0, 0], [0, 0, 1], [0, 0, 0], 's.seq',
+                                 waveforms=waveforms)
+    assert uploaded == ['b.wfm', 'c.pat']
+    assert _uploaded(visa) == ['a.wfm', 'b.wfm', 'b.wfm', 'c.pat']
+    assert b'MAGIC 2000' in visa.raw_written[-2][0]
+    assert visa.written[-1].startswith('MMEM:DATA "s.seq",')